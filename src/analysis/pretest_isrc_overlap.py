@@ -1,38 +1,74 @@
-import os, time
+import argparse, random, sys
 import duckdb, pandas as pd
 from pathlib import Path
-from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.coverage_estimate import CI_WIDTH, MAX_SAMPLE, ROUND_SIZE, sequential_coverage, wilson_interval
+from core.isrc_keys import add_parquet_argument, match_isrc_keys, normalize_isrc, parquet_arg
+from match.isrc_index import current_source, open_index
+from match.lookup_client import LookupClient
+from spotify.artist_resolver import profile_csv, resolve_artist
+from spotify.client import get_cache, get_spotify
 
 # === Base paths ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
 db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+index_dir = base_dir / "data" / "processed" / "isrc_index"
 log_path = base_dir / "logs" / "07B_pretest_isrc_overlap.log"
 
+parser = argparse.ArgumentParser(description="Estimate unclaimed ISRC coverage from a sample of each artist's tracks.")
+parser.add_argument("--sequential", action="store_true",
+                    help="sample in rounds and stop once the coverage interval is narrow enough or the target is decided")
+parser.add_argument("--target", type=float, default=None, help="coverage share to screen against, e.g. 0.10")
+parser.add_argument("--width", type=float, default=CI_WIDTH, help="stop when the 95%% interval is this narrow")
+parser.add_argument("--round", type=int, default=ROUND_SIZE, help="ISRCs per round")
+parser.add_argument("--max-sample", type=int, default=MAX_SAMPLE)
+parser.add_argument("--budget", type=int, default=None, help="stop screening new artists after this many API calls")
+parser.add_argument("--top", type=int, default=None, help="screen the top N names of tsv_artist_profile.csv")
+add_parquet_argument(parser, base_dir / "data" / "processed" / "unclaimed_parquet")
+args = parser.parse_args()
+unclaimed_parquet = parquet_arg(parser, args)   # None: the unclaimed_rights table
+
 def log(msg):
     print(msg)
     with open(log_path, "a", encoding="utf-8") as f:
         f.write(msg + "\n")
 
-# === Load environment ===
-load_dotenv(base_dir / ".env")
-
-# === Spotify authentication (reuses local cache) ===
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-    client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-    client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
-    redirect_uri=os.getenv("SPOTIFY_REDIRECT_URI"),
-    scope="user-read-private",
-    cache_path=base_dir / "config" / ".spotify_token_cache",
-    open_browser=False
-))
+# === Spotify auth (shared client: pooled session, response cache, token cache) ===
+sp = get_spotify()
+http_cache = get_cache()
 log("Authenticated using cached Spotify token.\n")
 
-# === Connect to DuckDB ===
-con = duckdb.connect(str(db_path))
-con.execute("PRAGMA threads=4;")
-log(f"Connected to DuckDB at: {db_path}\n")
+# === ISRC membership index (built by match/isrc_index.py) ===
+# Screens samples before any unclaimed_rights lookup; only sampled ISRCs
+# that pass it are probed in DuckDB.
+# Both it and the lookup service are only used while they match the loaded
+# unclaimed_rights (fingerprint in the sidecar next to the database); a stale
+# copy would miss ISRCs added since it was built.
+unclaimed_source = current_source(db_path)
+isrc_index = open_index(index_dir, unclaimed_source)
+log(f"ISRC membership index: {'loaded' if isrc_index else 'not built or out of date, querying DuckDB directly'}\n")
+
+# === Resident lookup service (match/lookup_service.py), used when it is running ===
+lookup = LookupClient()
+if not lookup.available():
+    lookup = None
+    log("ISRC lookup service: not running\n")
+elif unclaimed_source is None or lookup.health().get("source") != unclaimed_source:
+    lookup = None
+    log("ISRC lookup service: snapshot out of date (POST /reload), not used\n")
+else:
+    log("ISRC lookup service: connected\n")
+
+con = None
+
+def get_con():
+    global con
+    if con is None:
+        con = duckdb.connect(str(db_path))   # also holds artist_spotify_map
+        con.execute("PRAGMA threads=4;")
+        log(f"Connected to DuckDB at: {db_path}\n")
+    return con
 
 # === Candidate artists ===
 artists = [
@@ -42,55 +78,136 @@ artists = [
     "Martin Jacoby",
     "Tele Music"
 ]
+if args.top:
+    artists = pd.read_csv(profile_csv)["artist_name"].head(args.top).tolist()
 
 results = []
 
-# === Helper: fetch up to 30 ISRCs per artist ===
-def fetch_isrcs(artist_name, limit=30):
-    search = sp.search(q=f"artist:{artist_name}", type="artist", limit=1)
-    if not search["artists"]["items"]:
-        log(f"Artist not found: {artist_name}")
-        return []
-    artist_id = search["artists"]["items"][0]["id"]
-    albums = sp.artist_albums(artist_id, album_type="album,single,compilation", limit=10)
-    isrcs = set()
-    for a in albums["items"]:
-        tracks = sp.album_tracks(a["id"])
-        for t in tracks["items"]:
-            isrc = t.get("external_ids", {}).get("isrc")
-            if isrc:
-                isrcs.add(isrc.upper().replace("-", "").strip())
-            if len(isrcs) >= limit:
-                return list(isrcs)
-        time.sleep(0.2)
-    return list(isrcs)
+class AlbumSampler:
+    """Draws an artist's tracks in random order, album by album.
+
+    Album pages are listed lazily: the first call gives `total`, and further
+    pages are fetched only when a random draw lands on them, so a fixed-size
+    sample of a label-sized catalog costs a few listing calls, not all of
+    them. Album track listings carry no ISRCs, so each drawn batch is looked
+    up with one /tracks call (up to 50 IDs). `calls` counts every API call made.
+    """
+
+    PAGE_SIZE = 50
+
+    def __init__(self, artist_id, seed=0):
+        self.artist_id = artist_id
+        self.rng = random.Random(seed)
+        self.pages = None        # page offset -> album IDs not drawn yet (fetched pages only)
+        self.remaining = None    # page offset -> albums left on it (estimated until fetched)
+        self.pool, self.seen = [], set()
+        self.calls = 0
+
+    def _album_page(self, offset):
+        page = sp.artist_albums(self.artist_id, album_type="album,single,compilation",
+                                limit=self.PAGE_SIZE, offset=offset)
+        self.calls += 1
+        return page
+
+    def _next_album(self):
+        """A random album not drawn before (uniform over the whole catalog), or None once all are used."""
+        if self.remaining is None:
+            first = self._album_page(0)
+            total = first.get("total") or 0
+            self.remaining = {o: min(self.PAGE_SIZE, total - o) for o in range(0, total, self.PAGE_SIZE)}
+            self.pages = {0: [a["id"] for a in first["items"]]}
+            self.remaining[0] = len(self.pages[0])
+        while True:
+            offsets = [o for o, n in self.remaining.items() if n > 0]
+            if not offsets:
+                return None
+            offset = self.rng.choices(offsets, weights=[self.remaining[o] for o in offsets])[0]
+            if offset not in self.pages:
+                self.pages[offset] = [a["id"] for a in self._album_page(offset)["items"]]
+                self.remaining[offset] = len(self.pages[offset])
+                if not self.pages[offset]:
+                    continue
+            albums = self.pages[offset]
+            self.remaining[offset] -= 1
+            return albums.pop(self.rng.randrange(len(albums)))
+
+    def draw(self, k):
+        """Up to k ISRCs not drawn before; [] once every album is used up."""
+        isrcs = []
+        while len(isrcs) < k:
+            # mix tracks of at least two albums into each batch where possible
+            while len(self.pool) < 2 * k:
+                album_id = self._next_album()
+                if album_id is None:
+                    break
+                self.pool += [t["id"] for t in sp.album_tracks(album_id)["items"]]
+                self.calls += 1
+                self.rng.shuffle(self.pool)
+            size = min(k - len(isrcs), 50)
+            batch, self.pool = self.pool[:size], self.pool[size:]
+            if not batch:
+                break
+            tracks = sp.tracks(batch)["tracks"]
+            self.calls += 1
+            for t in tracks:
+                isrc = normalize_isrc(((t or {}).get("external_ids") or {}).get("isrc"))
+                if isrc and isrc not in self.seen:
+                    self.seen.add(isrc)
+                    isrcs.append(isrc)
+        return isrcs
+
+def count_matches(isrcs):
+    if lookup:
+        return len(lookup.matched_isrcs(isrcs))
+    # pre-filter with the membership index, then fetch rows for the hits only
+    # (one idx_isrc_norm probe per remaining ISRC)
+    candidates = isrc_index.filter(isrcs) if isrc_index else isrcs
+    if not candidates:
+        return 0
+    return match_isrc_keys(get_con(), candidates, columns="isrc_norm", parquet_dir=unclaimed_parquet)["isrc_norm"].nunique()
 
 # === Iterate through candidates ===
-for name in artists:
+calls_spent = 0
+for i, name in enumerate(artists):
+    if args.budget and calls_spent >= args.budget:
+        log(f"API budget of {args.budget:,} calls spent; {len(artists) - i} artists not screened\n")
+        break
     log(f"Sampling artist: {name}")
-    sample_isrcs = fetch_isrcs(name, limit=30)
-    if not sample_isrcs:
+    artist_id = resolve_artist(get_con(), sp, name)
+    if artist_id is None:
+        log(f"Artist not found: {name}\n")
+        continue
+    sampler = AlbumSampler(artist_id)
+
+    if args.sequential:
+        est = sequential_coverage(sampler.draw, count_matches, round_size=args.round, target=args.target,
+                                  width=args.width, max_sample=args.max_sample)
+    else:
+        sample_isrcs = sampler.draw(30)
+        hits = count_matches(sample_isrcs) if sample_isrcs else 0
+        low, high = wilson_interval(hits, len(sample_isrcs))
+        est = {"sampled": len(sample_isrcs), "matches": hits, "ci_low": low, "ci_high": high, "stop": "fixed"}
+    calls_spent += sampler.calls
+
+    if not est["sampled"]:
         log(f"No ISRCs found for {name}\n")
         continue
+    pct = est["matches"] / est["sampled"] * 100
+    results.append((name, est["sampled"], est["matches"], round(pct, 2), round(est["ci_low"] * 100, 2),
+                    round(est["ci_high"] * 100, 2), sampler.calls, est["stop"]))
+    log(f"{name}: {est['matches']}/{est['sampled']} matched ({pct:.2f}%, 95% CI "
+        f"{est['ci_low']:.1%}-{est['ci_high']:.1%}) | {sampler.calls} API calls | stop: {est['stop']}\n")
 
-    # query DuckDB for matches
-    con.register("sample_isrcs", pd.DataFrame(sample_isrcs, columns=["isrc_norm"]))
-    q = """
-    SELECT COUNT(*) FROM unclaimed_rights
-    WHERE REPLACE(UPPER(ISRC), '-', '') IN (SELECT isrc_norm FROM sample_isrcs)
-    """
-    match_count = con.execute(q).fetchone()[0]
-    total = len(sample_isrcs)
-    pct = (match_count / total) * 100
-    results.append((name, total, match_count, round(pct, 2)))
-    con.unregister("sample_isrcs")
-    log(f"{name}: {match_count}/{total} matched ({pct:.2f}%)\n")
-
-con.close()
+log(f"API calls spent: {calls_spent:,}")
+if con is not None:
+    con.close()
 log("🔒 Connection closed.\n")
+cache_stats = http_cache.stats()
+log(f"HTTP cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses ({cache_stats['hit_rate']:.1%})\n")
 
 # === Present results summary ===
-df = pd.DataFrame(results, columns=["Artist", "Sampled_ISRCs", "Matches", "Coverage_%"])
+df = pd.DataFrame(results, columns=["Artist", "Sampled_ISRCs", "Matches", "Coverage_%",
+                                    "CI_Low_%", "CI_High_%", "API_Calls", "Stop"])
 summary_path = base_dir / "reports" / "pretest_overlap_summary.csv"
 df.to_csv(summary_path, index=False)
 log(f"Summary saved to: {summary_path}\n")
@@ -1,37 +1,73 @@
-import os, time
+import argparse, sys
 import duckdb, pandas as pd
 from pathlib import Path
-from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.coverage_estimate import CI_WIDTH, MAX_SAMPLE, ROUND_SIZE, sequential_coverage, wilson_interval
+from core.isrc_keys import add_parquet_argument, match_isrc_keys, normalize_isrc, parquet_arg
+from match.isrc_index import current_source, open_index
+from match.lookup_client import LookupClient
+from spotify.artist_resolver import profile_csv
+from spotify.client import get_cache, get_spotify
 
 # === Paths ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
 db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+index_dir = base_dir / "data" / "processed" / "isrc_index"
 log_path = base_dir / "logs" / "07B_pretest_isrc_overlap_v2.log"
 
+parser = argparse.ArgumentParser(description="Estimate unclaimed ISRC coverage from track-search samples.")
+parser.add_argument("--sequential", action="store_true",
+                    help="sample in rounds and stop once the coverage interval is narrow enough or the target is decided")
+parser.add_argument("--target", type=float, default=None, help="coverage share to screen against, e.g. 0.10")
+parser.add_argument("--width", type=float, default=CI_WIDTH, help="stop when the 95%% interval is this narrow")
+parser.add_argument("--round", type=int, default=ROUND_SIZE, help="ISRCs per round")
+parser.add_argument("--max-sample", type=int, default=MAX_SAMPLE)
+parser.add_argument("--budget", type=int, default=None, help="stop screening new artists after this many API calls")
+parser.add_argument("--top", type=int, default=None, help="screen the top N names of tsv_artist_profile.csv")
+add_parquet_argument(parser, base_dir / "data" / "processed" / "unclaimed_parquet")
+args = parser.parse_args()
+unclaimed_parquet = parquet_arg(parser, args)   # None: the unclaimed_rights table
+
 def log(msg):
     print(msg)
     with open(log_path, "a", encoding="utf-8") as f:
         f.write(msg + "\n")
 
-# === Load environment ===
-load_dotenv(base_dir / ".env")
-
-# === Auth (cached) ===
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-    client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-    client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
-    redirect_uri=os.getenv("SPOTIFY_REDIRECT_URI"),
-    scope="user-read-private",
-    cache_path=base_dir / "config" / ".spotify_token_cache",
-    open_browser=False
-))
+# === Spotify auth (shared client: pooled session, response cache, token cache) ===
+sp = get_spotify()
+http_cache = get_cache()
 log("Authenticated using cached Spotify token.\n")
 
-# === Connect to DuckDB ===
-con = duckdb.connect(str(db_path))
-log(f"Connected to DuckDB at: {db_path}\n")
+# === ISRC membership index (built by match/isrc_index.py) ===
+# Screens samples without touching DuckDB; the database is only opened
+# once some sampled ISRC is actually present.
+# Both it and the lookup service are only used while they match the loaded
+# unclaimed_rights (fingerprint in the sidecar next to the database); a stale
+# copy would miss ISRCs added since it was built.
+unclaimed_source = current_source(db_path)
+isrc_index = open_index(index_dir, unclaimed_source)
+log(f"ISRC membership index: {'loaded' if isrc_index else 'not built or out of date, querying DuckDB directly'}\n")
+
+# === Resident lookup service (match/lookup_service.py), used when it is running ===
+lookup = LookupClient()
+if not lookup.available():
+    lookup = None
+    log("ISRC lookup service: not running\n")
+elif unclaimed_source is None or lookup.health().get("source") != unclaimed_source:
+    lookup = None
+    log("ISRC lookup service: snapshot out of date (POST /reload), not used\n")
+else:
+    log("ISRC lookup service: connected\n")
+
+con = None
+
+def get_con():
+    global con
+    if con is None:
+        con = duckdb.connect(str(db_path)) if unclaimed_parquet is None else duckdb.connect()
+        log(f"Connected to DuckDB at: {db_path}\n")
+    return con
 
 # === Candidate artists ===
 artists = [
@@ -41,54 +77,90 @@ artists = [
     "Martin Jacoby",
     "Tele Music"
 ]
+if args.top:
+    artists = pd.read_csv(profile_csv)["artist_name"].head(args.top).tolist()
 
 results = []
 
-def fetch_isrcs_via_search(artist_name, limit=30):
-    """Use search endpoint to fetch full track objects (with ISRCs)."""
-    tracks = []
-    offset = 0
-    while len(tracks) < limit and offset < 100:
-        data = sp.search(q=f"artist:{artist_name}", type="track", limit=50, offset=offset)
-        items = data["tracks"]["items"]
-        if not items:
-            break
-        for t in items:
-            isrc = t.get("external_ids", {}).get("isrc")
-            if isrc:
-                tracks.append(isrc.upper().replace("-", "").strip())
-            if len(tracks) >= limit:
-                break
-        offset += 50
-        time.sleep(0.2)
-    return list(set(tracks))
+class SearchSampler:
+    """Draws ISRCs from track search results, one page of 50 per API call.
+
+    Search returns full track objects (with ISRCs) but ranks them by
+    popularity, so the sample leans towards an artist's best-known tracks.
+    """
+
+    MAX_OFFSET = 1000   # the search endpoint stops paging here
+
+    def __init__(self, artist_name):
+        self.artist_name = artist_name
+        self.offset = 0
+        self.pool, self.seen = [], set()
+        self.calls = 0
+
+    def draw(self, k):
+        """Up to k ISRCs not drawn before; [] once search runs out."""
+        while len(self.pool) < k and self.offset < self.MAX_OFFSET:
+            items = sp.search(q=f"artist:{self.artist_name}", type="track", limit=50, offset=self.offset)["tracks"]["items"]
+            self.calls += 1
+            self.offset += 50
+            for t in items:
+                isrc = normalize_isrc((t.get("external_ids") or {}).get("isrc"))
+                if isrc and isrc not in self.seen:
+                    self.seen.add(isrc)
+                    self.pool.append(isrc)
+            if len(items) < 50:
+                self.offset = self.MAX_OFFSET
+        batch, self.pool = self.pool[:k], self.pool[k:]
+        return batch
+
+def count_matches(isrcs):
+    if lookup:
+        return len(lookup.matched_isrcs(isrcs))
+    # pre-filter with the membership index, then fetch rows for the hits only
+    # (one idx_isrc_norm probe per remaining ISRC)
+    candidates = isrc_index.filter(isrcs) if isrc_index else isrcs
+    if not candidates:
+        return 0
+    return match_isrc_keys(get_con(), candidates, columns="isrc_norm", parquet_dir=unclaimed_parquet)["isrc_norm"].nunique()
 
 # === Iterate ===
-for name in artists:
+calls_spent = 0
+for i, name in enumerate(artists):
+    if args.budget and calls_spent >= args.budget:
+        log(f"API budget of {args.budget:,} calls spent; {len(artists) - i} artists not screened\n")
+        break
     log(f"Sampling artist: {name}")
-    sample_isrcs = fetch_isrcs_via_search(name, limit=30)
-    if not sample_isrcs:
+    sampler = SearchSampler(name)
+
+    if args.sequential:
+        est = sequential_coverage(sampler.draw, count_matches, round_size=args.round, target=args.target,
+                                  width=args.width, max_sample=args.max_sample)
+    else:
+        sample_isrcs = sampler.draw(30)
+        hits = count_matches(sample_isrcs) if sample_isrcs else 0
+        low, high = wilson_interval(hits, len(sample_isrcs))
+        est = {"sampled": len(sample_isrcs), "matches": hits, "ci_low": low, "ci_high": high, "stop": "fixed"}
+    calls_spent += sampler.calls
+
+    if not est["sampled"]:
         log(f"No ISRCs found for {name}\n")
         continue
+    pct = est["matches"] / est["sampled"] * 100
+    results.append((name, est["sampled"], est["matches"], round(pct, 2), round(est["ci_low"] * 100, 2),
+                    round(est["ci_high"] * 100, 2), sampler.calls, est["stop"]))
+    log(f"{name}: {est['matches']}/{est['sampled']} matched ({pct:.2f}%, 95% CI "
+        f"{est['ci_low']:.1%}-{est['ci_high']:.1%}) | {sampler.calls} API calls | stop: {est['stop']}\n")
 
-    df_sample = pd.DataFrame(sample_isrcs, columns=["isrc_norm"])
-    con.register("sample_isrcs", df_sample)
-    q = """
-    SELECT COUNT(*) FROM unclaimed_rights
-    WHERE REPLACE(UPPER(ISRC), '-', '') IN (SELECT isrc_norm FROM sample_isrcs)
-    """
-    match_count = con.execute(q).fetchone()[0]
-    total = len(sample_isrcs)
-    pct = (match_count / total) * 100
-    results.append((name, total, match_count, round(pct, 2)))
-    con.unregister("sample_isrcs")
-    log(f"{name}: {match_count}/{total} matched ({pct:.2f}%)\n")
-
-con.close()
+log(f"API calls spent: {calls_spent:,}")
+if con is not None:
+    con.close()
 log("Connection closed.\n")
+cache_stats = http_cache.stats()
+log(f"HTTP cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses ({cache_stats['hit_rate']:.1%})\n")
 
 # === Summary ===
-df = pd.DataFrame(results, columns=["Artist", "Sampled_ISRCs", "Matches", "Coverage_%"])
+df = pd.DataFrame(results, columns=["Artist", "Sampled_ISRCs", "Matches", "Coverage_%",
+                                    "CI_Low_%", "CI_High_%", "API_Calls", "Stop"])
 summary_path = base_dir / "reports" / "pretest_overlap_summary_v2.csv"
 df.to_csv(summary_path, index=False)
 log(f"Summary saved to: {summary_path}\n")
@@ -30,7 +30,7 @@ WHERE DisplayArtistName IS NOT NULL
   AND UPPER(TRIM(DisplayArtistName)) NOT IN ('VARIOUS ARTISTS', 'VARIOUS', 'UNKNOWN')
 GROUP BY artist_name
 ORDER BY record_count DESC
-LIMIT 50;
+LIMIT 500;
 """
 
 df = con.execute(query).fetchdf()
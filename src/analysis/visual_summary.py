@@ -1,15 +1,22 @@
-import pandas as pd
+import duckdb
 import matplotlib.pyplot as plt
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from match.match_store import load_coverage
+
 # === Paths ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
-summary_path = base_dir / "reports" / "tritone_multi_artist_report.xlsx"
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"   # artist_coverage (match/match_store.py)
+TOP_ARTISTS = 15
 output_dir = base_dir / "reports" / "figures"
 output_dir.mkdir(parents=True, exist_ok=True)
 
-# === Load Summary Sheet ===
-df = pd.read_excel(summary_path, sheet_name="Summary")
+# === Load coverage summary (artist_coverage) ===
+con = duckdb.connect(str(db_path), read_only=True)
+df = load_coverage(con, limit=TOP_ARTISTS).reset_index(drop=True)
+con.close()
 
 # === Coverage Bar Chart ===
 plt.figure(figsize=(8, 5))
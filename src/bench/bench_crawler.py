@@ -0,0 +1,55 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from spotify.async_crawler import crawl_artist_sync
+from spotify.mock_spotify_api import ARTIST_PREFIX, MockSpotifyServer
+from spotify.rate_limit import TokenBucket
+
+
+def run(artist_id, concurrency, rate, **server_kwargs):
+    """Crawl one artist from a fresh stand-in server; returns (seconds, crawl result, server)."""
+    server = MockSpotifyServer(port=0, **server_kwargs).start_background()
+    try:
+        start = time.perf_counter()
+        result = crawl_artist_sync(
+            lambda: "mock-token", artist_id,
+            base_url=server.url, concurrency=concurrency, bucket=TokenBucket(rate),
+        )
+        return time.perf_counter() - start, result, server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the async Spotify crawler against the local mock API.")
+    parser.add_argument("--albums", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rate", type=float, default=200.0, help="client token bucket ceiling (req/s)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock response latency (s)")
+    parser.add_argument("--server-limit", type=int, default=150, help="mock requests/sec before 429")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500/503")
+    parser.add_argument("--fixtures", type=Path, default=None, help="replay recorded responses instead of fake data")
+    parser.add_argument("--artist-id", default=None, help="artist to crawl (required with --fixtures)")
+    args = parser.parse_args()
+
+    artist_id = args.artist_id or f"{ARTIST_PREFIX}{args.albums}"
+    server_kwargs = dict(latency=args.latency, rate_limit=args.server_limit, fixtures=args.fixtures,
+                         throttle_rate=args.throttle_rate, error_rate=args.error_rate)
+
+    if not args.fixtures:
+        # The old loop: one album_tracks call per album plus a fixed 0.2 s sleep
+        sequential = args.albums * (args.latency + 0.2)
+        print(f"Sequential estimate for {args.albums:,} albums: {sequential:,.0f}s\n")
+
+    for c in args.concurrency:
+        seconds, (albums, album_tracks, failed, stats), server = run(artist_id, c, args.rate, **server_kwargs)
+        tracks = sum(len(t) for t in album_tracks.values())
+        print(f"concurrency {c:>3}: {len(albums):>6,} albums {tracks:>7,} tracks in {seconds:6.1f}s "
+              f"({len(albums) / seconds:7.1f} albums/s) | requests {stats['requests']:,} "
+              f"| 429s {stats['throttled']:,} (server rejected {server.rejected:,}) | 5xx {server.failed:,} "
+              f"| failed {len(failed)}" + (f" | no fixture {server.missing:,}" if args.fixtures else ""))
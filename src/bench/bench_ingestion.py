@@ -0,0 +1,153 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import duckdb
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from bench.generate_synthetic_tsv import generate, parse_size
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+bench_data_dir = base_dir / "data" / "bench"
+results_dir = base_dir / "reports" / "bench"
+
+# === Default matrix ===
+default_sizes = ["100MB"]
+default_modes = ["native", "pandas"]
+default_chunksizes = [50_000, 100_000, 250_000]   # pandas engine only
+default_threads = [4]
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case, tsv_path, work_dir, results):
+    """Ingest `tsv_path` into a fresh database (runs in a child process)."""
+    import ingest.ingest_unclaimed_tsv as ingest
+    from ingest.unclaimed_schema import CREATE_TABLE_SQL
+
+    ingest.log_path = Path(work_dir) / "ingest.log"
+    sys.stdout = open(os.devnull, "w")   # keep per-batch logging off the console
+
+    db_file = Path(work_dir) / f"{case['name']}.duckdb"
+    con = duckdb.connect(str(db_file))
+    con.execute(f"PRAGMA threads={case['threads']};")
+    con.execute(CREATE_TABLE_SQL)
+
+    start = time.perf_counter()
+    if case["mode"] == "native":
+        rows, rejected = ingest.ingest_native(con, tsv_path), 0
+    else:
+        rows, rejected = ingest.ingest_pandas(con, tsv_path, case["chunksize"])
+    con.execute("CHECKPOINT;")
+    elapsed = time.perf_counter() - start
+    con.close()
+
+    results.put({
+        **case,
+        "rows": rows,
+        "rejected": rejected,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / max(elapsed, 1e-9)),
+        "peak_rss_mb": round(peak_rss_bytes() / 1024**2, 1) if peak_rss_bytes() else None,
+        "db_size_mb": round(db_file.stat().st_size / 1024**2, 1),
+    })
+
+
+def build_cases(modes, chunksizes, threads):
+    cases = []
+    for t in threads:
+        for mode in modes:
+            for chunksize in (chunksizes if mode == "pandas" else [None]):
+                name = f"{mode}_t{t}" + (f"_c{chunksize}" if chunksize else "")
+                cases.append({"name": name, "mode": mode, "chunksize": chunksize, "threads": t})
+    return cases
+
+
+def run_benchmarks(sizes, modes, chunksizes, threads, seed=42):
+    """Run every (size, case) pair in its own spawned process."""
+    ctx = mp.get_context("spawn")
+    runs = []
+    for size in sizes:
+        tsv_path = bench_data_dir / f"synthetic_{size.lower()}_s{seed}.tsv"
+        if not tsv_path.exists():
+            print(f"Generating {size} synthetic TSV -> {tsv_path}")
+            generate(tsv_path, parse_size(size), seed)
+
+        for case in build_cases(modes, chunksizes, threads):
+            work_dir = tempfile.mkdtemp(prefix="ingest_bench_")
+            results = ctx.Queue()
+            proc = ctx.Process(target=run_case, args=(case, str(tsv_path), work_dir, results))
+            proc.start()
+            proc.join()
+            if proc.exitcode == 0:
+                run = {"size": size, "tsv_bytes": tsv_path.stat().st_size, **results.get(timeout=30)}
+            else:
+                run = {"size": size, **case, "error": f"exit code {proc.exitcode}"}
+            shutil.rmtree(work_dir, ignore_errors=True)
+            runs.append(run)
+            print(f"{size:>7} {case['name']:<24} "
+                  + (f"{run['rows_per_sec']:>12,} rows/s  {run['seconds']:>8.1f}s  "
+                     f"RSS {run['peak_rss_mb']} MB  DB {run['db_size_mb']} MB"
+                     if "error" not in run else run["error"]))
+    return runs
+
+
+def compare(current, previous_path):
+    """Print rows/sec change per (size, case) against an earlier results file."""
+    previous = json.loads(Path(previous_path).read_text(encoding="utf-8"))
+    before = {(r["size"], r["name"]): r for r in previous["runs"] if "error" not in r}
+    print(f"\nComparison with {previous_path}:")
+    for run in current:
+        old = before.get((run["size"], run["name"]))
+        if old and "error" not in run:
+            change = (run["rows_per_sec"] - old["rows_per_sec"]) / max(old["rows_per_sec"], 1) * 100
+            print(f"{run['size']:>7} {run['name']:<24} {old['rows_per_sec']:>12,} -> {run['rows_per_sec']:>12,} rows/s ({change:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TSV ingestion modes on synthetic data.")
+    parser.add_argument("--sizes", nargs="+", default=default_sizes, help="e.g. 100MB 1GB 6.7GB")
+    parser.add_argument("--modes", nargs="+", default=default_modes, choices=["native", "pandas"])
+    parser.add_argument("--chunksizes", nargs="+", type=int, default=default_chunksizes)
+    parser.add_argument("--threads", nargs="+", type=int, default=default_threads, help="PRAGMA threads values")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", type=Path, help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    runs = run_benchmarks(args.sizes, args.modes, args.chunksizes, args.threads, args.seed)
+
+    results_dir.mkdir(parents=True, exist_ok=True)
+    out = results_dir / f"ingestion_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.write_text(json.dumps({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "duckdb": duckdb.__version__,
+        },
+        "runs": runs,
+    }, indent=4), encoding="utf-8")
+    print(f"\nResults written to: {out}")
+
+    if args.compare:
+        compare(runs, args.compare)
@@ -0,0 +1,127 @@
+import argparse
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from ingest.unclaimed_schema import COLUMNS
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+output_dir = base_dir / "data" / "bench"
+
+# === Parameters ===
+rows_per_block = 100_000
+countries = ["US", "GB", "DE", "FR", "NL", "JP", "SE", "BR", "IT", "ES", "QM", "QZ", "CA", "AU", "JM"]
+registrants_per_country = 300
+artist_pool = 20_000
+invalid_isrc_rate = 0.01     # share of ISRCs that fail the format check
+hyphenated_rate = 0.15       # share written as CC-XXX-YY-NNNNN
+missing_isrc_rate = 0.03
+
+_ALNUM = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"))
+_SYLLABLES = ["ka", "ri", "mo", "zu", "le", "an", "tor", "vin", "sa", "dex", "lo", "mi", "ra", "bu", "ne", "go"]
+
+
+def parse_size(text):
+    """'100MB', '6.7GB' or plain bytes -> int bytes."""
+    text = text.strip().upper()
+    for suffix, factor in (("GB", 1024**3), ("MB", 1024**2), ("KB", 1024)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def zipf_choice(rng, n, size, s=1.1):
+    """Indices in [0, n) with a Zipf-like skew towards the first entries."""
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+
+def make_vocab(rng):
+    prefixes = np.array([
+        c + "".join(rng.choice(_ALNUM, 3))
+        for c in countries for _ in range(registrants_per_country)
+    ])
+    names = []
+    for i in range(artist_pool):
+        parts = rng.choice(_SYLLABLES, rng.integers(2, 5))
+        name = "".join(parts).title()
+        if i % 3 == 0:
+            name += " " + "".join(rng.choice(_SYLLABLES, 2)).title()
+        names.append(name)
+    names[:3] = ["Various Artists", "The Hit Crew", "Tele Music"]
+    return prefixes, np.array(names)
+
+
+def make_block(rng, start_id, n, prefixes, artists):
+    """One block of synthetic rows as a TSV string."""
+    # Prefix skew: popular countries first, popular registrants within them
+    country = zipf_choice(rng, len(countries), n, s=0.9)
+    registrant = zipf_choice(rng, registrants_per_country, n, s=1.2)
+    prefix = prefixes[country * registrants_per_country + registrant].tolist()
+    year = (rng.integers(60, 125, n) % 100).tolist()
+    serial = rng.integers(0, 100_000, n).tolist()
+    hyphen = (rng.random(n) < hyphenated_rate).tolist()
+    invalid = (rng.random(n) < invalid_isrc_rate).tolist()
+    missing = (rng.random(n) < missing_isrc_rate).tolist()
+
+    artist = artists[zipf_choice(rng, len(artists), n, s=1.05)].tolist()
+    duration = rng.integers(30, 900, n).tolist()
+    share = np.round(rng.random(n) * 100, 2).tolist()
+    percentile = np.round(rng.random(n), 4).tolist()
+    title_no = rng.integers(0, 5_000_000, n).tolist()
+    subtitle = (rng.random(n) < 0.1).tolist()
+    alt_title = (rng.random(n) < 0.05).tolist()
+
+    lines = []
+    for i in range(n):
+        rid = start_id + i
+        if missing[i]:
+            isrc = ""
+        elif hyphen[i]:
+            isrc = f"{prefix[i][:2]}-{prefix[i][2:]}-{year[i]:02d}-{serial[i]:05d}"
+        else:
+            isrc = f"{prefix[i]}{year[i]:02d}{serial[i]:05d}"
+        if invalid[i] and isrc:
+            isrc += "X"
+        title = f"Track {title_no[i]}"
+        lines.append(
+            f"{rid}\tR{rid}\tW{rid // 3}\t{isrc}\t\t{title}\t{'Remastered' if subtitle[i] else ''}\t"
+            f"{title.upper() if alt_title[i] else ''}\t{artist[i]}\t\t{duration[i]}\t{share[i]}\t{percentile[i]}\n"
+        )
+    return "".join(lines)
+
+
+def generate(path, size_bytes, seed=42):
+    """Write a synthetic unclaimed-rights TSV of roughly `size_bytes`."""
+    rng = np.random.default_rng(seed)
+    prefixes, artists = make_vocab(rng)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = rows = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        written += f.write("\t".join(COLUMNS) + "\n")
+        while written < size_bytes:
+            block = make_block(rng, rows + 1, rows_per_block, prefixes, artists)
+            if written + len(block) > size_bytes:
+                # Trim the final block to whole lines near the target size
+                cut = block.rfind("\n", 0, size_bytes - written) + 1
+                block = block[:cut] if cut > 0 else block[:block.find("\n") + 1]
+            written += f.write(block)
+            rows += block.count("\n")
+    return rows, written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic unclaimed-rights TSV.")
+    parser.add_argument("--size", default="100MB", help="target file size, e.g. 100MB, 1GB, 6.7GB")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    out = args.out or output_dir / f"synthetic_{args.size.lower()}.tsv"
+    start = time.perf_counter()
+    rows, written = generate(out, parse_size(args.size), args.seed)
+    print(f"Wrote {rows:,} rows ({written / 1024**2:,.1f} MB) to {out} in {time.perf_counter() - start:.1f}s")
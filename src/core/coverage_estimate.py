@@ -0,0 +1,71 @@
+import math
+
+# === Sequential sampling defaults ===
+ROUND_SIZE = 10         # ISRCs drawn and checked per round
+MIN_SAMPLE = 20         # never stop before this many ISRCs
+MAX_SAMPLE = 100        # hard cap per artist
+CI_WIDTH = 0.15         # stop once the interval is this narrow
+Z = 1.96                # ~95% interval per look
+
+
+def wilson_interval(hits, n, z=Z):
+    """Wilson score interval for a proportion; (0.0, 1.0) when nothing was sampled."""
+    if n == 0:
+        return 0.0, 1.0
+    p = hits / n
+    centre = p + z * z / (2 * n)
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    denom = 1 + z * z / n
+    return max(0.0, (centre - margin) / denom), min(1.0, (centre + margin) / denom)
+
+
+def stop_reason(hits, n, target=None, width=CI_WIDTH, min_sample=MIN_SAMPLE, max_sample=MAX_SAMPLE, z=Z):
+    """Why sampling can stop after `hits` matches in `n` ISRCs, or None to keep going.
+
+    'above_target' / 'below_target' when the whole interval is on one side of
+    `target`, 'precise' when it is at most `width` wide, 'max_sample' at the cap.
+    """
+    if n >= max_sample:
+        return "max_sample"
+    if n < min_sample:
+        return None
+    low, high = wilson_interval(hits, n, z)
+    if target is not None and low > target:
+        return "above_target"
+    if target is not None and high < target:
+        return "below_target"
+    if high - low <= width:
+        return "precise"
+    return None
+
+
+def sequential_coverage(draw, count_matches, round_size=ROUND_SIZE, target=None, width=CI_WIDTH,
+                        min_sample=MIN_SAMPLE, max_sample=MAX_SAMPLE, z=Z):
+    """Sample ISRCs round by round until the coverage estimate is good enough.
+
+    `draw(k)` returns up to k ISRCs not drawn before (empty when the source is
+    exhausted); `count_matches(isrcs)` returns how many are in unclaimed_rights.
+    Checking after every round inflates the error rate somewhat above the
+    nominal 5%; raise `z` for stricter screening.
+    """
+    hits = n = rounds = 0
+    reason = None
+    while reason is None:
+        batch = draw(min(round_size, max_sample - n))
+        if not batch:
+            reason = "exhausted"
+            break
+        hits += count_matches(batch)
+        n += len(batch)
+        rounds += 1
+        reason = stop_reason(hits, n, target, width, min_sample, max_sample, z)
+    low, high = wilson_interval(hits, n, z)
+    return {
+        "sampled": n,
+        "matches": hits,
+        "coverage": hits / n if n else None,
+        "ci_low": low,
+        "ci_high": high,
+        "rounds": rounds,
+        "stop": reason,
+    }
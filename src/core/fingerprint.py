@@ -0,0 +1,96 @@
+import json
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# === Read sizes ===
+READ_BUFFER = 8 * 1024 * 1024      # 8 MB per read for full hashes
+SAMPLE_BLOCK = 64 * 1024           # bytes hashed per sampled block
+SAMPLE_COUNT = 16                  # blocks spread evenly over the file
+
+
+def compute_checksum(file_path, chunk_size=READ_BUFFER):
+    """SHA256 of the whole file using large reads into one reusable buffer."""
+    sha = hashlib.sha256()
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(file_path, "rb", buffering=0) as f:
+        while n := f.readinto(buf):
+            sha.update(view[:n])
+    return sha.hexdigest()
+
+
+def quick_fingerprint(file_path, samples=SAMPLE_COUNT, block=SAMPLE_BLOCK):
+    """Size, mtime and a hash of evenly spaced blocks; cheap even for 6.7 GB.
+
+    Good enough to tell "same file as last run" in milliseconds; a full
+    SHA256 is still what gets recorded once the file has been read.
+    """
+    stat = Path(file_path).stat()
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        step = max((stat.st_size - block) // max(samples - 1, 1), 1)
+        for i in range(samples):
+            f.seek(min(i * step, max(stat.st_size - block, 0)))
+            sha.update(f.read(block))
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sampled_sha256": sha.hexdigest(),
+    }
+
+
+class BackgroundChecksum(threading.Thread):
+    """Hash a file on a worker thread while something else reads it.
+
+    hashlib releases the GIL on large updates, so this overlaps with DuckDB's
+    own read of the same file and both share the OS page cache.
+    """
+
+    def __init__(self, file_path, chunk_size=READ_BUFFER):
+        super().__init__(daemon=True)
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.hexdigest = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.hexdigest = compute_checksum(self.file_path, self.chunk_size)
+        except Exception as e:
+            self.error = e
+
+    def result(self):
+        self.join()
+        if self.error:
+            raise self.error
+        return self.hexdigest
+
+
+def load_manifest(manifest_path):
+    manifest_path = Path(manifest_path)
+    return json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+
+
+def manifest_matches(manifest, file_path):
+    """True when the manifest's quick fingerprint still describes the file."""
+    recorded = manifest.get("quick_fingerprint")
+    return bool(recorded) and recorded == quick_fingerprint(file_path) and bool(manifest.get("sha256"))
+
+
+def update_manifest(manifest_path, file_path, sha256, **extra):
+    """Record size, SHA256 and quick fingerprint of `file_path` in the manifest."""
+    manifest = load_manifest(manifest_path)
+    size = Path(file_path).stat().st_size
+    manifest.update({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "tsv_file": str(file_path),
+        "file_size_gb": round(size / (1024**3), 2),
+        "file_size_bytes": size,
+        "sha256": sha256,
+        "quick_fingerprint": quick_fingerprint(file_path),
+        **extra,
+    })
+    Path(manifest_path).write_text(json.dumps(manifest, indent=4), encoding="utf-8")
+    return manifest
@@ -1,8 +1,11 @@
+import sys
 import json
-import hashlib
 from datetime import datetime
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.fingerprint import load_manifest, manifest_matches, quick_fingerprint
+
 # === Base project directory ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
 
@@ -11,16 +14,18 @@ tsv_file = base_dir / "data" / "raw" / "unclaimedmusicalworkrightshares.tsv"
 config_path = base_dir / "config" / "settings.toml"
 manifest_path = base_dir / "reports" / "run_manifest.json"
 
-# === Compute SHA256 checksum (lightweight incremental read) ===
-def compute_checksum(file_path, chunk_size=8192):
-    sha = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        while chunk := f.read(chunk_size):
-            sha.update(chunk)
-    return sha.hexdigest()
-
-print(f"Computing checksum for: {tsv_file}")
-checksum = compute_checksum(tsv_file)
+# === SHA256 checksum ===
+# The quick fingerprint (size, mtime, sampled blocks) decides in milliseconds
+# whether the last recorded hash still applies. A new or changed file is not
+# hashed here: ingest_unclaimed_tsv.py computes the SHA256 during its own read
+# and records it in the manifest.
+previous = load_manifest(manifest_path)
+if manifest_matches(previous, tsv_file):
+    print(f"Raw file unchanged since {previous.get('timestamp')}; reusing recorded checksum.")
+    checksum = previous["sha256"]
+else:
+    print("Raw file new or changed; its SHA256 is recorded by the ingestion run.")
+    checksum = None
 
 # === Prepare TOML config ===
 toml_content = f"""
@@ -49,7 +54,9 @@ manifest = {
     "timestamp": datetime.now().isoformat(timespec="seconds"),
     "tsv_file": str(tsv_file),
     "file_size_gb": round(tsv_file.stat().st_size / (1024**3), 2),
+    "file_size_bytes": tsv_file.stat().st_size,
     "sha256": checksum,
+    "quick_fingerprint": quick_fingerprint(tsv_file),
     "db_engine": "DuckDB",
     "config_path": str(config_path),
     "notes": "Initial manifest with file metadata and configuration reference."
@@ -62,4 +69,5 @@ manifest_path.write_text(json.dumps(manifest, indent=4), encoding="utf-8")
 print("\nConfiguration and manifest created successfully.")
 print(f"Config:   {config_path}")
 print(f"Manifest: {manifest_path}")
-print(f"SHA256 checksum: {checksum[:32]}... (truncated)")
+if checksum:
+    print(f"SHA256 checksum: {checksum[:32]}... (truncated)")
@@ -0,0 +1,197 @@
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# === Normalized ISRC key ===
+# Whitespace (space, \t, \n, \v, \f, \r) and hyphens removed anywhere, then
+# only kept when it has the CC-XXX-YY-NNNNN shape (2 letters, 3 alphanumerics,
+# 7 digits), upper-cased. The shape is checked before upper-casing and with
+# ASCII-only classes, so no non-ASCII character can case-map into a valid key.
+# normalize_isrc(), normalize_isrcs() and isrc_norm_sql() / the DuckDB macro
+# normalize_isrc() all implement exactly this.
+ISRC_PATTERN = "[A-Za-z]{2}[A-Za-z0-9]{3}[0-9]{7}"
+ISRC_STRIP = r"[ \t\n\v\f\r-]"
+_isrc_re = re.compile(ISRC_PATTERN)
+_strip_re = re.compile(ISRC_STRIP)
+
+# Vectorized kernel: each chunk of strings is joined into one NUL-separated
+# ASCII buffer (non-ASCII characters become "?", which no ISRC contains) and
+# classified with a lookup table; key boundaries come from cumulative sums,
+# so there is no per-string Python work apart from the join itself.
+KERNEL_CHUNK = 1_000_000
+_STRIP, _DIGIT, _LETTER = 1, 2, 4
+_CLASS = np.zeros(256, dtype=np.uint8)
+_CLASS[[ord(c) for c in " \t\n\v\f\r-"]] = _STRIP
+_CLASS[ord("0"):ord("9") + 1] = _DIGIT
+_CLASS[ord("A"):ord("Z") + 1] = _LETTER
+_CLASS[ord("a"):ord("z") + 1] = _LETTER
+# Class each of the 12 key positions must have: CC XXX YY NNNNN
+_SHAPE = np.array([_LETTER] * 2 + [_LETTER | _DIGIT] * 3 + [_DIGIT] * 7, dtype=np.uint8)
+
+# Up to this many keys are looked up with one index probe each; larger sets
+# go through a hash join, which the isrc_norm sort order keeps cheap.
+INDEX_PROBE_LIMIT = 64
+
+# Hive partition columns of the Parquet export: country + registrant prefix
+PARTITION_COLUMNS_SQL = (
+    "COALESCE(SUBSTR(isrc_norm, 1, 2), 'invalid') AS isrc_country, "
+    "COALESCE(SUBSTR(isrc_norm, 3, 3), 'invalid') AS isrc_registrant"
+)
+
+
+def isrc_norm_sql(col):
+    """SQL expression producing the normalized key (or NULL) for a column."""
+    cleaned = f"regexp_replace({col}, '{ISRC_STRIP}', '', 'g')"
+    return f"CASE WHEN regexp_full_match({cleaned}, '{ISRC_PATTERN}') THEN UPPER({cleaned}) END"
+
+
+# Same expression as a macro, for queries written by hand or in other scripts
+ISRC_MACRO_SQL = f"CREATE OR REPLACE TEMP MACRO normalize_isrc(s) AS {isrc_norm_sql('s')};"
+
+
+def ensure_isrc_macro(con):
+    """Register normalize_isrc(s) on a connection (temp macros are per connection)."""
+    con.execute(ISRC_MACRO_SQL)
+
+
+def normalize_isrc(value):
+    """Python twin of isrc_norm_sql(); returns None for missing/invalid ISRCs."""
+    if value is None or not isinstance(value, str):
+        return None
+    cleaned = _strip_re.sub("", value)
+    return cleaned.upper() if _isrc_re.fullmatch(cleaned) else None
+
+
+def _rows_all(flags):
+    """all() over each row of an (n, 12) bool matrix, as three 4-byte compares."""
+    words = np.ascontiguousarray(flags).view(np.uint32)
+    return (words[:, 0] == 0x01010101) & (words[:, 1] == 0x01010101) & (words[:, 2] == 0x01010101)
+
+
+def _normalize_chunk(values, keys, valid):
+    if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+        missing = pd.isna(values)
+    else:
+        missing = np.fromiter((type(v) is not str for v in values), dtype=bool, count=len(values))
+    text = values.copy()
+    text[missing] = ""
+    buf = np.frombuffer("\0".join(text).encode("ascii", "replace"), dtype=np.uint8)
+    separators = np.flatnonzero(buf == 0)
+    if len(separators) != len(values) - 1:
+        # a string with an embedded NUL breaks the framing; do this chunk one by one
+        keys[:] = [normalize_isrc(v) for v in values]
+        valid[:] = [k is not None for k in keys]
+        return
+    # drop whitespace/hyphens but keep the separators: string i is then
+    # compact[starts[i]:ends[i]], and a candidate key is 12 bytes long
+    lengths = np.diff(separators, prepend=-1, append=len(buf)) - 1
+    compact = buf[(_CLASS[buf] & _STRIP) == 0]
+    ends = np.append(np.flatnonzero(compact == 0), len(compact))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    candidate = (ends - starts == 12) & ~missing
+    if not candidate.any():
+        return
+
+    # gather each key as one 8-byte and one 4-byte load (unaligned views)
+    compact = np.append(compact, np.zeros(8, dtype=np.uint8))
+    first = np.ndarray(len(compact) - 7, dtype=np.uint64, buffer=compact, strides=(1,))
+    last = np.ndarray(len(compact) - 3, dtype=np.uint32, buffer=compact, strides=(1,))
+    at = starts[candidate]
+    chars = np.empty((len(at), 12), dtype=np.uint8)
+    chars[:, :8] = first[at].view(np.uint8).reshape(-1, 8)
+    chars[:, 8:] = last[at + 8].view(np.uint8).reshape(-1, 4)
+    ok = _rows_all((_CLASS[chars] & _SHAPE) != 0)
+    chars = chars[ok]
+    lower = chars >= ord("a")
+    hit = np.flatnonzero(candidate)[ok]
+
+    # already-normalized inputs (the usual Spotify case) are reused as they are
+    as_is = (lengths[hit] == 12) & _rows_all(~lower)
+    keys[hit[as_is]] = values[hit[as_is]]
+    rebuilt = chars[~as_is] - lower[~as_is] * np.uint8(32)
+    keys[hit[~as_is]] = rebuilt.view("S12").ravel().astype("U12").astype(object)
+    valid[hit] = True
+
+
+def normalize_isrcs(values):
+    """Vectorized normalize_isrc() over a Series, array or list.
+
+    Returns (keys, valid): an object array holding the normalized key or None
+    per input, and the boolean validity mask. NaN, None and non-strings are
+    invalid. Results are identical to normalize_isrc() and isrc_norm_sql().
+    """
+    if isinstance(values, (pd.Series, pd.Index)):
+        values = values.to_numpy(dtype=object)
+    else:
+        values = np.asarray(values, dtype=object).reshape(-1)
+    keys = np.full(len(values), None, dtype=object)
+    valid = np.zeros(len(values), dtype=bool)
+    for start in range(0, len(values), KERNEL_CHUNK):
+        stop = start + KERNEL_CHUNK
+        _normalize_chunk(values[start:stop], keys[start:stop], valid[start:stop])
+    return keys, valid
+
+
+def parquet_source_sql(parquet_dir):
+    """read_parquet() over the partitioned export, usable in place of the table."""
+    return f"read_parquet('{Path(parquet_dir).as_posix()}/**/*.parquet', hive_partitioning = true)"
+
+
+def add_parquet_argument(parser, export_dir):
+    """--parquet [DIR]: read unclaimed rights from the partitioned export (default DIR: `export_dir`)."""
+    parser.add_argument("--parquet", nargs="?", type=Path, const=Path(export_dir), default=None, metavar="DIR",
+                        help=f"read unclaimed rights from the partitioned Parquet export (default: {export_dir})")
+
+
+def parquet_arg(parser, args):
+    """args.parquet, checked to be a finished export (it has _partitions.csv); None reads the table."""
+    if args.parquet is not None and not (args.parquet / "_partitions.csv").exists():
+        parser.error(f"{args.parquet} has no _partitions.csv; run export/export_unclaimed_parquet.py first")
+    return args.parquet
+
+
+def all_columns_sql(parquet_dir=None):
+    """`SELECT *` list for unclaimed rights; the export's partition columns are left out, as the table has none."""
+    return "* EXCLUDE (isrc_country, isrc_registrant)" if parquet_dir else "*"
+
+
+def match_isrc_keys(con, keys, columns="*", parquet_dir=None):
+    """Fetch unclaimed_rights rows whose isrc_norm is in `keys`.
+
+    Small key sets become a UNION ALL of point lookups so every branch is an
+    idx_isrc_norm probe; DuckDB does not use the index for IN lists. With
+    `parquet_dir` the partitioned export is queried instead, and each probe
+    also filters on its country/registrant so only matching folders are read.
+    """
+    keys = sorted({k for k in keys if k})
+    source = parquet_source_sql(parquet_dir) if parquet_dir else "unclaimed_rights"
+    if columns == "*":
+        columns = all_columns_sql(parquet_dir)
+    if not keys:
+        return con.execute(f"SELECT {columns} FROM {source} LIMIT 0;").fetchdf()
+
+    if parquet_dir:
+        prune = "isrc_country = ? AND isrc_registrant = ? AND "
+        params = [p for k in keys for p in (k[:2], k[2:5], k)]
+        if len(keys) > INDEX_PROBE_LIMIT:
+            countries = sorted({k[:2] for k in keys})
+            registrants = sorted({k[2:5] for k in keys})
+            prune = (f"isrc_country IN ({', '.join('?' * len(countries))}) AND "
+                     f"isrc_registrant IN ({', '.join('?' * len(registrants))}) AND ")
+            params = countries + registrants
+    else:
+        prune = ""
+        params = list(keys)
+
+    if len(keys) <= INDEX_PROBE_LIMIT:
+        probe = f"SELECT {columns} FROM {source} WHERE {prune}isrc_norm = ?"
+        return con.execute(" UNION ALL ".join([probe] * len(keys)) + ";", params).fetchdf()
+    con.register("match_keys", pd.DataFrame({"isrc_norm": keys}))
+    try:
+        return con.execute(
+            f"SELECT {columns} FROM {source} WHERE {prune}isrc_norm IN (SELECT isrc_norm FROM match_keys);",
+            params if parquet_dir else None,
+        ).fetchdf()
+    finally:
+        con.unregister("match_keys")
@@ -0,0 +1,86 @@
+import argparse
+import duckdb
+import shutil
+import sys
+import time
+import traceback
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import PARTITION_COLUMNS_SQL
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+parquet_dir = base_dir / "data" / "processed" / "unclaimed_parquet"
+log_path = base_dir / "logs" / "08_parquet_export.log"
+
+# === Parameters ===
+row_group_size = 122_880   # DuckDB default; keeps zonemaps on isrc_norm tight
+
+def log(msg):
+    print(msg)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+def export_partitioned(con, out_dir, countries=None):
+    """Write unclaimed_rights as hive-partitioned, zstd Parquet.
+
+    Partitions are isrc_country=CC/isrc_registrant=XXX, taken from the
+    normalized key; rows without a valid ISRC land under 'invalid'. Passing
+    `countries` writes only those country slices. Returns the partition
+    inventory as a DataFrame (also saved as _partitions.csv).
+    """
+    out_dir = Path(out_dir)
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    where = ""
+    params = []
+    if countries:
+        where = f"WHERE SUBSTR(isrc_norm, 1, 2) IN ({', '.join('?' * len(countries))})"
+        params = [c.upper() for c in countries]
+
+    con.execute(f"""
+        COPY (
+            SELECT *, {PARTITION_COLUMNS_SQL}
+            FROM unclaimed_rights
+            {where}
+            ORDER BY isrc_norm
+        ) TO '{out_dir.as_posix()}'
+        (FORMAT PARQUET, PARTITION_BY (isrc_country, isrc_registrant),
+         COMPRESSION ZSTD, ROW_GROUP_SIZE {row_group_size});
+    """, params)
+
+    # Inventory lets workers claim disjoint partitions without listing the tree
+    inventory = con.execute(f"""
+        SELECT isrc_country, isrc_registrant, COUNT(*) AS row_count
+        FROM read_parquet('{out_dir.as_posix()}/**/*.parquet', hive_partitioning = true)
+        GROUP BY ALL
+        ORDER BY row_count DESC;
+    """).fetchdf()
+    inventory.to_csv(out_dir / "_partitions.csv", index=False)
+    return inventory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export unclaimed_rights as partitioned Parquet.")
+    parser.add_argument("--countries", nargs="*", help="only export these ISRC country codes (e.g. GB US)")
+    parser.add_argument("--out", type=Path, default=parquet_dir, help="output dataset directory")
+    args = parser.parse_args()
+
+    try:
+        log("Starting partitioned Parquet export\n")
+        con = duckdb.connect(str(db_path), read_only=True)
+        con.execute("PRAGMA threads=4;")
+        start = time.perf_counter()
+        inventory = export_partitioned(con, args.out, args.countries)
+        con.close()
+        log(f"Partitions written: {len(inventory):,} | Rows: {inventory['row_count'].sum():,} | {time.perf_counter() - start:.1f}s")
+        log(f"Dataset: {args.out}\n")
+    except Exception as main_err:
+        log(f"Fatal error: {main_err}")
+        traceback.print_exc(file=sys.stdout)
+        sys.exit(1)
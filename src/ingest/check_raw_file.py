@@ -1,28 +1,167 @@
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.fingerprint import quick_fingerprint
+from core.isrc_keys import normalize_isrcs
+
 # === Absolute path to your TSV file ===
 tsv_path = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment\data\raw\unclaimedmusicalworkrightshares.tsv")
+profile_path = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment\reports\raw_tsv_profile.json")
 
-# === Basic existence and size checks ===
-if not tsv_path.exists():
-    raise FileNotFoundError(f"File not found: {tsv_path}")
+# === Parameters ===
+block_size = 64 * 1024 * 1024     # bytes a worker splits into lines at once
+max_bad_ranges = 10_000           # per worker; counts stay exact past this
+target_batch_bytes = 64 * 1024 * 1024   # what the suggested ingest chunk should weigh
 
-size_gb = tsv_path.stat().st_size / (1024**3)
-print(f"File found at: {tsv_path}")
-print(f"File size: {size_gb:.2f} GB")
 
-# === Read first few lines safely (no full load) ===
-print("\nPreviewing first 5 lines:")
-with open(tsv_path, "r", encoding="utf-8", errors="ignore") as f:
-    for i in range(5):
-        line = f.readline()
-        if not line:
+def split_ranges(mm, start, end, parts):
+    """Cut [start, end) into `parts` byte ranges that begin on line starts."""
+    bounds = [start]
+    step = max((end - start) // parts, 1)
+    for i in range(1, parts):
+        pos = mm.find(b"\n", max(start + i * step, bounds[-1]), end)
+        if pos == -1:
             break
-        print(f"{i+1:>2}: {line.strip()[:300]}")  # print first 300 chars per line for safety
-
-# === Quick delimiter sanity check ===
-with open(tsv_path, "r", encoding="utf-8", errors="ignore") as f:
-    header = f.readline()
-    columns = header.strip().split("\t")
-    print(f"\nDetected {len(columns)} columns in header.")
-    print("Column sample:", columns[:10])
+        if pos + 1 > bounds[-1]:
+            bounds.append(pos + 1)
+    bounds.append(end)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def profile_range(args):
+    """Profile one newline-aligned byte range of the file (runs in a worker)."""
+    path, start, end, n_cols, isrc_col = args
+    rows = malformed = isrc_violations = 0
+    filled = [0] * n_cols
+    widths = [0] * n_cols
+    bad_ranges = []
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos < end:
+            block_end = min(pos + block_size, end)
+            if block_end < end:
+                nl = mm.rfind(b"\n", pos, block_end)
+                block_end = nl + 1 if nl >= pos else end
+            offset = pos
+            isrcs = []
+            for line in mm[pos:block_end].split(b"\n"):
+                line_start = offset
+                offset += len(line) + 1
+                if not line:
+                    continue
+                rows += 1
+                fields = line.rstrip(b"\r").split(b"\t")
+                if len(fields) != n_cols:
+                    malformed += 1
+                    line_end = min(offset, end)
+                    if bad_ranges and bad_ranges[-1][1] == line_start:
+                        bad_ranges[-1][1] = line_end
+                    elif len(bad_ranges) < max_bad_ranges:
+                        bad_ranges.append([line_start, line_end])
+                    continue
+                for i, value in enumerate(fields):
+                    if value:
+                        filled[i] += 1
+                        if len(value) > widths[i]:
+                            widths[i] = len(value)
+                if fields[isrc_col]:
+                    isrcs.append(fields[isrc_col].decode("utf-8", "ignore"))
+            # validated once per block with the vectorized kernel
+            isrc_violations += int((~normalize_isrcs(isrcs)[1]).sum())
+            pos = block_end
+
+    return {
+        "rows": rows,
+        "malformed": malformed,
+        "isrc_violations": isrc_violations,
+        "filled": filled,
+        "widths": widths,
+        "bad_ranges": bad_ranges,
+        "bytes": end - start,
+    }
+
+
+def profile_tsv(path, workers=None):
+    """Single parallel pass over the TSV; returns the profile dict."""
+    workers = workers or os.cpu_count() or 1
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_end = mm.find(b"\n") + 1 or len(mm)
+        header = mm[:header_end].decode("utf-8", "ignore").strip().split("\t")
+        ranges = split_ranges(mm, header_end, len(mm), workers * 4)
+
+    columns = [c.strip().replace("#", "") for c in header]
+    isrc_col = columns.index("ISRC")
+    tasks = [(str(path), a, b, len(columns), isrc_col) for a, b in ranges]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(profile_range, tasks))
+
+    rows = sum(p["rows"] for p in parts)
+    valid = rows - sum(p["malformed"] for p in parts)
+    avg_row_bytes = sum(p["bytes"] for p in parts) / max(rows, 1)
+    return {
+        "file": str(path),
+        "fingerprint": quick_fingerprint(path),
+        "columns": columns,
+        "total_rows": rows,
+        "malformed_rows": rows - valid,
+        "isrc_format_violations": sum(p["isrc_violations"] for p in parts),
+        "column_stats": {
+            name: {
+                "fill_rate": round(sum(p["filled"][i] for p in parts) / max(valid, 1), 4),
+                "max_width": max((p["widths"][i] for p in parts), default=0),
+            }
+            for i, name in enumerate(columns)
+        },
+        "avg_row_bytes": round(avg_row_bytes, 1),
+        "suggested_chunksize": int(min(max(target_batch_bytes / max(avg_row_bytes, 1), 10_000), 500_000)),
+        "bad_byte_ranges": [r for p in parts for r in p["bad_ranges"]],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the raw unclaimed-rights TSV in one parallel pass.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    # === Basic existence and size checks ===
+    if not tsv_path.exists():
+        raise FileNotFoundError(f"File not found: {tsv_path}")
+
+    size_gb = tsv_path.stat().st_size / (1024**3)
+    print(f"File found at: {tsv_path}")
+    print(f"File size: {size_gb:.2f} GB")
+
+    # === Read first few lines safely (no full load) ===
+    print("\nPreviewing first 5 lines:")
+    with open(tsv_path, "r", encoding="utf-8", errors="ignore") as f:
+        for i in range(5):
+            line = f.readline()
+            if not line:
+                break
+            print(f"{i+1:>2}: {line.strip()[:300]}")  # print first 300 chars per line for safety
+
+    # === Full parallel profile ===
+    start = time.perf_counter()
+    profile = profile_tsv(tsv_path, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nDetected {len(profile['columns'])} columns in header.")
+    print(f"Rows: {profile['total_rows']:,} | Malformed: {profile['malformed_rows']:,} | "
+          f"ISRC format violations: {profile['isrc_format_violations']:,}")
+    print("\nColumn fill rates:")
+    for name, stats in profile["column_stats"].items():
+        print(f" - {name:<40} {stats['fill_rate']:>7.2%}  (max width {stats['max_width']})")
+    print(f"\nBad byte ranges: {len(profile['bad_byte_ranges']):,}")
+    print(f"Suggested ingest chunksize: {profile['suggested_chunksize']:,} rows")
+
+    profile_path.parent.mkdir(parents=True, exist_ok=True)
+    profile_path.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+    print(f"\nProfile written to: {profile_path} ({elapsed:.1f}s)")
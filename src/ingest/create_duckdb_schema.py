@@ -1,6 +1,10 @@
+import sys
 import duckdb
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from ingest.unclaimed_schema import ensure_table
+
 # === Base project directory ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
 
@@ -12,28 +16,13 @@ con = duckdb.connect(str(db_path))
 print(f"Connected to DuckDB database at:\n{db_path}\n")
 
 # === Define schema based on TSV columns ===
-# We mirror the header line detected earlier (13 columns)
-create_table_sql = """
-CREATE TABLE IF NOT EXISTS unclaimed_rights (
-    UnclaimedMusicalWorkRightShareRecordId BIGINT,
-    ResourceRecordId TEXT,
-    MusicalWorkRecordId TEXT,
-    ISRC TEXT,
-    DspResourceId TEXT,
-    ResourceTitle TEXT,
-    ResourceSubTitle TEXT,
-    AlternativeResourceTitle TEXT,
-    DisplayArtistName TEXT,
-    DisplayArtistISNI TEXT,
-    Duration INT,
-    UnclaimedRightSharePercentage DOUBLE,
-    PercentileForPrioritisation DOUBLE
-);
-"""
-
-# === Execute schema creation ===
-con.execute(create_table_sql)
-print("Table 'unclaimed_rights' created (if not already exists).")
+# We mirror the header line detected earlier (13 columns) plus the derived
+# isrc_norm key; the column list is shared with the ingestion engines via
+# unclaimed_schema.py
+
+# === Execute schema creation (adds derived columns to an existing table) ===
+ensure_table(con)
+print("Table 'unclaimed_rights' created (if not already exists) and up to date.")
 
 # === Verify structure ===
 result = con.execute("PRAGMA table_info('unclaimed_rights');").fetchall()
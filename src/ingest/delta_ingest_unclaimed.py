@@ -0,0 +1,207 @@
+import json
+import duckdb
+import sys
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from ingest.unclaimed_schema import COLUMNS, CAST_SELECT_SQL, ensure_table, read_csv_sql
+from ingest.ingest_unclaimed_tsv import CHECKPOINT_SQL, save_checkpoint
+from core.fingerprint import BackgroundChecksum, compute_checksum, load_manifest, manifest_matches, update_manifest
+from match.isrc_index import clear_source, record_source
+from match.lookup_client import LookupClient
+from match.match_store import ensure_match_tables, needs_rebuild, sync as sync_matches
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+tsv_file = base_dir / "data" / "raw" / "unclaimedmusicalworkrightshares.tsv"
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+manifest_path = base_dir / "reports" / "run_manifest.json"
+summary_path = base_dir / "reports" / "delta_summary.json"
+affected_csv = base_dir / "reports" / "delta_affected_isrcs.csv"
+log_path = base_dir / "logs" / "04C_delta_ingestion.log"
+
+KEY = "UnclaimedMusicalWorkRightShareRecordId"
+
+# === Change log consumed by downstream matching ===
+CHANGES_SQL = """
+CREATE TABLE IF NOT EXISTS unclaimed_rights_changes (
+    record_id BIGINT,
+    change_type TEXT,
+    old_isrc TEXT,
+    new_isrc TEXT,
+    applied_at TIMESTAMP
+);
+"""
+
+def log(msg):
+    print(msg)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+def file_unchanged(tsv_path, manifest):
+    """True when the file is the one recorded in the manifest.
+
+    The quick fingerprint answers without reading the file; otherwise a
+    differing size settles it, and only a same-size file is fully hashed.
+    """
+    if manifest_matches(manifest, tsv_path):
+        return True
+    if not manifest.get("sha256"):   # init_project.py leaves it to the ingestion run
+        return False
+    if manifest.get("file_size_bytes") not in (None, Path(tsv_path).stat().st_size):
+        return False
+    return compute_checksum(tsv_path) == manifest.get("sha256")
+
+
+def diff_into_staging(con, tsv_path):
+    """Load the new drop into a staging table and classify every changed key.
+
+    Fills unclaimed_rights_delta with one row per inserted, updated or
+    removed record id. Returns {change_type: count}.
+    """
+    con.execute("DROP TABLE IF EXISTS unclaimed_rights_staging;")
+    con.execute("CREATE TABLE unclaimed_rights_staging AS SELECT * FROM unclaimed_rights LIMIT 0;")
+    con.execute(
+        f"INSERT INTO unclaimed_rights_staging {CAST_SELECT_SQL} FROM {read_csv_sql()};",
+        [str(tsv_path)],
+    )
+
+    # Row fingerprint over every non-key column; NULLs hash consistently
+    row_hash = "hash({})".format(", ".join(c for c in COLUMNS if c != KEY))
+    con.execute(f"""
+        CREATE OR REPLACE TABLE unclaimed_rights_delta AS
+        WITH n AS (SELECT {KEY} AS id, ISRC, {row_hash} AS h FROM unclaimed_rights_staging),
+             o AS (SELECT {KEY} AS id, ISRC, {row_hash} AS h FROM unclaimed_rights)
+        SELECT
+            COALESCE(n.id, o.id) AS record_id,
+            CASE WHEN o.id IS NULL THEN 'inserted'
+                 WHEN n.id IS NULL THEN 'removed'
+                 ELSE 'updated' END AS change_type,
+            o.ISRC AS old_isrc,
+            n.ISRC AS new_isrc
+        FROM n FULL OUTER JOIN o ON n.id = o.id
+        WHERE o.id IS NULL OR n.id IS NULL OR n.h <> o.h;
+    """)
+    rows = con.execute(
+        "SELECT change_type, COUNT(*) FROM unclaimed_rights_delta GROUP BY change_type;"
+    ).fetchall()
+    return {change: count for change, count in rows}
+
+
+def apply_delta(con, tsv_path):
+    """Apply unclaimed_rights_delta to unclaimed_rights in one transaction."""
+    applied_at = datetime.now()
+    con.execute(CHANGES_SQL)
+    con.execute(CHECKPOINT_SQL)
+    con.begin()
+    try:
+        con.execute(f"""
+            DELETE FROM unclaimed_rights
+            WHERE {KEY} IN (SELECT record_id FROM unclaimed_rights_delta
+                            WHERE change_type IN ('removed', 'updated'));
+        """)
+        con.execute(f"""
+            INSERT INTO unclaimed_rights
+            SELECT * FROM unclaimed_rights_staging
+            WHERE {KEY} IN (SELECT record_id FROM unclaimed_rights_delta
+                            WHERE change_type IN ('inserted', 'updated'));
+        """)
+        con.execute(
+            "INSERT INTO unclaimed_rights_changes "
+            "SELECT record_id, change_type, old_isrc, new_isrc, ? FROM unclaimed_rights_delta;",
+            [applied_at],
+        )
+        row_count, last_id = con.execute(f"SELECT COUNT(*), MAX({KEY}) FROM unclaimed_rights;").fetchone()
+        # stamped with applied_at so match_store can tell this checkpoint came from a delta
+        save_checkpoint(con, tsv_path, Path(tsv_path).stat().st_size, 1, row_count, last_id, completed=True,
+                        updated_at=applied_at)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return applied_at
+
+
+def write_change_summary(con, tsv_path, counts, applied_at, sha):
+    """Write the JSON summary and the distinct ISRCs touched by this delta."""
+    affected = con.execute("""
+        SELECT DISTINCT isrc FROM (
+            SELECT old_isrc AS isrc FROM unclaimed_rights_delta
+            UNION ALL
+            SELECT new_isrc FROM unclaimed_rights_delta
+        ) WHERE isrc IS NOT NULL ORDER BY isrc;
+    """).fetchdf()
+    affected.to_csv(affected_csv, index=False)
+
+    summary = {
+        "applied_at": applied_at.isoformat(timespec="seconds"),
+        "tsv_file": str(tsv_path),
+        "sha256": sha,
+        "inserted": counts.get("inserted", 0),
+        "updated": counts.get("updated", 0),
+        "removed": counts.get("removed", 0),
+        "affected_isrcs": len(affected),
+        "affected_isrcs_csv": str(affected_csv),
+    }
+    summary_path.write_text(json.dumps(summary, indent=4), encoding="utf-8")
+    return summary
+
+
+def main():
+    log("Starting delta ingestion\n")
+    log(f"Input file: {tsv_file}")
+    log(f"Output DB : {db_path}\n")
+
+    manifest = load_manifest(manifest_path)
+    if file_unchanged(tsv_file, manifest):
+        log("File matches run_manifest.json; nothing to apply.\n")
+        return
+
+    con = duckdb.connect(str(db_path))
+    con.execute("PRAGMA threads=4;")
+    ensure_table(con)
+    # a full reload since the last match sync is only visible before this delta moves the checkpoint
+    ensure_match_tables(con)
+    rebuild_matches = needs_rebuild(con)
+
+    # Hash the new drop while DuckDB stages it, instead of in a separate pass
+    start = time.perf_counter()
+    checksum = BackgroundChecksum(tsv_file)
+    checksum.start()
+    counts = diff_into_staging(con, tsv_file)
+    sha = checksum.result()
+    log(f"Inserted: {counts.get('inserted', 0):,} | Updated: {counts.get('updated', 0):,} | Removed: {counts.get('removed', 0):,}")
+
+    clear_source(db_path)
+    applied_at = apply_delta(con, tsv_file)
+    summary = write_change_summary(con, tsv_file, counts, applied_at, sha)
+    con.execute("DROP TABLE IF EXISTS unclaimed_rights_staging;")
+    # re-match only the ISRCs this delta touched (match/match_store.py)
+    synced = sync_matches(con, force_rebuild=rebuild_matches)
+    log(f"isrc_matches / artist_coverage synced ({synced['mode']}): {synced}")
+    record_source(con, db_path)
+    con.close()
+
+    # a running lookup service re-reads unclaimed_rights now that the file lock is released
+    lookup = LookupClient()
+    if lookup.available():
+        info = lookup.reload()
+        log(f"Lookup service reloaded: {info['rows']:,} rows")
+
+    update_manifest(manifest_path, tsv_file, sha)
+    log(f"Delta applied in {time.perf_counter() - start:.1f}s; {summary['affected_isrcs']:,} ISRCs affected.")
+    log(f"Change summary: {summary_path}")
+    log(f"Affected ISRCs: {affected_csv}\n")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as main_err:
+        log(f"Fatal error: {main_err}")
+        traceback.print_exc(file=sys.stdout)
+        sys.exit(1)
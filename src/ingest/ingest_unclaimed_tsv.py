@@ -1,19 +1,36 @@
+import argparse
+import bisect
+import csv
+import hashlib
+import io
+import json
 import duckdb
 import pandas as pd
+from datetime import datetime
+from itertools import islice
 from tqdm import tqdm
 from pathlib import Path
 import sys
+import time
 import traceback
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from ingest.unclaimed_schema import CAST_SELECT_SQL, ensure_table, read_csv_sql
+from match.isrc_index import clear_source, record_source
+from core.fingerprint import BackgroundChecksum, load_manifest, manifest_matches, quick_fingerprint, update_manifest
+
 # === Base paths ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
 tsv_file = base_dir / "data" / "raw" / "unclaimedmusicalworkrightshares.tsv"
 db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
 log_path = base_dir / "logs" / "04B_ingestion.log"
+manifest_path = base_dir / "reports" / "run_manifest.json"
+profile_path = base_dir / "reports" / "raw_tsv_profile.json"
 
 # === Parameters ===
 chunksize = 100_000      # rows per batch (~manageable on 8–16 GB RAM)
 max_preview = 5           # print sample after each commit
+threads = 4               # DuckDB worker threads
 
 # === Logging utility ===
 def log(msg):
@@ -21,72 +38,475 @@ def log(msg):
     with open(log_path, "a", encoding="utf-8") as f:
         f.write(msg + "\n")
 
-# === Begin process ===
-try:
+
+# === Checkpoint table (lives inside unclaimed.duckdb) ===
+# One row per source file, rewritten in the same transaction as each batch
+# insert so the recorded offset always matches what is committed.
+CHECKPOINT_SQL = """
+CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+    source_file TEXT PRIMARY KEY,
+    file_size BIGINT,
+    byte_offset BIGINT,
+    batch_no INTEGER,
+    row_count BIGINT,
+    last_record_id BIGINT,
+    completed BOOLEAN,
+    updated_at TIMESTAMP
+);
+"""
+
+
+# Errors about the table rather than the data: quarantining rows cannot fix
+# them, so they abort the load instead of rejecting every line
+SCHEMA_ERRORS = (duckdb.BinderException, duckdb.CatalogException)
+
+
+# === Quarantine for rows that cannot be loaded ===
+REJECTS_SQL = """
+CREATE TABLE IF NOT EXISTS unclaimed_rights_rejects (
+    source_file TEXT,
+    byte_offset BIGINT,
+    raw_line TEXT,
+    error TEXT,
+    rejected_at TIMESTAMP
+);
+"""
+
+
+def load_checkpoint(con, tsv_path):
+    """Return the checkpoint row for this file as a dict, or None."""
+    con.execute(CHECKPOINT_SQL)
+    row = con.execute(
+        "SELECT file_size, byte_offset, batch_no, row_count, last_record_id, completed "
+        "FROM ingest_checkpoint WHERE source_file = ?;",
+        [str(tsv_path)],
+    ).fetchone()
+    if row is None:
+        return None
+    keys = ["file_size", "byte_offset", "batch_no", "row_count", "last_record_id", "completed"]
+    return dict(zip(keys, row))
+
+
+def save_checkpoint(con, tsv_path, byte_offset, batch_no, row_count, last_record_id, completed=False, updated_at=None):
+    """Upsert the checkpoint; call inside the batch transaction."""
+    con.execute(
+        "INSERT OR REPLACE INTO ingest_checkpoint VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+        [str(tsv_path), Path(tsv_path).stat().st_size, byte_offset, batch_no,
+         row_count, last_record_id, completed, updated_at or datetime.now()],
+    )
+
+
+def reset_ingestion(con, tsv_path):
+    """Forget progress for this file and empty the target table."""
+    con.execute(CHECKPOINT_SQL)
+    con.execute(REJECTS_SQL)
+    con.begin()
+    con.execute("DELETE FROM unclaimed_rights;")
+    con.execute("DELETE FROM ingest_checkpoint WHERE source_file = ?;", [str(tsv_path)])
+    con.execute("DELETE FROM unclaimed_rights_rejects WHERE source_file = ?;", [str(tsv_path)])
+    con.commit()
+
+
+def ingest_native(con, tsv_path):
+    """Load the whole TSV with DuckDB's multi-threaded CSV reader.
+
+    Runs as a single transaction together with the checkpoint, so a failure
+    leaves both the table and the checkpoint untouched.
+    Returns the number of rows inserted.
+    """
+    con.execute(CHECKPOINT_SQL)
+    start = time.perf_counter()
+    con.begin()
+    try:
+        inserted = con.execute(
+            f"INSERT INTO unclaimed_rights {CAST_SELECT_SQL} FROM {read_csv_sql()};",
+            [str(tsv_path)],
+        ).fetchone()[0]
+        last_id = con.execute("SELECT MAX(UnclaimedMusicalWorkRightShareRecordId) FROM unclaimed_rights;").fetchone()[0]
+        save_checkpoint(con, tsv_path, Path(tsv_path).stat().st_size, 1, inserted, last_id, completed=True)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    elapsed = time.perf_counter() - start
+    log(f"Native load | Rows: {inserted:,} | {elapsed:.1f}s | {inserted / max(elapsed, 1e-9):,.0f} rows/sec")
+    return inserted
+
+
+def load_profile(tsv_path, path=profile_path):
+    """Profile written by check_raw_file.py, or None if it is for another file."""
+    if not Path(path).exists():
+        return None
+    profile = json.loads(Path(path).read_text(encoding="utf-8"))
+    return profile if profile.get("fingerprint") == quick_fingerprint(tsv_path) else None
+
+
+def with_offsets(lines, offset):
+    """Pair each raw line with the byte offset it starts at."""
+    items = []
+    for line in lines:
+        items.append((offset, line))
+        offset += len(line)
+    return items
+
+
+def split_known_bad(items, bad_ranges):
+    """Separate lines starting inside a profiled bad byte range.
+
+    `bad_ranges` is the sorted [start, end) list from the profile; returns
+    (kept items, bad items).
+    """
+    starts = [r[0] for r in bad_ranges]
+    kept, bad = [], []
+    for offset, line in items:
+        i = bisect.bisect_right(starts, offset) - 1
+        if i < 0 or offset >= bad_ranges[i][1]:
+            kept.append((offset, line))
+        else:
+            bad.append((offset, line))
+    return kept, bad
+
+
+def unquote_fields(df):
+    """Apply read_csv_sql()'s quote rule (quote and escape '"') to fields parsed with QUOTE_NONE.
+
+    A field wrapped in double quotes loses them and `""` inside becomes `"`,
+    so both engines (and the delta diff) store the same text.
+    """
+    for col in df.columns:
+        s = df[col]
+        quoted = s.notna() & (s.str.len() >= 2) & s.str.startswith('"') & s.str.endswith('"')
+        if quoted.any():
+            df.loc[quoted, col] = s[quoted].str[1:-1].str.replace('""', '"', regex=False)
+    return df
+
+
+def parse_lines(header, lines):
+    """Parse raw TSV lines (bytes) into a DataFrame using the file header.
+
+    Parsed with QUOTE_NONE, as batches are cut on raw lines and a field
+    opening with `"` must not swallow the lines after it; quotes are then
+    removed per field the way the native reader does.
+    """
+    df = pd.read_csv(io.BytesIO(header + b"".join(lines)), sep="\t", dtype=str, low_memory=False,
+                     quoting=csv.QUOTE_NONE)
+    # Normalize column names (strip spaces, rename if header mismatch)
+    df.columns = [c.strip().replace("#", "") for c in df.columns]
+    return unquote_fields(df)
+
+
+def insert_lines(con, header, lines, table):
+    """Parse and insert lines into `table`; returns the parsed DataFrame.
+
+    Raises ValueError when the lines do not parse to one row each, so the
+    batch is bisected instead of losing rows silently.
+    """
+    df = parse_lines(header, lines)
+    if len(df) != len(lines):
+        raise ValueError(f"{len(lines)} line(s) parsed to {len(df)} row(s)")
+    con.register("chunk_df", df)
+    try:
+        con.execute(f"INSERT INTO {table} {CAST_SELECT_SQL} FROM chunk_df;")
+    finally:
+        con.unregister("chunk_df")
+    return df
+
+
+def bisect_lines(con, header, items):
+    """Load what parses from a failed batch into batch_staging.
+
+    Halves the (offset, line) list until each failing piece is one line;
+    every INSERT runs on its own, so a failure only discards that piece.
+    Returns the rejected items as (offset, line, error). SCHEMA_ERRORS are
+    raised rather than pinned on a line.
+    """
+    try:
+        insert_lines(con, header, [line for _, line in items], "batch_staging")
+        return []
+    except SCHEMA_ERRORS:
+        raise
+    except Exception as e:
+        if len(items) == 1:
+            return [(items[0][0], items[0][1], str(e).splitlines()[0])]
+        mid = len(items) // 2
+        return bisect_lines(con, header, items[:mid]) + bisect_lines(con, header, items[mid:])
+
+
+def save_rejects(con, tsv_path, rejects):
+    """Write (offset, line, error) rows to unclaimed_rights_rejects."""
+    if rejects:
+        now = datetime.now()
+        con.executemany(
+            "INSERT INTO unclaimed_rights_rejects VALUES (?, ?, ?, ?, ?);",
+            [[str(tsv_path), offset, line.decode("utf-8", "replace").rstrip("\r\n"), error, now]
+             for offset, line, error in rejects],
+        )
+
+
+def last_id_of(df, current):
+    ids = pd.to_numeric(df["UnclaimedMusicalWorkRightShareRecordId"], errors="coerce").dropna()
+    return int(ids.iloc[-1]) if len(ids) else current
+
+
+def ingest_pandas(con, tsv_path, chunksize=chunksize, checkpoint=None, hasher=None, bad_ranges=None):
+    """Stream the TSV through pandas in fixed-size batches.
+
+    Slower than the native reader but tolerant of files DuckDB's sniffer
+    rejects. Each batch commits together with a checkpoint holding the byte
+    offset just past it; passing that checkpoint back in seeks straight to
+    the offset and carries on. A hashlib `hasher` is fed every byte read, so
+    a full load yields the file checksum without a second pass.
+
+    A batch that fails is bisected down to the offending lines: good rows are
+    still committed, bad ones go to unclaimed_rights_rejects with their byte
+    offset and error. Lines in `bad_ranges` (from the raw-file profile) are
+    quarantined without parsing. Returns (rows inserted, rows rejected).
+    """
+    byte_offset = checkpoint["byte_offset"] if checkpoint else 0
+    chunk_no = checkpoint["batch_no"] if checkpoint else 0
+    total_rows = checkpoint["row_count"] if checkpoint else 0
+    last_record_id = checkpoint["last_record_id"] if checkpoint else None
+    rejected_rows = 0
+    inserted_rows = 0
+    con.execute(CHECKPOINT_SQL)
+    con.execute(REJECTS_SQL)
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS batch_staging AS SELECT * FROM unclaimed_rights LIMIT 0;")
+    start = time.perf_counter()
+
+    with open(tsv_path, "rb") as f:
+        header = f.readline()
+        if hasher is not None:
+            hasher.update(header)
+        if byte_offset:
+            f.seek(byte_offset)
+            log(f"Resuming at byte {byte_offset:,} after batch {chunk_no} ({total_rows:,} rows already committed)")
+        else:
+            byte_offset = len(header)
+
+        # --- Stream read in chunks ---
+        while lines := list(islice(f, chunksize)):
+            chunk_no += 1
+            batch_end = byte_offset + sum(len(line) for line in lines)
+            if hasher is not None:
+                hasher.update(b"".join(lines))
+            items = with_offsets(lines, byte_offset)
+            rejects = []
+            if bad_ranges:
+                items, bad = split_known_bad(items, bad_ranges)
+                rejects = [(offset, line, "malformed line (raw-file profile)") for offset, line in bad]
+                lines = [line for _, line in items]
+
+            # Fast path: the whole batch in one INSERT
+            con.begin()
+            try:
+                df = insert_lines(con, header, lines, "unclaimed_rights")
+                batch_rows = len(df)
+                last_record_id = last_id_of(df, last_record_id)
+                save_rejects(con, tsv_path, rejects)
+                save_checkpoint(con, tsv_path, batch_end, chunk_no, total_rows + batch_rows, last_record_id)
+                con.commit()
+
+            except Exception as e:
+                con.rollback()
+                if isinstance(e, SCHEMA_ERRORS):
+                    raise
+                log(f"Error in batch {chunk_no}: {str(e).splitlines()[0]} -- isolating bad rows")
+
+                # Slow path: bisect into staging, then commit staging + rejects + checkpoint together
+                con.execute("DELETE FROM batch_staging;")
+                rejects += bisect_lines(con, header, items)
+                con.begin()
+                batch_rows = con.execute("INSERT INTO unclaimed_rights SELECT * FROM batch_staging;").fetchone()[0]
+                last_record_id = con.execute(
+                    "SELECT COALESCE(MAX(UnclaimedMusicalWorkRightShareRecordId), ?) FROM batch_staging;",
+                    [last_record_id],
+                ).fetchone()[0]
+                save_rejects(con, tsv_path, rejects)
+                save_checkpoint(con, tsv_path, batch_end, chunk_no, total_rows + batch_rows, last_record_id)
+                con.commit()
+                con.execute("DELETE FROM batch_staging;")
+
+            if rejects:
+                rejected_rows += len(rejects)
+                log(f"Batch {chunk_no:05d} | Quarantined {len(rejects)} row(s) to unclaimed_rights_rejects")
+
+            byte_offset = batch_end
+            total_rows += batch_rows
+            inserted_rows += batch_rows
+            rate = inserted_rows / max(time.perf_counter() - start, 1e-9)
+            log(f"Batch {chunk_no:05d} | Rows: {batch_rows:>6} | Total inserted: {total_rows:,} | {rate:,.0f} rows/sec")
+
+            if chunk_no % 10 == 0:  # show small sample every 10th batch
+                preview = con.execute("SELECT * FROM unclaimed_rights LIMIT ?;", [max_preview]).fetchdf()
+                log(f"Sample rows after batch {chunk_no}:\n{preview}\n")
+
+    con.begin()
+    save_checkpoint(con, tsv_path, byte_offset, chunk_no, total_rows, last_record_id, completed=True)
+    con.commit()
+    return inserted_rows, rejected_rows
+
+
+def retry_rejects(con, tsv_path):
+    """Re-parse quarantined rows for this file with the current rules.
+
+    Rows that now load move into unclaimed_rights; the rest stay in the
+    rejects table with their latest error. Each line is re-read from the file
+    at its byte offset, since raw_line is only a lossy UTF-8 rendering of it;
+    a line that no longer matches its stored text stays rejected. Returns
+    (recovered, still rejected).
+    """
+    con.execute(REJECTS_SQL)
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS batch_staging AS SELECT * FROM unclaimed_rights LIMIT 0;")
+    con.execute("DELETE FROM batch_staging;")
+    rows = con.execute(
+        "SELECT byte_offset, raw_line FROM unclaimed_rights_rejects WHERE source_file = ? ORDER BY byte_offset;",
+        [str(tsv_path)],
+    ).fetchall()
+    if not rows:
+        return 0, 0
+
+    items, moved = [], []
+    with open(tsv_path, "rb") as f:
+        header = f.readline()
+        for offset, raw in rows:
+            f.seek(offset)
+            line = f.readline()
+            if line.decode("utf-8", "replace").rstrip("\r\n") == raw:
+                items.append((offset, line))
+            else:
+                moved.append((offset, raw.encode("utf-8"), "line changed in the file since it was rejected"))
+    still_bad = (bisect_lines(con, header, items) if items else []) + moved
+
+    con.begin()
+    recovered = con.execute("INSERT INTO unclaimed_rights SELECT * FROM batch_staging;").fetchone()[0]
+    con.execute("DELETE FROM unclaimed_rights_rejects WHERE source_file = ?;", [str(tsv_path)])
+    save_rejects(con, tsv_path, still_bad)
+    con.commit()
+    con.execute("DELETE FROM batch_staging;")
+    return recovered, len(still_bad)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the unclaimed-rights TSV into DuckDB.")
+    parser.add_argument(
+        "--engine", choices=["auto", "native", "pandas"], default="auto",
+        help="native = DuckDB read_csv, pandas = chunked fallback, auto = native then pandas on failure",
+    )
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="rows per batch for the pandas engine (default: profile suggestion or 100k)")
+    parser.add_argument("--reset", action="store_true", help="discard the checkpoint and reload from scratch")
+    parser.add_argument("--retry-rejects", action="store_true",
+                        help="only re-parse rows in unclaimed_rights_rejects and load those that now pass")
+    args = parser.parse_args()
+
     log("Starting TSV → DuckDB ingestion\n")
     log(f"Input file: {tsv_file}")
-    log(f"Output DB : {db_path}\n")
+    log(f"Output DB : {db_path}")
+    log(f"Engine    : {args.engine}\n")
 
     # --- Connect to DuckDB ---
     con = duckdb.connect(str(db_path))
-    con.execute("PRAGMA threads=4;")  # allow parallel ops
+    con.execute(f"PRAGMA threads={threads};")  # allow parallel ops
+    ensure_table(con)  # older databases lack the derived isrc_norm column
+
+    # unclaimed_rights changes below; the sidecar fingerprint is rewritten once it is done
+    if args.retry_rejects:
+        clear_source(db_path)
+        recovered, still_bad = retry_rejects(con, tsv_file)
+        record_source(con, db_path)
+        log(f"Rejects retried: {recovered:,} recovered, {still_bad:,} still rejected.\n")
+        con.close()
+        return
 
-    total_rows = 0
-    error_batches = 0
+    if args.reset:
+        clear_source(db_path)
+        reset_ingestion(con, tsv_file)
+        log("Checkpoint and existing rows cleared.\n")
 
-    # --- Stream read in chunks ---
-    for chunk_no, df in enumerate(pd.read_csv(tsv_file, sep="\t", chunksize=chunksize, low_memory=False), start=1):
+    checkpoint = load_checkpoint(con, tsv_file)
+    if checkpoint and checkpoint["file_size"] != tsv_file.stat().st_size:
+        raise RuntimeError("Checkpoint was recorded for a different version of the file; rerun with --reset.")
+    if checkpoint and checkpoint["completed"]:
+        log(f"File already ingested ({checkpoint['row_count']:,} rows); nothing to do. Use --reset to reload.\n")
+        con.close()
+        return
+    if checkpoint and args.engine != "pandas":
+        # The native reader cannot start mid-file, so partial loads resume in pandas
+        log("Partial checkpoint found; resuming with the pandas engine.")
+        args.engine = "pandas"
+    clear_source(db_path)
+
+    # --- Raw-file profile (check_raw_file.py) tunes batches and skips bad lines ---
+    profile = load_profile(tsv_file)
+    bad_ranges = None
+    if profile:
+        args.chunksize = args.chunksize or profile["suggested_chunksize"]
+        bad_ranges = profile["bad_byte_ranges"]
+        log(f"Using raw-file profile: {profile['malformed_rows']:,} malformed rows, chunksize {args.chunksize:,}")
+        if profile["malformed_rows"] and args.engine == "auto":
+            log("Profile reports malformed rows; using the pandas engine.\n")
+            args.engine = "pandas"
+    args.chunksize = args.chunksize or chunksize
+
+    rejected_rows = 0
+    start = time.perf_counter()
+
+    # --- Checksum rides along with the ingestion read ---
+    # A file whose quick fingerprint matches the manifest keeps its recorded
+    # hash. Otherwise the native reader owns its I/O, so hash on a thread
+    # beside it; a fresh pandas load feeds the bytes it already read into the
+    # hash directly.
+    manifest = load_manifest(manifest_path)
+    recorded = manifest["sha256"] if manifest_matches(manifest, tsv_file) else None
+    hasher = None
+    background = None
+    if recorded:
+        log("Raw file matches run_manifest.json; reusing the recorded SHA256.")
+    elif args.engine in ("auto", "native") or checkpoint:
+        background = BackgroundChecksum(tsv_file)
+        background.start()
+    else:
+        hasher = hashlib.sha256()
+
+    if args.engine in ("auto", "native"):
         try:
-            # Normalize column names (strip spaces, rename if header mismatch)
-            df.columns = [c.strip().replace("#", "") for c in df.columns]
-
-            # Insert chunk into DuckDB
-            con.register("chunk_df", df)
-            con.execute("""
-                INSERT INTO unclaimed_rights
-                SELECT
-                    CAST(UnclaimedMusicalWorkRightShareRecordId AS BIGINT),
-                    ResourceRecordId,
-                    MusicalWorkRecordId,
-                    ISRC,
-                    DspResourceId,
-                    ResourceTitle,
-                    ResourceSubTitle,
-                    AlternativeResourceTitle,
-                    DisplayArtistName,
-                    DisplayArtistISNI,
-                    TRY_CAST(Duration AS INTEGER),
-                    TRY_CAST(UnclaimedRightSharePercentage AS DOUBLE),
-                    TRY_CAST(PercentileForPrioritisation AS DOUBLE)
-                FROM chunk_df;
-            """)
-            con.unregister("chunk_df")
-
-            total_rows += len(df)
-            log(f"Batch {chunk_no:05d} | Rows: {len(df):>6} | Total inserted: {total_rows:,}")
+            ingest_native(con, tsv_file)
+        except duckdb.Error as e:
+            if args.engine == "native" or isinstance(e, SCHEMA_ERRORS):
+                raise
+            log(f"Native reader failed ({e}); falling back to pandas engine.\n")
+            args.engine = "pandas"
 
-            if chunk_no % 10 == 0:  # show small sample every 10th batch
-                preview = con.execute("SELECT * FROM unclaimed_rights LIMIT ?;", [max_preview]).fetchdf()
-                log(f"Sample rows after batch {chunk_no}:\n{preview}\n")
+    if args.engine == "pandas":
+        _, rejected_rows = ingest_pandas(con, tsv_file, args.chunksize, checkpoint, hasher, bad_ranges)
 
-        except Exception as e:
-            error_batches += 1
-            log(f"Error in batch {chunk_no}: {e}")
-            traceback.print_exc(file=sys.stdout)
+    checksum = recorded or (hasher.hexdigest() if hasher else background.result())
+    update_manifest(manifest_path, tsv_file, checksum)
+    log(f"SHA256 recorded in manifest: {checksum[:32]}... (truncated)")
 
     # --- Final count ---
+    elapsed = time.perf_counter() - start
     final_count = con.execute("SELECT COUNT(*) FROM unclaimed_rights;").fetchone()[0]
     log(f"\nIngestion completed. Final row count: {final_count:,}")
-    log(f"Total error batches: {error_batches}")
+    log(f"Elapsed: {elapsed:.1f}s ({final_count / max(elapsed, 1e-9):,.0f} rows/sec)")
+    log(f"Rows quarantined in unclaimed_rights_rejects: {rejected_rows:,}")
 
-    # --- Create an index on ISRC for fast lookups ---
+    # --- Create indexes on ISRC and the normalized key for fast lookups ---
+    # (run build_isrc_key.py afterwards to also sort the table by isrc_norm)
     con.execute("CREATE INDEX IF NOT EXISTS idx_isrc ON unclaimed_rights(ISRC);")
-    log("ISRC index created successfully.\n")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_isrc_norm ON unclaimed_rights(isrc_norm);")
+    log("ISRC indexes created successfully.\n")
+    record_source(con, db_path)   # lets the membership index and lookup service tell they are stale
 
     con.close()
     log("Connection closed.\n")
 
-except Exception as main_err:
-    log(f"Fatal error: {main_err}")
-    traceback.print_exc(file=sys.stdout)
-    sys.exit(1)
+
+# === Begin process ===
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as main_err:
+        log(f"Fatal error: {main_err}")
+        traceback.print_exc(file=sys.stdout)
+        sys.exit(1)
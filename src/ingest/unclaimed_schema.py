@@ -0,0 +1,79 @@
+from core.isrc_keys import isrc_norm_sql
+
+# === Shared definition of the unclaimed_rights table ===
+# Both ingestion engines and the schema script build their SQL from here so
+# the column layout (13 TSV columns + derived keys) and the cast rules only
+# live in one place.
+
+# Column name -> DuckDB type, in TSV header order
+COLUMNS = {
+    "UnclaimedMusicalWorkRightShareRecordId": "BIGINT",
+    "ResourceRecordId": "TEXT",
+    "MusicalWorkRecordId": "TEXT",
+    "ISRC": "TEXT",
+    "DspResourceId": "TEXT",
+    "ResourceTitle": "TEXT",
+    "ResourceSubTitle": "TEXT",
+    "AlternativeResourceTitle": "TEXT",
+    "DisplayArtistName": "TEXT",
+    "DisplayArtistISNI": "TEXT",
+    "Duration": "INT",
+    "UnclaimedRightSharePercentage": "DOUBLE",
+    "PercentileForPrioritisation": "DOUBLE",
+}
+
+# Derived at load time: validated, normalized ISRC that all matching joins on
+DERIVED_COLUMNS = {
+    "isrc_norm": "TEXT",
+}
+
+CREATE_TABLE_SQL = "CREATE TABLE IF NOT EXISTS unclaimed_rights (\n{}\n);".format(
+    ",\n".join(f"    {name} {dtype}" for name, dtype in {**COLUMNS, **DERIVED_COLUMNS}.items())
+)
+
+
+
+def ensure_table(con):
+    """Create unclaimed_rights, or add derived columns to one created before they existed.
+
+    Tables made by an older create_duckdb_schema.py have only the 13 TSV
+    columns, and CAST_SELECT_SQL would not bind against them. Rows already
+    there get NULL keys until build_isrc_key.py backfills them.
+    """
+    con.execute(CREATE_TABLE_SQL)
+    for name, dtype in DERIVED_COLUMNS.items():
+        con.execute(f"ALTER TABLE unclaimed_rights ADD COLUMN IF NOT EXISTS {name} {dtype};")
+
+
+# The record id must parse (a bad id fails the batch); the numeric metrics
+# are best-effort and fall back to NULL.
+CAST_SELECT_SQL = """
+SELECT
+    CAST(UnclaimedMusicalWorkRightShareRecordId AS BIGINT),
+    ResourceRecordId,
+    MusicalWorkRecordId,
+    ISRC,
+    DspResourceId,
+    ResourceTitle,
+    ResourceSubTitle,
+    AlternativeResourceTitle,
+    DisplayArtistName,
+    DisplayArtistISNI,
+    TRY_CAST(Duration AS INTEGER),
+    TRY_CAST(UnclaimedRightSharePercentage AS DOUBLE),
+    TRY_CAST(PercentileForPrioritisation AS DOUBLE),
+    {isrc_norm}
+""".format(isrc_norm=isrc_norm_sql("ISRC"))
+
+
+def read_csv_sql(param="?"):
+    """DuckDB read_csv() call that reads the raw TSV as 13 VARCHAR columns.
+
+    The pandas engine applies the same quote rule per field
+    (ingest_unclaimed_tsv.unquote_fields); change both together.
+    """
+    columns = ", ".join(f"'{name}': 'VARCHAR'" for name in COLUMNS)
+    return (
+        f"read_csv({param}, delim='\\t', header=true, quote='\"', escape='\"', "
+        f"parallel=true, columns={{{columns}}})"
+    )
@@ -0,0 +1,110 @@
+import argparse
+import sys
+from pathlib import Path
+import duckdb
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import add_parquet_argument, all_columns_sql, parquet_arg, parquet_source_sql
+from spotify.catalog_store import ensure_catalog
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+summary_csv = base_dir / "reports" / "batch_match_summary.csv"
+matches_csv = base_dir / "reports" / "batch_match_matches.csv"
+log_path = base_dir / "logs" / "07E_batch_match.log"
+
+parquet_export = base_dir / "data" / "processed" / "unclaimed_parquet"   # read with --parquet
+
+# Catalog tracks in scope (ISRC present), optionally limited to the registered batch_artists
+SCOPE_SQL = """
+CREATE OR REPLACE TEMP TABLE match_catalog AS
+SELECT artist_id, artist_name, album_name, release_date, track_name, isrc_norm
+FROM spotify_catalog
+WHERE isrc IS NOT NULL {artist_filter};
+"""
+
+# One pass over unclaimed_rights: semi-join on the distinct catalog keys
+MATCHED_SQL = """
+CREATE OR REPLACE TEMP TABLE match_unclaimed AS
+SELECT {columns} FROM {source}
+WHERE isrc_norm IN (SELECT DISTINCT isrc_norm FROM match_catalog WHERE isrc_norm IS NOT NULL);
+"""
+
+SUMMARY_SQL = """
+SELECT
+    c.artist_name                                      AS "Artist",
+    c.artist_id                                        AS "Artist ID",
+    COUNT(*)                                           AS "Total Tracks",
+    COUNT(DISTINCT m.isrc_norm)                        AS "Matched",
+    ROUND(COUNT(DISTINCT m.isrc_norm) * 100.0 / COUNT(*), 2) AS "Coverage_%"
+FROM match_catalog c
+LEFT JOIN (SELECT DISTINCT isrc_norm FROM match_unclaimed) m USING (isrc_norm)
+GROUP BY c.artist_id, c.artist_name
+ORDER BY "Matched" DESC, "Artist";
+"""
+
+MATCHES_SQL = """
+SELECT c.artist_name AS artist, c.artist_id, u.*, c.track_name, c.album_name AS album, c.release_date
+FROM match_catalog c
+JOIN match_unclaimed u USING (isrc_norm)
+ORDER BY artist, u.isrc_norm;
+"""
+
+
+def log(msg):
+    print(msg)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+def match_catalog(con, artist_ids=None, parquet_dir=None, details=True):
+    """Match every stored catalog (or only `artist_ids`) against unclaimed rights at once.
+
+    The catalog rows go into one temp table, unclaimed_rights is scanned once
+    with a semi-join on their distinct keys, and the per-artist summary is a
+    single GROUP BY, so the cost barely depends on the number of artists.
+    Returns (summary, matches); matches is None when `details` is False.
+    """
+    if artist_ids is not None:
+        con.register("batch_artists", pd.DataFrame({"artist_id": list(artist_ids)}, dtype="object"))
+    try:
+        artist_filter = "AND artist_id IN (SELECT artist_id FROM batch_artists)" if artist_ids is not None else ""
+        con.execute(SCOPE_SQL.format(artist_filter=artist_filter))
+    finally:
+        if artist_ids is not None:
+            con.unregister("batch_artists")
+    source = parquet_source_sql(parquet_dir) if parquet_dir else "unclaimed_rights"
+    con.execute(MATCHED_SQL.format(columns=all_columns_sql(parquet_dir), source=source))
+
+    summary = con.execute(SUMMARY_SQL).df()
+    matches = con.execute(MATCHES_SQL).df() if details else None
+    con.execute("DROP TABLE IF EXISTS match_catalog; DROP TABLE IF EXISTS match_unclaimed;")
+    return summary, matches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match all stored Spotify catalogs against unclaimed rights in one query.")
+    parser.add_argument("--artist-id", nargs="*", default=None, help="limit to these Spotify artist IDs")
+    parser.add_argument("--summary-only", action="store_true", help="skip the per-track match details")
+    add_parquet_argument(parser, parquet_export)
+    args = parser.parse_args()
+    unclaimed_parquet = parquet_arg(parser, args)
+
+    con = duckdb.connect(str(db_path))
+    ensure_catalog(con)
+    log(f"Connected to DuckDB: {db_path}")
+
+    summary, matches = match_catalog(con, args.artist_id, parquet_dir=unclaimed_parquet, details=not args.summary_only)
+    con.close()
+
+    summary_csv.parent.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(summary_csv, index=False)
+    log(f"{len(summary):,} artists, {summary['Total Tracks'].sum():,} tracks, "
+        f"{summary['Matched'].sum():,} matched ISRCs -> {summary_csv}")
+    if matches is not None:
+        matches.to_csv(matches_csv, index=False)
+        log(f"{len(matches):,} match rows -> {matches_csv}")
+    print(summary.head(20).to_string(index=False))
@@ -1,8 +1,14 @@
+import argparse
+import sys
 import duckdb
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import add_parquet_argument, normalize_isrcs, parquet_arg
+from match.match_store import MATCH_COLUMNS, sync
+
 # === Base paths ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
 db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
@@ -10,6 +16,13 @@ spotify_csv = base_dir / "data" / "interim" / "spotify_catalog.csv"
 report_xlsx = base_dir / "reports" / "tritone_artist_catalog.xlsx"
 log_path = base_dir / "logs" / "06_cross_reference.log"
 
+parquet_export = base_dir / "data" / "processed" / "unclaimed_parquet"
+
+parser = argparse.ArgumentParser(description="Match the Spotify catalog CSV against unclaimed rights by ISRC.")
+add_parquet_argument(parser, parquet_export)
+args = parser.parse_args()
+unclaimed_parquet = parquet_arg(parser, args)   # None: the unclaimed_rights table
+
 def log(msg):
     print(msg)
     with open(log_path, "a", encoding="utf-8") as f:
@@ -21,32 +34,26 @@ log("Starting ISRC cross-reference process\n")
 df_spotify = pd.read_csv(spotify_csv)
 log(f"Spotify tracks loaded: {len(df_spotify):,}")
 
-# Normalize ISRC
-df_spotify["isrc_norm"] = (
-    df_spotify["isrc"].astype(str).str.upper().str.replace("-", "").str.strip()
-)
+# Normalize ISRC (core/isrc_keys.py); missing or malformed ISRCs get None and are dropped
+df_spotify["isrc_norm"], isrc_valid = normalize_isrcs(df_spotify["isrc"])
+log(f"Invalid or missing ISRCs dropped: {(~isrc_valid).sum():,}")
 df_spotify.dropna(subset=["isrc_norm"], inplace=True)
 
 # === Connect to DuckDB ===
-con = duckdb.connect(str(db_path))
+con = duckdb.connect(str(db_path))   # holds spotify_catalog and the match tables
 log(f"Connected to DuckDB: {db_path}")
 
-# === Fetch matching records ===
-query = """
-SELECT
-    u.ISRC,
-    u.ResourceTitle,
-    u.DisplayArtistName,
-    u.UnclaimedRightSharePercentage,
-    u.PercentileForPrioritisation
-FROM unclaimed_rights u
-WHERE REPLACE(UPPER(u.ISRC), '-', '') IN (
-    SELECT DISTINCT isrc_norm FROM df_spotify
-)
-"""
-con.register("df_spotify", df_spotify)
-matches_df = con.execute(query).fetchdf()
-con.unregister("df_spotify")
+# === Matching records from the persistent isrc_matches table ===
+# spotify_catalog.csv is exported from spotify_catalog, so its ISRCs are kept
+# matched by match_store.sync(); only keys changed since the last run are looked up.
+sync_result = sync(con, parquet_dir=unclaimed_parquet)
+log(f"Match tables synced ({sync_result['mode']})")
+con.register("report_keys", df_spotify[["isrc_norm"]].drop_duplicates())
+matches_df = con.execute(
+    f"SELECT isrc_norm, {', '.join(MATCH_COLUMNS)} FROM isrc_matches "
+    "WHERE isrc_norm IN (SELECT isrc_norm FROM report_keys);"
+).fetchdf()
+con.unregister("report_keys")
 
 log(f"Matches found: {len(matches_df):,}")
 
@@ -54,8 +61,7 @@ log(f"Matches found: {len(matches_df):,}")
 merged = pd.merge(
     df_spotify,
     matches_df,
-    left_on="isrc_norm",
-    right_on="ISRC",
+    on="isrc_norm",
     how="left",
     indicator=True
 )
@@ -0,0 +1,186 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+import duckdb
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from match.match_store import KEY, ensure_match_tables, sync
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+fuzzy_csv = base_dir / "reports" / "fuzzy_matches.csv"
+log_path = base_dir / "logs" / "07G_fuzzy_match.log"
+
+# === Scoring ===
+TITLE_WEIGHT, ARTIST_WEIGHT, DURATION_WEIGHT = 0.6, 0.3, 0.1
+MIN_TITLE = 0.85           # Jaro-Winkler on normalized titles
+MIN_SCORE = 0.90
+MAX_DURATION_DIFF = 10     # seconds; Duration in unclaimed_rights is in seconds
+
+# === Normalization (SQL only, so both sides are normalized by the same code) ===
+# Titles lose bracketed and " - ..." suffixes ("(Remastered 2009)", "- Live"),
+# everything is accent-stripped, lower-cased and reduced to [a-z0-9 ].
+# A record/track lands in one block per key: first artist token + first four
+# characters of the title, and first artist token + first four characters of
+# its longest word, so a typo at the start of a title still finds a block.
+MACROS_SQL = r"""
+CREATE OR REPLACE TEMP MACRO fuzzy_text(s) AS
+    trim(regexp_replace(lower(strip_accents(coalesce(s, ''))), '[^a-z0-9]+', ' ', 'g'));
+CREATE OR REPLACE TEMP MACRO fuzzy_title(s) AS
+    fuzzy_text(regexp_replace(regexp_replace(coalesce(s, ''), '\s*[\(\[][^\)\]]*[\)\]]', '', 'g'), '\s+-\s+.*$', ''));
+CREATE OR REPLACE TEMP MACRO fuzzy_artist(s) AS
+    regexp_replace(fuzzy_text(s), '^the ', '');
+CREATE OR REPLACE TEMP MACRO fuzzy_blocks(artist, title) AS list_distinct([
+    split_part(artist, ' ', 1) || '|' || left(replace(title, ' ', ''), 4),
+    split_part(artist, ' ', 1) || '|' || left(list_reduce(string_split(title, ' '),
+                                                (a, b) -> CASE WHEN length(b) > length(a) THEN b ELSE a END), 4)
+]);
+"""
+
+INDEX_SQL = f"""
+CREATE OR REPLACE TABLE unclaimed_fuzzy_keys AS
+WITH titles AS (
+    SELECT record_id, fuzzy_artist(DisplayArtistName) AS artist_norm, fuzzy_title(title) AS title_norm, Duration AS duration
+    FROM (
+        SELECT {KEY} AS record_id, DisplayArtistName, Duration,
+               UNNEST([ResourceTitle, AlternativeResourceTitle]) AS title
+        FROM unclaimed_rights
+        WHERE DisplayArtistName IS NOT NULL
+    )
+    WHERE title IS NOT NULL
+)
+SELECT DISTINCT UNNEST(fuzzy_blocks(artist_norm, title_norm)) AS block_key, record_id, artist_norm, title_norm, duration
+FROM titles
+WHERE artist_norm <> '' AND length(title_norm) >= 2
+ORDER BY block_key;
+"""
+
+# Catalog tracks without an exact ISRC match, compared only within their blocks
+MATCH_SQL = f"""
+WITH tracks AS (
+    SELECT artist_id, track_id, ANY_VALUE(artist_name) AS artist_name, ANY_VALUE(track_name) AS track_name,
+           ANY_VALUE(album_name) AS album, ANY_VALUE(isrc) AS isrc, ANY_VALUE(duration_ms) AS duration_ms
+    FROM spotify_catalog
+    WHERE (isrc_norm IS NULL OR isrc_norm NOT IN (SELECT isrc_norm FROM isrc_matches)) {{artist_filter}}
+    GROUP BY artist_id, track_id
+),
+keyed AS (
+    SELECT *, UNNEST(fuzzy_blocks(t_artist, t_title)) AS block_key
+    FROM (SELECT *, fuzzy_artist(artist_name) AS t_artist, fuzzy_title(track_name) AS t_title FROM tracks)
+    WHERE t_artist <> '' AND length(t_title) >= 2
+),
+pairs AS (
+    SELECT DISTINCT k.artist_id, k.track_id, k.artist_name, k.track_name, k.album, k.isrc, k.duration_ms,
+           k.t_artist, k.t_title, f.record_id, f.artist_norm, f.title_norm, f.duration
+    FROM keyed k
+    JOIN unclaimed_fuzzy_keys f USING (block_key)
+    WHERE f.record_id NOT IN (SELECT record_id FROM isrc_matches)
+),
+scored AS (
+    SELECT *,
+           jaro_winkler_similarity(t_title, title_norm)   AS title_score,
+           jaro_winkler_similarity(t_artist, artist_norm) AS artist_score,
+           abs(duration - duration_ms / 1000.0)           AS duration_diff
+    FROM pairs
+)
+SELECT s.artist_id, s.artist_name, s.track_id, s.track_name, s.album, s.isrc AS spotify_isrc,
+       s.record_id AS {KEY}, u.ISRC AS unclaimed_isrc, u.ResourceTitle, u.DisplayArtistName,
+       u.UnclaimedRightSharePercentage, u.PercentileForPrioritisation,
+       round(s.title_score, 4) AS title_score, round(s.artist_score, 4) AS artist_score, s.duration_diff,
+       round({TITLE_WEIGHT} * s.title_score + {ARTIST_WEIGHT} * s.artist_score
+             + {DURATION_WEIGHT} * coalesce(greatest(0, 1 - s.duration_diff / {MAX_DURATION_DIFF}), 0.5), 4) AS score
+FROM scored s
+JOIN unclaimed_rights u ON u.{KEY} = s.record_id
+WHERE s.title_score >= {MIN_TITLE} AND (s.duration_diff IS NULL OR s.duration_diff <= {MAX_DURATION_DIFF})
+QUALIFY row_number() OVER (PARTITION BY s.artist_id, s.track_id ORDER BY score DESC, s.record_id) = 1
+    AND score >= {MIN_SCORE}
+ORDER BY s.artist_name, score DESC;
+"""
+
+
+def log(msg):
+    print(msg)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+def ensure_macros(con):
+    con.execute(MACROS_SQL)
+
+
+def index_stale(con):
+    """True when unclaimed_fuzzy_keys is missing or older than the last full or delta ingest."""
+    built = con.execute("SELECT synced_to FROM match_sync_state WHERE source = 'fuzzy_index'").fetchone()
+    tables = {r[0] for r in con.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+    if built is None or "unclaimed_fuzzy_keys" not in tables:
+        return True
+    changed = []
+    if "ingest_checkpoint" in tables:
+        changed.append("SELECT MAX(updated_at) AS t FROM ingest_checkpoint")
+    if "unclaimed_rights_changes" in tables:
+        changed.append("SELECT MAX(applied_at) AS t FROM unclaimed_rights_changes")
+    if not changed:
+        return False
+    loaded_at = con.execute(f"SELECT MAX(t) FROM ({' UNION ALL '.join(changed)})").fetchone()[0]
+    return loaded_at is not None and loaded_at > built[0]
+
+
+def build_blocking_index(con):
+    """(Re)build unclaimed_fuzzy_keys: one row per block key, record and title variant."""
+    ensure_match_tables(con)
+    ensure_macros(con)
+    built_at = datetime.now()
+    con.execute(INDEX_SQL)
+    con.execute("INSERT OR REPLACE INTO match_sync_state (source, synced_to) VALUES ('fuzzy_index', ?)", [built_at])
+    return con.execute("SELECT COUNT(*), COUNT(DISTINCT block_key) FROM unclaimed_fuzzy_keys").fetchone()
+
+
+def fuzzy_matches(con, artist_ids=None):
+    """Best title/artist/duration candidate for each catalog track without an exact ISRC match.
+
+    Expects isrc_matches to be synced (match/match_store.py) and the blocking
+    index to exist; each track is only scored against the unclaimed records
+    sharing one of its block keys.
+    """
+    ensure_macros(con)
+    artist_filter = ""
+    if artist_ids is not None:
+        con.register("fuzzy_artists", pd.DataFrame({"artist_id": list(artist_ids)}, dtype="object"))
+        artist_filter = "AND artist_id IN (SELECT artist_id FROM fuzzy_artists)"
+    try:
+        return con.execute(MATCH_SQL.format(artist_filter=artist_filter)).df()
+    finally:
+        if artist_ids is not None:
+            con.unregister("fuzzy_artists")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Title/artist/duration fallback matching for tracks without an exact ISRC match.")
+    parser.add_argument("--artist-id", nargs="*", default=None, help="limit to these Spotify artist IDs")
+    parser.add_argument("--rebuild-index", action="store_true", help="rebuild the blocking index even if it is current")
+    args = parser.parse_args()
+
+    con = duckdb.connect(str(db_path))
+    sync(con)
+    if args.rebuild_index or index_stale(con):
+        start = time.perf_counter()
+        rows, blocks = build_blocking_index(con)
+        log(f"Blocking index: {rows:,} keys in {blocks:,} blocks ({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    df = fuzzy_matches(con, args.artist_id)
+    unmatched = con.execute(
+        "SELECT COUNT(DISTINCT track_id) FROM spotify_catalog WHERE isrc_norm IS NULL OR isrc_norm NOT IN (SELECT isrc_norm FROM isrc_matches)"
+    ).fetchone()[0]
+    con.close()
+
+    fuzzy_csv.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(fuzzy_csv, index=False)
+    log(f"Fuzzy matches: {len(df):,} of {unmatched:,} tracks without an exact ISRC match "
+        f"({time.perf_counter() - start:.2f}s) -> {fuzzy_csv}")
+    log("These are candidates for review, reported apart from the exact ISRC matches.\n")
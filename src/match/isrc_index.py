@@ -0,0 +1,216 @@
+import hashlib
+import json
+import sys
+import time
+import duckdb
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import isrc_norm_sql
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+index_dir = base_dir / "data" / "processed" / "isrc_index"
+log_path = base_dir / "logs" / "09_isrc_index.log"
+
+# === Parameters ===
+bloom_bits_per_key = 10    # ~1% false positives with 7 hashes
+bloom_hashes = 7
+build_batch = 1_000_000    # keys hashed per step while filling the filter
+
+# Base-36 packing: 12 characters of [0-9A-Z] fit in one uint64 (36**12 < 2**64)
+_DIGITS = np.full(256, 255, dtype=np.uint8)
+_DIGITS[ord("0"):ord("9") + 1] = np.arange(10)
+_DIGITS[ord("A"):ord("Z") + 1] = np.arange(10, 36)
+_WEIGHTS = np.array([36 ** (11 - i) for i in range(12)], dtype=np.uint64)
+
+def log(msg):
+    print(msg)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+def pack_isrcs(isrcs):
+    """Pack normalized ISRC strings into uint64 keys.
+
+    Returns (keys, valid) where invalid or non-12-character entries get
+    key 0 and valid=False.
+    """
+    raw = np.asarray(
+        [s if isinstance(s, str) and len(s) == 12 and s.isascii() else "" for s in isrcs],
+        dtype="S12",
+    ).reshape(-1)
+    chars = raw.view(np.uint8).reshape(len(raw), 12)
+    digits = _DIGITS[chars]
+    valid = (digits != 255).all(axis=1)
+    keys = (digits.astype(np.uint64) * _WEIGHTS).sum(axis=1, dtype=np.uint64)
+    keys[~valid] = 0
+    return keys, valid
+
+
+def pack_sql(col):
+    """DuckDB expression computing the same uint64 key as pack_isrcs()."""
+    terms = []
+    for i in range(12):
+        c = f"ASCII(SUBSTR({col}, {i + 1}, 1))"
+        terms.append(f"(CASE WHEN {c} <= 57 THEN {c} - 48 ELSE {c} - 55 END)::UBIGINT * {36 ** (11 - i)}::UBIGINT")
+    return " + ".join(terms)
+
+
+def _mix(keys, seed):
+    """splitmix64 finalizer, vectorized (uint64 arithmetic wraps)."""
+    with np.errstate(over="ignore"):
+        z = keys + np.uint64(seed)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _bloom_positions(keys, m_bits, k):
+    """k bit positions per key via double hashing; shape (k, n)."""
+    h1 = _mix(keys, 0x9E3779B97F4A7C15)
+    h2 = _mix(keys, 0xD1B54A32D192ED03) | np.uint64(1)
+    with np.errstate(over="ignore"):
+        return np.stack([(h1 + np.uint64(i) * h2) % np.uint64(m_bits) for i in range(k)])
+
+
+def source_fingerprint(con):
+    """Identifies the unclaimed_rights load an index or snapshot was built from.
+
+    Latest full-ingest checkpoint and delta times, row count, key count and
+    the key rule: a delta, a --reset reload or a build_isrc_key.py re-run
+    under a new rule all change it. JSON-safe, so it can go into meta.json.
+    """
+    tables = {r[0] for r in con.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+    checkpoint_at = changes_at = None
+    if "ingest_checkpoint" in tables:
+        checkpoint_at = con.execute("SELECT MAX(updated_at) FROM ingest_checkpoint").fetchone()[0]
+    if "unclaimed_rights_changes" in tables:
+        changes_at = con.execute("SELECT MAX(applied_at) FROM unclaimed_rights_changes").fetchone()[0]
+    rows, keys = con.execute("SELECT COUNT(*), COUNT(isrc_norm) FROM unclaimed_rights").fetchone()
+    return {
+        "checkpoint_at": checkpoint_at.isoformat() if checkpoint_at else None,
+        "changes_at": changes_at.isoformat() if changes_at else None,
+        "rows": int(rows),
+        "keys": int(keys),
+        "key_rule": hashlib.sha256(isrc_norm_sql("ISRC").encode()).hexdigest()[:16],
+    }
+
+
+def source_path(path=db_path):
+    """Sidecar next to the database holding its current source_fingerprint()."""
+    return Path(path).with_suffix(".source.json")
+
+
+def record_source(con, path=db_path):
+    """Write the sidecar; call after every load, delta or re-keying of unclaimed_rights."""
+    source = source_fingerprint(con)
+    source_path(path).write_text(json.dumps(source, indent=4), encoding="utf-8")
+    return source
+
+
+def clear_source(path=db_path):
+    """Remove the sidecar before changing unclaimed_rights, so a run that dies midway leaves no stale one."""
+    source_path(path).unlink(missing_ok=True)
+
+
+def current_source(path=db_path):
+    """The recorded source_fingerprint() of the database, or None; read without opening DuckDB."""
+    sidecar = source_path(path)
+    return json.loads(sidecar.read_text(encoding="utf-8")) if sidecar.exists() else None
+
+
+def open_index(directory=index_dir, source=None):
+    """The index in `directory` if it was built from `source` (default: current_source()), else None.
+
+    A missing or stale index, or a database with no recorded source, gives
+    None, so callers fall back to querying DuckDB instead of missing ISRCs
+    added since the build.
+    """
+    directory = Path(directory)
+    source = source or current_source()
+    if source is None or not (directory / "meta.json").exists():
+        return None
+    index = IsrcIndex(directory)
+    return index if index.meta.get("source") == source else None
+
+
+class IsrcIndex:
+    """Memory-mapped sorted uint64 ISRC keys with a Bloom pre-filter."""
+
+    def __init__(self, directory=index_dir):
+        directory = Path(directory)
+        self.meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        self.keys = np.load(directory / "keys.npy", mmap_mode="r")
+        self.bloom = np.load(directory / "bloom.npy", mmap_mode="r")
+
+    def might_contain(self, keys):
+        """Bloom check: False means definitely absent."""
+        positions = _bloom_positions(keys, self.meta["m_bits"], self.meta["k"])
+        bytes_ = self.bloom[positions >> np.uint64(3)]
+        return ((bytes_ >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=0)
+
+    def contains(self, isrcs):
+        """Boolean mask: which normalized ISRCs are in the unclaimed set."""
+        keys, valid = pack_isrcs(isrcs)
+        result = np.zeros(len(keys), dtype=bool)
+        candidates = np.flatnonzero(valid)
+        if len(candidates) == 0 or len(self.keys) == 0:
+            return result
+        candidates = candidates[self.might_contain(keys[candidates])]
+        pos = np.searchsorted(self.keys, keys[candidates])
+        pos = np.minimum(pos, len(self.keys) - 1)
+        result[candidates] = self.keys[pos] == keys[candidates]
+        return result
+
+    def filter(self, isrcs):
+        """Only the ISRCs that are present, in input order."""
+        isrcs = list(isrcs)
+        return [s for s, hit in zip(isrcs, self.contains(isrcs)) if hit]
+
+
+def build_index(con, out_dir=index_dir, bits_per_key=bloom_bits_per_key, k=bloom_hashes):
+    """Write keys.npy (sorted distinct packed ISRCs), bloom.npy and meta.json (with the source_fingerprint)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    source = record_source(con)
+    keys = con.execute(f"""
+        SELECT DISTINCT {pack_sql('isrc_norm')} AS k
+        FROM unclaimed_rights
+        WHERE isrc_norm IS NOT NULL
+        ORDER BY k;
+    """).fetchnumpy()["k"]
+    keys = np.ascontiguousarray(keys, dtype=np.uint64)
+
+    m_bits = max(64, -(-len(keys) * bits_per_key // 64) * 64)
+    bits = np.zeros(m_bits, dtype=bool)
+    for i in range(0, len(keys), build_batch):
+        bits[_bloom_positions(keys[i:i + build_batch], m_bits, k).ravel()] = True
+    bloom = np.packbits(bits, bitorder="little")
+
+    np.save(out_dir / "keys.npy", keys)
+    np.save(out_dir / "bloom.npy", bloom)
+    meta = {
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "keys": int(len(keys)),
+        "m_bits": int(m_bits),
+        "k": k,
+        "source": source,
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta, indent=4), encoding="utf-8")
+    return meta
+
+
+if __name__ == "__main__":
+    log("Building ISRC membership index\n")
+    con = duckdb.connect(str(db_path), read_only=True)
+    con.execute("PRAGMA threads=4;")
+    start = time.perf_counter()
+    meta = build_index(con)
+    con.close()
+    log(f"Distinct ISRCs: {meta['keys']:,} | Bloom bits: {meta['m_bits']:,} | k={meta['k']}")
+    log(f"Index written to: {index_dir} ({time.perf_counter() - start:.1f}s)\n")
@@ -0,0 +1,58 @@
+import http.client
+import json
+import os
+import threading
+
+# Stdlib only, so callers do not pay for pandas/DuckDB imports just to ask
+# the lookup service (match/lookup_service.py) about a handful of ISRCs.
+LOOKUP_URL = os.getenv("ISRC_LOOKUP_URL", "http://127.0.0.1:8766/")
+
+
+class LookupClient:
+    """Keep-alive client for the ISRC lookup service (one connection per thread)."""
+
+    def __init__(self, url=LOOKUP_URL, timeout=5):
+        host_port = url.split("//", 1)[-1].strip("/")
+        self.host, _, port = host_port.partition(":")
+        self.port = int(port or 80)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _request(self, method, path, body=None):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        data = json.dumps(body).encode() if body is not None else None
+        try:
+            conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            payload = json.loads(resp.read())
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        if resp.status != 200:
+            raise RuntimeError(f"lookup service answered {resp.status}: {payload.get('error')}")
+        return payload
+
+    def available(self):
+        """True when the service answers /health."""
+        try:
+            self._request("GET", "/health")
+            return True
+        except (OSError, http.client.HTTPException, RuntimeError, ValueError):
+            return False
+
+    def lookup(self, isrcs):
+        """List of matches ({isrc, record_id, UnclaimedRightSharePercentage, PercentileForPrioritisation})."""
+        return self._request("POST", "/lookup", {"isrcs": list(isrcs)})["matches"]
+
+    def matched_isrcs(self, isrcs):
+        """The distinct normalized ISRCs among `isrcs` that have unclaimed rows."""
+        return {m["isrc"] for m in self.lookup(isrcs)}
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def reload(self):
+        return self._request("POST", "/reload")
@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import duckdb
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import normalize_isrcs
+from match.isrc_index import pack_isrcs, pack_sql, source_fingerprint
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+log_path = base_dir / "logs" / "09B_lookup_service.log"
+
+# === Parameters ===
+default_port = 8766        # the mock Spotify API uses 8765
+MAX_BATCH = 10_000         # ISRCs per /lookup request
+
+KEY = "UnclaimedMusicalWorkRightShareRecordId"
+
+LOAD_SQL = f"""
+SELECT {pack_sql('isrc_norm')} AS k, {KEY} AS record_id,
+       UnclaimedRightSharePercentage AS share, PercentileForPrioritisation AS percentile
+FROM unclaimed_rights
+WHERE isrc_norm IS NOT NULL
+ORDER BY k;
+"""
+
+
+def log(msg):
+    print(msg)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+class UnclaimedSnapshot:
+    """Sorted packed ISRC keys with the record id, share and percentile of every row, all in RAM.
+
+    Loaded with one read-only query; the DuckDB file is closed again straight
+    after so ingestion and matching scripts can still write to it.
+    """
+
+    def __init__(self, path=db_path):
+        start = time.perf_counter()
+        con = duckdb.connect(str(path), read_only=True)
+        try:
+            self.source = source_fingerprint(con)
+            cols = con.execute(LOAD_SQL).fetchnumpy()
+        finally:
+            con.close()
+        self.keys = np.ascontiguousarray(cols["k"], dtype=np.uint64)
+        self.isrcs = int(np.count_nonzero(np.diff(self.keys))) + 1 if len(self.keys) else 0   # keys arrive sorted
+        self.record_id = np.asarray(cols["record_id"], dtype=np.int64)
+        # fetchnumpy() masks NULLs; fill them with NaN (asarray would drop the mask and keep 0.0)
+        self.share = np.ma.filled(np.ma.asarray(cols["share"]).astype(np.float64), np.nan)
+        self.percentile = np.ma.filled(np.ma.asarray(cols["percentile"]).astype(np.float64), np.nan)
+        self.loaded_at = datetime.now()
+        self.load_seconds = time.perf_counter() - start
+
+    def info(self):
+        return {
+            "rows": int(len(self.keys)),
+            "isrcs": self.isrcs,
+            "loaded_at": self.loaded_at.isoformat(timespec="seconds"),
+            "load_seconds": round(self.load_seconds, 2),
+            "memory_mb": round(sum(a.nbytes for a in (self.keys, self.record_id, self.share, self.percentile)) / 2**20, 1),
+            "source": self.source,   # compare with isrc_index.current_source() to spot a stale snapshot
+        }
+
+    def lookup(self, isrcs):
+        """Every unclaimed row for each ISRC (normalized first); unmatched ISRCs are left out."""
+        norm, _ = normalize_isrcs(isrcs)
+        keys, valid = pack_isrcs(norm)
+        lo = np.searchsorted(self.keys, keys, side="left")
+        hi = np.searchsorted(self.keys, keys, side="right")
+        matches = []
+        for i in np.flatnonzero(valid & (hi > lo)):
+            for j in range(lo[i], hi[i]):
+                matches.append({
+                    "isrc": norm[i],
+                    "record_id": int(self.record_id[j]),
+                    "UnclaimedRightSharePercentage": None if np.isnan(self.share[j]) else float(self.share[j]),
+                    "PercentileForPrioritisation": None if np.isnan(self.percentile[j]) else float(self.percentile[j]),
+                })
+        return matches
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so clients reuse one connection
+    disable_nagle_algorithm = True  # headers and body go out in two writes; don't wait on delayed ACKs
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._json(200, self.server.snapshot.info())
+        return self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            return self._json(400, {"error": "body must be JSON"})
+        if not isinstance(body, dict):
+            return self._json(400, {"error": "body must be a JSON object"})
+
+        if self.path == "/lookup":
+            isrcs = body.get("isrcs")
+            if (not isinstance(isrcs, list) or len(isrcs) > MAX_BATCH
+                    or not all(isinstance(i, str) for i in isrcs)):
+                return self._json(400, {"error": f"'isrcs' must be a list of at most {MAX_BATCH:,} strings"})
+            start = time.perf_counter()
+            matches = self.server.snapshot.lookup(isrcs)
+            return self._json(200, {"matches": matches, "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)})
+
+        if self.path == "/reload":
+            self.server.reload()
+            return self._json(200, self.server.snapshot.info())
+        return self._json(404, {"error": "not found"})
+
+
+class LookupServer(ThreadingHTTPServer):
+    """Localhost HTTP front for an UnclaimedSnapshot.
+
+    POST /lookup {"isrcs": [...]}  -> {"matches": [...], "elapsed_ms": ...}
+    GET  /health                   -> snapshot size, load time and source fingerprint
+    POST /reload                   -> re-read unclaimed_rights (e.g. after a delta ingest)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=default_port, path=db_path):
+        super().__init__(("127.0.0.1", port), LookupHandler)
+        self.db_path = path
+        self.snapshot = UnclaimedSnapshot(path)
+        self._reload_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def reload(self):
+        with self._reload_lock:
+            self.snapshot = UnclaimedSnapshot(self.db_path)   # swapped in whole; readers keep the old one meanwhile
+
+    def start_background(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve unclaimed_rights ISRC lookups from memory on localhost.")
+    parser.add_argument("--port", type=int, default=default_port)
+    args = parser.parse_args()
+
+    log(f"Loading unclaimed_rights from {db_path}")
+    server = LookupServer(args.port)
+    info = server.snapshot.info()
+    log(f"{info['rows']:,} rows / {info['isrcs']:,} ISRCs in {info['load_seconds']}s ({info['memory_mb']} MB)")
+    log(f"Lookup service on {server.url} (POST /lookup, GET /health, POST /reload)\n")
+    server.serve_forever()
@@ -0,0 +1,282 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+import duckdb
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import ensure_isrc_macro, match_isrc_keys, parquet_source_sql
+from spotify.catalog_store import ensure_catalog
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
+log_path = base_dir / "logs" / "07F_match_store.log"
+
+KEY = "UnclaimedMusicalWorkRightShareRecordId"
+MATCH_COLUMNS = ["ISRC", "ResourceTitle", "DisplayArtistName", "UnclaimedRightSharePercentage",
+                 "PercentileForPrioritisation"]
+
+# === Persistent match tables (inside unclaimed.duckdb) ===
+# isrc_matches holds every unclaimed record whose isrc_norm appears in
+# spotify_catalog; artist_coverage is the per-artist summary derived from it.
+# match_sync_state records how far the catalog and the unclaimed change log
+# have been applied, and which ingest checkpoint the last sync saw.
+MATCH_SQL = """
+CREATE TABLE IF NOT EXISTS isrc_matches (
+    record_id                     BIGINT PRIMARY KEY,
+    isrc_norm                     TEXT,
+    ISRC                          TEXT,
+    ResourceTitle                 TEXT,
+    DisplayArtistName             TEXT,
+    UnclaimedRightSharePercentage DOUBLE,
+    PercentileForPrioritisation   DOUBLE,
+    matched_at                    TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS artist_coverage (
+    artist_id    TEXT PRIMARY KEY,
+    artist_name  TEXT,
+    total_tracks BIGINT,
+    matched      BIGINT,
+    coverage_pct DOUBLE,
+    updated_at   TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS match_sync_state (
+    source    TEXT PRIMARY KEY,   -- 'catalog' (spotify_catalog.fetched_at) | 'unclaimed' (change log applied_at)
+                                  -- | 'checkpoint' (ingest_checkpoint.updated_at + row_count) | 'fuzzy_index'
+    synced_to TIMESTAMP,
+    row_count BIGINT
+);
+"""
+
+# Same definitions as match/batch_match.py: tracks with an ISRC, distinct matched keys
+COVERAGE_SQL = """
+INSERT OR REPLACE INTO artist_coverage
+SELECT
+    c.artist_id,
+    ANY_VALUE(c.artist_name),
+    COUNT(*),
+    COUNT(DISTINCT m.isrc_norm),
+    ROUND(COUNT(DISTINCT m.isrc_norm) * 100.0 / COUNT(*), 2),
+    ?
+FROM spotify_catalog c
+LEFT JOIN (SELECT DISTINCT isrc_norm FROM isrc_matches) m USING (isrc_norm)
+WHERE c.isrc IS NOT NULL {artist_filter}
+GROUP BY c.artist_id;
+"""
+
+
+def log(msg):
+    print(msg)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+def ensure_match_tables(con):
+    ensure_catalog(con)
+    ensure_isrc_macro(con)
+    con.execute(MATCH_SQL)
+    con.execute("ALTER TABLE match_sync_state ADD COLUMN IF NOT EXISTS row_count BIGINT")   # tables from before 'checkpoint'
+
+
+def _synced_to(con, source):
+    row = con.execute("SELECT synced_to FROM match_sync_state WHERE source = ?", [source]).fetchone()
+    return row[0] if row else None
+
+
+def _table_exists(con, name):
+    return con.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [name]).fetchone()[0] > 0
+
+
+def _checkpoint(con):
+    """(updated_at, row_count) of the latest ingest checkpoint, or (None, None)."""
+    if not _table_exists(con, "ingest_checkpoint"):
+        return None, None
+    row = con.execute("SELECT updated_at, row_count FROM ingest_checkpoint ORDER BY updated_at DESC LIMIT 1").fetchone()
+    return row or (None, None)
+
+
+def needs_rebuild(con):
+    """True on the first sync, or when unclaimed_rights was reloaded in full since the last one.
+
+    Every load moves ingest_checkpoint. A delta (ingest/delta_ingest_unclaimed.py)
+    stamps it with the applied_at of its unclaimed_rights_changes entries, so a
+    checkpoint that differs from the one seen at the last sync and was not
+    written by the latest delta means a full ingest. The delta script checks
+    this before applying, as its own checkpoint hides a reload made before it.
+    """
+    unclaimed_to = _synced_to(con, "unclaimed")
+    if unclaimed_to is None:
+        return True
+    loaded_at, row_count = _checkpoint(con)
+    if loaded_at is None:
+        return False
+    seen = con.execute("SELECT synced_to, row_count FROM match_sync_state WHERE source = 'checkpoint'").fetchone()
+    if seen is not None:
+        if (loaded_at, row_count) == seen:
+            return False
+    elif loaded_at <= unclaimed_to:   # synced before the checkpoint was recorded
+        return False
+    if not _table_exists(con, "unclaimed_rights_changes"):
+        return True
+    last_delta = con.execute("SELECT MAX(applied_at) FROM unclaimed_rights_changes").fetchone()[0]
+    return loaded_at != last_delta
+
+
+def _upsert_matches(con, rows, matched_at):
+    rows = rows.rename(columns={KEY: "record_id"}).assign(matched_at=matched_at)
+    con.register("match_batch", rows[["record_id", "isrc_norm", *MATCH_COLUMNS, "matched_at"]])
+    con.execute("INSERT OR REPLACE INTO isrc_matches SELECT * FROM match_batch")
+    con.unregister("match_batch")
+
+
+def _set_state(con, catalog_to, unclaimed_to):
+    loaded_at, row_count = _checkpoint(con)
+    con.execute("INSERT OR REPLACE INTO match_sync_state VALUES ('catalog', ?, NULL), ('unclaimed', ?, NULL), "
+                "('checkpoint', ?, ?)", [catalog_to, unclaimed_to, loaded_at, row_count])
+
+
+def rebuild(con, parquet_dir=None):
+    """Recompute isrc_matches and artist_coverage from scratch (one semi-join over unclaimed rights)."""
+    now = datetime.now()
+    catalog_to = con.execute("SELECT MAX(fetched_at) FROM spotify_catalog").fetchone()[0]
+    source = parquet_source_sql(parquet_dir) if parquet_dir else "unclaimed_rights"
+    con.begin()
+    try:
+        # upsert everything, then drop what was not re-matched
+        con.execute(f"""
+            INSERT OR REPLACE INTO isrc_matches
+            SELECT {KEY}, isrc_norm, {', '.join(MATCH_COLUMNS)}, ? FROM {source}
+            WHERE isrc_norm IN (SELECT DISTINCT isrc_norm FROM spotify_catalog WHERE isrc_norm IS NOT NULL)
+        """, [now])
+        con.execute("DELETE FROM isrc_matches WHERE matched_at < ?", [now])
+        con.execute(COVERAGE_SQL.format(artist_filter=""), [now])
+        con.execute("DELETE FROM artist_coverage WHERE updated_at < ?", [now])
+        _set_state(con, catalog_to, now)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return {"mode": "rebuild", "keys": None, "matches": con.execute("SELECT COUNT(*) FROM isrc_matches").fetchone()[0]}
+
+
+def sync(con, parquet_dir=None, force_rebuild=False):
+    """Bring isrc_matches and artist_coverage up to date with only the ISRCs that changed.
+
+    Affected keys are the isrc_norm of catalog rows fetched since the last
+    sync plus the old and new ISRCs of unclaimed records changed since then.
+    Only those keys are looked up in unclaimed rights (index probes for small
+    sets), and only artists holding one of them get their coverage
+    recomputed. Falls back to rebuild() on the first run or after a full
+    re-ingest. Returns a dict describing what was done.
+    """
+    ensure_match_tables(con)
+    if force_rebuild or needs_rebuild(con):
+        return rebuild(con, parquet_dir)
+
+    now = datetime.now()
+    catalog_to = _synced_to(con, "catalog")
+    unclaimed_to = _synced_to(con, "unclaimed")
+    new_catalog_to = con.execute("SELECT MAX(fetched_at) FROM spotify_catalog").fetchone()[0]
+
+    keys = con.execute(
+        "SELECT DISTINCT isrc_norm FROM spotify_catalog WHERE isrc_norm IS NOT NULL AND fetched_at > COALESCE(?, TIMESTAMP '1970-01-01')",
+        [catalog_to],
+    ).df()["isrc_norm"].tolist()
+    changed_ids = []
+    if _table_exists(con, "unclaimed_rights_changes"):
+        changes = con.execute("""
+            SELECT record_id, normalize_isrc(old_isrc) AS old_norm, normalize_isrc(new_isrc) AS new_norm
+            FROM unclaimed_rights_changes WHERE applied_at > ?
+        """, [unclaimed_to]).df()
+        changed_ids = changes["record_id"].tolist()
+        keys += changes["old_norm"].dropna().tolist() + changes["new_norm"].dropna().tolist()
+    # keys still present in the catalog; matches of keys that left it are dropped below
+    keys = sorted(set(keys))
+    if keys:
+        con.register("sync_keys", pd.DataFrame({"isrc_norm": keys}))
+        keys = con.execute(
+            "SELECT isrc_norm FROM sync_keys WHERE isrc_norm IN (SELECT isrc_norm FROM spotify_catalog)"
+        ).df()["isrc_norm"].tolist()
+        con.unregister("sync_keys")
+
+    rows = match_isrc_keys(con, keys, columns=f"{KEY}, isrc_norm, {', '.join(MATCH_COLUMNS)}", parquet_dir=parquet_dir)
+    con.begin()
+    try:
+        # upsert first, then prune (DuckDB rejects re-inserting a key deleted in the same transaction)
+        _upsert_matches(con, rows, now)
+        con.register("sync_found", pd.DataFrame({"record_id": rows[KEY].tolist()}, dtype="int64"))
+        con.register("sync_keys", pd.DataFrame({"isrc_norm": keys}, dtype="object"))
+        con.register("sync_changed", pd.DataFrame({"record_id": changed_ids}, dtype="int64"))
+        removed = con.execute("""
+            DELETE FROM isrc_matches
+            WHERE (isrc_norm IN (SELECT isrc_norm FROM sync_keys) OR record_id IN (SELECT record_id FROM sync_changed)
+                   OR isrc_norm NOT IN (SELECT isrc_norm FROM spotify_catalog WHERE isrc_norm IS NOT NULL))
+              AND record_id NOT IN (SELECT record_id FROM sync_found)
+            RETURNING record_id
+        """).fetchall()
+
+        # artists holding an affected key, or with newly fetched rows
+        con.execute(COVERAGE_SQL.format(artist_filter="""
+            AND c.artist_id IN (
+                SELECT artist_id FROM spotify_catalog
+                WHERE isrc_norm IN (SELECT isrc_norm FROM sync_keys)
+                   OR fetched_at > COALESCE(?, TIMESTAMP '1970-01-01'))
+        """), [now, catalog_to])
+        con.execute("DELETE FROM artist_coverage WHERE artist_id NOT IN (SELECT artist_id FROM spotify_catalog)")
+        for name in ("sync_found", "sync_keys", "sync_changed"):
+            con.unregister(name)
+        _set_state(con, new_catalog_to or catalog_to, now)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return {"mode": "incremental", "keys": len(keys), "matches": len(rows), "removed": len(removed)}
+
+
+def load_coverage(con, artist_ids=None, limit=None):
+    """artist_coverage in report form (Artist / Total Tracks / Matched / Coverage_%), most matched first."""
+    df = con.execute("""
+        SELECT artist_id, artist_name AS "Artist", total_tracks AS "Total Tracks", matched AS "Matched",
+               coverage_pct AS "Coverage_%"
+        FROM artist_coverage ORDER BY matched DESC, artist_name
+    """).df()
+    if artist_ids is not None:
+        df = df[df["artist_id"].isin(list(artist_ids))]
+    return df.head(limit) if limit else df
+
+
+def load_matches(con, artist_ids=None):
+    """Catalog tracks joined to their stored unclaimed matches (no scan of unclaimed_rights)."""
+    artist_filter = ""
+    if artist_ids is not None:
+        con.register("report_artists", pd.DataFrame({"artist_id": list(artist_ids)}, dtype="object"))
+        artist_filter = "AND c.artist_id IN (SELECT artist_id FROM report_artists)"
+    try:
+        return con.execute(f"""
+            SELECT c.artist_name AS artist, c.artist_id, m.record_id AS {KEY}, m.isrc_norm,
+                   {', '.join('m.' + col for col in MATCH_COLUMNS)},
+                   c.track_name, c.album_name AS album, c.release_date
+            FROM spotify_catalog c JOIN isrc_matches m USING (isrc_norm)
+            WHERE c.isrc IS NOT NULL {artist_filter}
+            ORDER BY artist, m.isrc_norm
+        """).df()
+    finally:
+        if artist_ids is not None:
+            con.unregister("report_artists")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the persistent isrc_matches / artist_coverage tables.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute everything (e.g. after build_isrc_key.py)")
+    args = parser.parse_args()
+
+    con = duckdb.connect(str(db_path))
+    start = time.perf_counter()
+    result = sync(con, force_rebuild=args.rebuild)
+    log(f"Match sync ({result['mode']}) in {time.perf_counter() - start:.3f}s: {result}")
+    print(load_coverage(con, limit=20).drop(columns="artist_id").to_string(index=False))
+    con.close()
@@ -1,99 +1,173 @@
-import os, time
+import argparse, sys
+from datetime import datetime
 import duckdb, pandas as pd
 from pathlib import Path
-from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 from openpyxl import Workbook
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import add_parquet_argument, parquet_arg
+from match.fuzzy_match import build_blocking_index, fuzzy_matches, index_stale
+from match.match_store import load_coverage, load_matches, sync
+from spotify.artist_resolver import resolve_artists
+from spotify.async_crawler import stream_artist_sync
+from spotify.catalog_store import catalog_rows, ensure_catalog, incomplete_albums, load_artist, prune_artist, save_tracks
+from spotify.client import get_cache, get_spotify, get_token
+
 # === Paths ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
 db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"
 workbook_path = base_dir / "reports" / "tritone_multi_artist_report.xlsx"
+catalog_csv = base_dir / "data" / "interim" / "multi_artist_catalog.csv"   # appended per crawled batch
+matches_csv = base_dir / "reports" / "multi_artist_matches.csv"          # written by the batch match
+fuzzy_csv = base_dir / "reports" / "multi_artist_fuzzy_matches.csv"      # title/artist/duration fallback
+parquet_export = base_dir / "data" / "processed" / "unclaimed_parquet"     # matched against with --parquet
 log_path = base_dir / "logs" / "07C_multi_artist_crossref.log"
 
+parser = argparse.ArgumentParser(description="Cross-reference Spotify artist catalogs with unclaimed rights.")
+parser.add_argument("--refresh", action="store_true",
+                    help="reuse tracks stored in spotify_catalog and only crawl albums not seen before")
+add_parquet_argument(parser, parquet_export)
+args = parser.parse_args()
+unclaimed_parquet = parquet_arg(parser, args)   # None: the unclaimed_rights table
+
 def log(msg):
     print(msg)
     with open(log_path, "a", encoding="utf-8") as f:
         f.write(msg + "\n")
 
-load_dotenv(base_dir / ".env")
-
-# === Spotify auth ===
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-    client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-    client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
-    redirect_uri=os.getenv("SPOTIFY_REDIRECT_URI"),
-    scope="user-read-private",
-    cache_path=base_dir / "config" / ".spotify_token_cache",
-    open_browser=False
-))
+# === Spotify auth (shared client: pooled session, response cache, token cache) ===
+sp = get_spotify()
+http_cache = get_cache()
 log("Spotify authentication successful.\n")
 
 # === Connect to DuckDB ===
-con = duckdb.connect(str(db_path))
+# spotify_catalog snapshots live in the project database even when matching reads Parquet
+catalog_con = duckdb.connect(str(db_path))
 log(f"Connected to DuckDB: {db_path}\n")
+ensure_catalog(catalog_con)
 
 artists = ["Martin Jacoby", "Armin van Buuren", "Sizzla"]
-summary_rows = []
+# one parallel pass for names not yet in artist_spotify_map (spotify/artist_resolver.py)
+artist_ids = resolve_artists(catalog_con, sp, artists)
 writer = pd.ExcelWriter(workbook_path, engine="openpyxl")
 
-def fetch_full_catalog(artist_name):
-    search = sp.search(q=f"artist:{artist_name}", type="artist", limit=1)
-    if not search["artists"]["items"]:
+def to_batch(rows, artist_name):
+    """spotify_catalog rows -> the track frame that gets matched and reported."""
+    rows = rows[rows["isrc"].notna()]
+    return pd.DataFrame({
+        "artist": artist_name,
+        "track_name": rows["track_name"],
+        "album": rows["album_name"],
+        "release_date": rows["release_date"],
+        "isrc": rows["isrc_norm"],   # normalized when stored (core/isrc_keys.py)
+    })
+
+def stream_catalog(artist_name):
+    """Yield the artist's tracks with ISRCs as one DataFrame per crawled micro-batch.
+
+    The crawl runs ahead on a background thread, so each batch is stored
+    and written out while the next one is still being fetched. Every batch is
+    upserted into spotify_catalog; with --refresh the stored tracks come
+    first and only albums not seen before are crawled.
+    """
+    artist_id = artist_ids[artist_name]
+    if artist_id is None:
+        return
+    started = datetime.now()
+
+    skip = None
+    if args.refresh:
+        stored = load_artist(catalog_con, artist_id)
+        skip = set(stored["album_id"])
+        log(f"{artist_name}: {len(skip)} albums already stored")
+        if len(stored):
+            yield to_batch(stored, artist_name)
+
+    stats, failed_ids = {}, set()
+    for albums, album_tracks, failed in stream_artist_sync(
+            get_token(), artist_id, include_groups="album,single,compilation",
+            stats=stats, skip_albums=skip, cache=http_cache):
+        for album_id, e in failed.items():
+            log(f"Error fetching album {album_id}: {e}")
+        incomplete = incomplete_albums(albums, album_tracks, failed)
+        failed_ids.update(incomplete)
+        rows = catalog_rows(artist_id, artist_name, [a for a in albums if a["id"] not in incomplete], album_tracks)
+        save_tracks(catalog_con, rows)
+        batch = to_batch(rows, artist_name)
+        if len(batch):
+            yield batch
+    if not args.refresh:
+        removed = prune_artist(catalog_con, artist_id, started, keep_albums=failed_ids)
+        if removed:
+            log(f"{artist_name}: {removed} tracks no longer listed, removed from spotify_catalog")
+    log(f"{artist_name}: {stats.get('requests', 0):,} requests | {stats.get('throttled', 0):,} throttled")
+
+def append_csv(df, path):
+    df.to_csv(path, mode="a", header=not path.exists(), index=False)
+
+def read_artist_rows(path, artist_name):
+    if not path.exists():
         return pd.DataFrame()
-    artist_id = search["artists"]["items"][0]["id"]
-    albums = sp.artist_albums(artist_id, album_type="album,single,compilation", limit=50)
-    tracks = []
-    for album in albums["items"]:
-        album_id = album["id"]
-        album_name = album["name"]
-        release_date = album["release_date"]
-        for t in sp.album_tracks(album_id)["items"]:
-            isrc = t.get("external_ids", {}).get("isrc")
-            if not isrc:
-                full_t = sp.track(t["id"])
-                isrc = full_t.get("external_ids", {}).get("isrc")
-            if isrc:
-                tracks.append({
-                    "artist": artist_name,
-                    "track_name": t["name"],
-                    "album": album_name,
-                    "release_date": release_date,
-                    "isrc": isrc.upper().replace("-", "").strip()
-                })
-        time.sleep(0.2)
-    return pd.DataFrame(tracks)
+    chunks = [c[c["artist"] == artist_name] for c in pd.read_csv(path, chunksize=100_000)]
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+# Start this run's incremental outputs fresh
+for path in (catalog_csv, matches_csv, fuzzy_csv):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
 
+# === 1. Crawl every artist into spotify_catalog ===
+crawled, summary_rows = [], []
 for name in artists:
     log(f"Processing artist: {name}")
-    catalog_df = fetch_full_catalog(name)
-    if catalog_df.empty:
+    total_tracks = 0
+    for catalog_df in stream_catalog(name):
+        append_csv(catalog_df, catalog_csv)
+        total_tracks += len(catalog_df)
+    if not total_tracks:
         log(f"No catalog data for {name}\n")
         continue
-    con.register("isrcs", catalog_df[["isrc", "track_name", "album", "release_date"]])
-    matches_df = con.execute("""
-        SELECT r.*, i.track_name, i.album, i.release_date
-        FROM unclaimed_rights r
-        JOIN isrcs i ON REPLACE(UPPER(r.ISRC), '-', '') = i.isrc
-    """).fetchdf()
-    con.unregister("isrcs")
-
-    total_tracks = len(catalog_df)
-    matched = len(matches_df["ISRC"].unique())
-    coverage = (matched / total_tracks * 100) if total_tracks else 0
-    summary_rows.append((name, total_tracks, matched, round(coverage, 2)))
-
-    # save per-artist sheets
-    catalog_df.to_excel(writer, sheet_name=f"{name[:20]}_Catalog", index=False)
-    matches_df.to_excel(writer, sheet_name=f"{name[:20]}_Matches", index=False)
-    log(f"{name}: {matched}/{total_tracks} matched ({coverage:.2f}%)\n")
-
-con.close()
+    crawled.append(name)
+    no_isrc = catalog_con.execute("SELECT COUNT(*) FROM spotify_catalog WHERE artist_id = ? AND isrc IS NULL",
+                                  [artist_ids[name]]).fetchone()[0]
+    log(f"{name}: {total_tracks:,} tracks with ISRCs, {no_isrc:,} without (left to the fuzzy matcher)\n")
+
+# === 2. Bring isrc_matches / artist_coverage up to date (match/match_store.py) ===
+# Only ISRCs added to spotify_catalog or changed in unclaimed_rights since the
+# last sync are looked up; the report then reads the stored tables.
+sync_result = sync(catalog_con, parquet_dir=unclaimed_parquet)
+log(f"Match tables synced ({sync_result['mode']}): {sync_result}")
+crawled_ids = [artist_ids[n] for n in crawled]
+summary_df = load_coverage(catalog_con, crawled_ids).set_index("artist_id")
+matches_df = load_matches(catalog_con, crawled_ids)
+matches_df.to_csv(matches_csv, index=False)
+
+# === 3. Fuzzy fallback for tracks without an exact ISRC match (match/fuzzy_match.py) ===
+# Kept apart from the exact matches: own CSV, own sheet, own summary column.
+if index_stale(catalog_con):
+    keys, blocks = build_blocking_index(catalog_con)
+    log(f"Fuzzy blocking index rebuilt: {keys:,} keys in {blocks:,} blocks")
+fuzzy_df = fuzzy_matches(catalog_con, crawled_ids)
+fuzzy_df.to_csv(fuzzy_csv, index=False)
+log(f"Fuzzy matches: {len(fuzzy_df):,} tracks -> {fuzzy_csv}")
+
+for name in crawled:
+    total, matched, coverage = summary_df.loc[artist_ids[name], ["Total Tracks", "Matched", "Coverage_%"]]
+    artist_fuzzy = fuzzy_df[fuzzy_df["artist_id"] == artist_ids[name]]
+    summary_rows.append((name, total, matched, coverage, len(artist_fuzzy)))
+    log(f"{name}: {matched}/{total} matched ({coverage:.2f}%), {len(artist_fuzzy)} fuzzy candidates")
+    read_artist_rows(catalog_csv, name).to_excel(writer, sheet_name=f"{name[:20]}_Catalog", index=False)
+    matches_df[matches_df["artist_id"] == artist_ids[name]].drop(columns=["artist", "artist_id"]).to_excel(
+        writer, sheet_name=f"{name[:20]}_Matches", index=False)
+    artist_fuzzy.drop(columns=["artist_id", "artist_name"]).to_excel(writer, sheet_name=f"{name[:20]}_Fuzzy", index=False)
+
+catalog_con.close()
 log("Connection closed.\n")
+cache_stats = http_cache.stats()
+log(f"HTTP cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses ({cache_stats['hit_rate']:.1%})\n")
 
 # === Summary sheet ===
-summary_df = pd.DataFrame(summary_rows, columns=["Artist","Total Tracks","Matched","Coverage_%"])
+summary_df = pd.DataFrame(summary_rows, columns=["Artist","Total Tracks","Matched","Coverage_%","Fuzzy Matches"])
 summary_df.to_excel(writer, sheet_name="Summary", index=False)
 writer.close()
 
@@ -0,0 +1,187 @@
+import argparse
+import re
+import sys
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from difflib import SequenceMatcher
+from pathlib import Path
+import duckdb
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import match_isrc_keys, normalize_isrc
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"      # holds the artist_spotify_map table
+profile_csv = base_dir / "reports" / "tsv_artist_profile.csv"       # written by analysis/profile_tsv_artists.py
+log_path = base_dir / "logs" / "07A_artist_resolver.log"
+
+# === Parameters ===
+SEARCH_LIMIT = 5          # candidates looked at per name
+SAMPLE_MIN_NAME = 0.6     # only candidates this similar get their top tracks sampled
+ISRC_BONUS = 0.5          # added to the name score when sampled ISRCs are credited to the name in unclaimed_rights
+ISRC_FULL_HITS = 5        # ...scaled by hits, reaching the full bonus at this many
+MIN_SCORE = 0.85          # below this the name is stored as unresolved (artist_id NULL)
+WORKERS = 8
+MARKET = "US"
+
+ARTIST_MAP_SQL = """
+CREATE TABLE IF NOT EXISTS artist_spotify_map (
+    artist_name  TEXT PRIMARY KEY,
+    artist_id    TEXT,
+    spotify_name TEXT,
+    name_score   DOUBLE,
+    isrc_hits    INTEGER,
+    isrc_sampled INTEGER,
+    score        DOUBLE,
+    candidates   INTEGER,
+    resolved_at  TIMESTAMP
+);
+"""
+
+MAP_COLUMNS = [
+    "artist_name", "artist_id", "spotify_name", "name_score", "isrc_hits",
+    "isrc_sampled", "score", "candidates", "resolved_at",
+]
+
+
+def log(msg):
+    print(msg)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+def ensure_artist_map(con):
+    con.execute(ARTIST_MAP_SQL)
+
+
+def name_key(name):
+    """Comparison form of an artist name: accents stripped, case-folded, leading 'the' and punctuation dropped."""
+    name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode().casefold()
+    name = re.sub(r"[^\w\s]", " ", name.replace("&", " and "))
+    return re.sub(r"^the\s+", "", " ".join(name.split()))
+
+
+def name_similarity(a, b):
+    return round(SequenceMatcher(None, name_key(a), name_key(b)).ratio(), 4)
+
+
+def search_candidates(sp, name):
+    """Spotify artist candidates for one name, with top-track ISRCs for the plausible ones.
+
+    Runs on the worker threads; makes 1 search call plus 1 top-tracks call
+    per candidate scoring at least SAMPLE_MIN_NAME on the name alone.
+    """
+    items = sp.search(q=f"artist:{name}", type="artist", limit=SEARCH_LIMIT)["artists"]["items"]
+    candidates = []
+    for a in items:
+        score = name_similarity(name, a["name"])
+        isrcs = set()
+        if score >= SAMPLE_MIN_NAME:
+            for t in sp.artist_top_tracks(a["id"], country=MARKET)["tracks"]:
+                isrc = normalize_isrc((t.get("external_ids") or {}).get("isrc"))
+                if isrc:
+                    isrcs.add(isrc)
+        candidates.append({"id": a["id"], "name": a["name"], "popularity": a.get("popularity") or 0,
+                           "name_score": score, "isrcs": isrcs})
+    return candidates
+
+
+def isrc_hits(con, name, isrcs):
+    """How many of `isrcs` unclaimed_rights credits to `name` (case-insensitive)."""
+    if not isrcs:
+        return 0
+    rows = match_isrc_keys(con, isrcs, columns="isrc_norm, DisplayArtistName")
+    credited = rows[rows["DisplayArtistName"].fillna("").str.strip().str.casefold() == name.strip().casefold()]
+    return credited["isrc_norm"].nunique()
+
+
+def choose(con, name, candidates, resolved_at=None):
+    """Score every candidate and return the artist_spotify_map row for `name`."""
+    best = None
+    for c in candidates:
+        c["isrc_hits"] = isrc_hits(con, name, c["isrcs"])
+        c["score"] = round(c["name_score"] + ISRC_BONUS * min(c["isrc_hits"], ISRC_FULL_HITS) / ISRC_FULL_HITS, 4)
+        if best is None or (c["score"], c["popularity"]) > (best["score"], best["popularity"]):
+            best = c
+    accepted = best is not None and best["score"] >= MIN_SCORE
+    return {
+        "artist_name": name,
+        "artist_id": best["id"] if accepted else None,
+        "spotify_name": best["name"] if best else None,
+        "name_score": best["name_score"] if best else None,
+        "isrc_hits": best["isrc_hits"] if best else 0,
+        "isrc_sampled": len(best["isrcs"]) if best else 0,
+        "score": best["score"] if best else None,
+        "candidates": len(candidates),
+        "resolved_at": resolved_at or datetime.now(),
+    }
+
+
+def save_mapping(con, rows):
+    if not rows:
+        return 0
+    con.register("map_batch", pd.DataFrame(rows, columns=MAP_COLUMNS))
+    con.execute(f"INSERT OR REPLACE INTO artist_spotify_map SELECT {', '.join(MAP_COLUMNS)} FROM map_batch")
+    con.unregister("map_batch")
+    return len(rows)
+
+
+def stored_mapping(con, names=None):
+    """artist_spotify_map as a DataFrame, optionally limited to `names`."""
+    df = con.execute(f"SELECT {', '.join(MAP_COLUMNS)} FROM artist_spotify_map").df()
+    return df if names is None else df[df["artist_name"].isin([n.strip() for n in names])]
+
+
+def resolve_artists(con, sp, names, refresh=False, workers=WORKERS):
+    """name -> Spotify artist ID (None when unresolved) for every name.
+
+    Names already in artist_spotify_map are answered from the table,
+    including earlier misses; the rest are searched in parallel and stored.
+    """
+    ensure_artist_map(con)
+    names = list(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+    known = {} if refresh else dict(stored_mapping(con, names)[["artist_name", "artist_id"]].itertuples(index=False))
+    todo = [n for n in names if n not in known]
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            found = list(pool.map(lambda n: search_candidates(sp, n), todo))
+        resolved_at = datetime.now()
+        rows = [choose(con, n, c, resolved_at) for n, c in zip(todo, found)]
+        save_mapping(con, rows)
+        known.update((r["artist_name"], r["artist_id"]) for r in rows)
+    return {n: (known[n] if pd.notna(known[n]) else None) for n in names}
+
+
+def resolve_artist(con, sp, name, refresh=False):
+    """Single-name form of resolve_artists()."""
+    return resolve_artists(con, sp, [name], refresh=refresh, workers=1)[name.strip()]
+
+
+if __name__ == "__main__":
+    from spotify.client import get_cache, get_spotify
+
+    parser = argparse.ArgumentParser(description="Resolve the TSV artist profile to Spotify artist IDs.")
+    parser.add_argument("--profile", type=Path, default=profile_csv)
+    parser.add_argument("--limit", type=int, default=None, help="only the top N names of the profile")
+    parser.add_argument("--refresh", action="store_true", help="search again even for names already mapped")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    names = pd.read_csv(args.profile)["artist_name"].dropna().tolist()[:args.limit]
+    log(f"Resolving {len(names)} artist names from {args.profile}")
+
+    con = duckdb.connect(str(db_path))
+    sp, http_cache = get_spotify(), get_cache()
+    resolve_artists(con, sp, names, refresh=args.refresh, workers=args.workers)
+
+    df = stored_mapping(con, names)
+    con.close()
+    resolved = df["artist_id"].notna().sum()
+    log(f"Resolved {resolved}/{len(df)} names ({len(df) - resolved} below score {MIN_SCORE})")
+    print(df[["artist_name", "spotify_name", "artist_id", "name_score", "isrc_hits", "score"]].to_string(index=False))
+    cache_stats = http_cache.stats()
+    log(f"HTTP cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses ({cache_stats['hit_rate']:.1%})\n")
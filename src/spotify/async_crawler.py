@@ -0,0 +1,223 @@
+import asyncio
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from spotify.client import get_session
+from spotify.isrc_resolver import ALBUMS_PER_CALL, chunked, resolve_album_tracks
+from spotify.rate_limit import TokenBucket, backoff_delay
+from spotify.replay import API_URL, recorder
+
+# === Defaults ===
+DEFAULT_CONCURRENCY = 16      # requests in flight at once
+MAX_RETRIES = 5               # per request, for 429 / 5xx / connection errors
+REQUEST_TIMEOUT = 15          # seconds
+ALBUM_GROUPS = "album,single,compilation,appears_on"
+STREAM_ALBUMS = 5 * ALBUMS_PER_CALL   # albums resolved per streamed micro-batch
+STREAM_QUEUE = 4                      # micro-batches buffered ahead of the consumer
+
+
+class AsyncSpotifyClient:
+    """Concurrent Spotify Web API GETs behind a shared adaptive token bucket.
+
+    Requests go through the process-wide keep-alive session (spotify/client.py)
+    on a thread pool sized to `concurrency`, so no extra HTTP dependency is
+    needed. `token_provider` is called per request (a SharedToken refreshes
+    ahead of expiry). 429s pause the bucket for Retry-After, 5xx and
+    connection errors back off with jitter, and a 401 invalidates the token
+    once. With a ResponseCache, hits are answered before touching the bucket
+    or the network.
+    """
+
+    def __init__(self, token_provider, base_url=API_URL, concurrency=DEFAULT_CONCURRENCY,
+                 bucket=None, max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT, cache=None, session=None):
+        self.token_provider = token_provider
+        self.base_url = base_url.rstrip("/") + "/"
+        self.concurrency = concurrency
+        self.bucket = bucket or TokenBucket()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.cache = cache
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0}
+
+        self.session = session or get_session()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="spotify")
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)   # the session is shared and stays open
+
+    def _send(self, url, params):
+        return self.session.get(url, params=params, timeout=self.timeout,
+                                headers={"Authorization": f"Bearer {self.token_provider()}"})
+
+    async def get(self, path, params=None, use_cache=True):
+        """GET `path` (relative to base_url, or a full `next` URL) and return the JSON body.
+
+        use_cache=False skips the cache lookup (the response is still stored).
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        url = path if path.startswith("http") else self.base_url + path.lstrip("/")
+        if self.cache is not None and use_cache:
+            body = self.cache.get(url, params)
+            if body is not None:
+                if recorder():
+                    recorder().record(url, params, body)
+                return body
+        loop = asyncio.get_running_loop()
+        refreshed = False
+
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                async with self._semaphore:
+                    self.stats["requests"] += 1
+                    resp = await loop.run_in_executor(self._executor, self._send, url, params)
+            except requests.RequestException:
+                if attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            if resp.status_code == 429:
+                self.stats["throttled"] += 1
+                retry_after = resp.headers.get("Retry-After")
+                self.bucket.penalize(float(retry_after) if retry_after else None)
+            elif resp.status_code == 401 and not refreshed:
+                if hasattr(self.token_provider, "invalidate"):
+                    self.token_provider.invalidate()
+                refreshed = True
+            elif resp.status_code >= 500:
+                await asyncio.sleep(backoff_delay(attempt))
+            else:
+                resp.raise_for_status()
+                self.bucket.reward()
+                body = resp.json()
+                if self.cache is not None:
+                    self.cache.put(url, params, body)
+                if recorder():
+                    recorder().record(url, params, body)
+                return body
+
+            if attempt == self.max_retries:
+                resp.raise_for_status()
+            self.stats["retries"] += 1
+
+    async def paginate(self, path, params=None, key=None, page_size=50, use_cache=True):
+        """All items of a paging object. Page 1 gives `total`; the rest are fetched concurrently."""
+        params = dict(params or {}, limit=page_size, offset=0)
+        first = await self.get(path, params, use_cache)
+        page = first[key] if key else first
+        items = list(page["items"])
+        offsets = range(page_size, page.get("total") or 0, page_size)
+        pages = await asyncio.gather(*(self.get(path, dict(params, offset=o), use_cache) for o in offsets))
+        for p in pages:
+            items.extend((p[key] if key else p)["items"])
+        return items
+
+
+async def list_albums(client, artist_id, include_groups=ALBUM_GROUPS, skip_albums=None):
+    """An artist's albums, de-duplicated by ID.
+
+    With `skip_albums` (IDs already stored) the listing bypasses the response
+    cache so new releases show up, and known albums are dropped.
+    """
+    albums = await client.paginate(f"artists/{artist_id}/albums", {"include_groups": include_groups},
+                                   use_cache=skip_albums is None)
+    albums = {a["id"]: a for a in albums}
+    return [a for album_id, a in albums.items() if album_id not in (skip_albums or ())]
+
+
+async def crawl_artist(client, artist_id, include_groups=ALBUM_GROUPS, skip_albums=None):
+    """Every album of an artist with full track objects (ISRCs included).
+
+    Album pages are listed concurrently, then albums and tracks are resolved
+    in batches (see spotify/isrc_resolver.py). Returns (albums, album_tracks,
+    failed): albums de-duplicated by ID, album_tracks mapping album ID -> full
+    track objects, and failed mapping album/track ID -> the exception.
+    Albums in `skip_albums` are neither returned nor fetched.
+    """
+    albums = await list_albums(client, artist_id, include_groups, skip_albums)
+    album_tracks, failed = await resolve_album_tracks(client, [a["id"] for a in albums])
+    return albums, album_tracks, failed
+
+
+def crawl_artist_sync(token_provider, artist_id, include_groups=ALBUM_GROUPS, skip_albums=None, **client_kwargs):
+    """Blocking wrapper for scripts: run crawl_artist on a fresh client and event loop."""
+    async def run():
+        async with AsyncSpotifyClient(token_provider, **client_kwargs) as client:
+            result = await crawl_artist(client, artist_id, include_groups, skip_albums)
+            return (*result, dict(client.stats))
+    return asyncio.run(run())
+
+
+async def stream_artist(client, artist_id, include_groups=ALBUM_GROUPS, batch_albums=STREAM_ALBUMS, skip_albums=None):
+    """Like crawl_artist, but yields (albums, album_tracks, failed) per micro-batch of albums."""
+    albums = await list_albums(client, artist_id, include_groups, skip_albums)
+    for batch in chunked(albums, batch_albums):
+        album_tracks, failed = await resolve_album_tracks(client, [a["id"] for a in batch])
+        yield batch, album_tracks, failed
+
+
+def stream_artist_sync(token_provider, artist_id, include_groups=ALBUM_GROUPS, batch_albums=STREAM_ALBUMS,
+                       queue_size=STREAM_QUEUE, stats=None, skip_albums=None, **client_kwargs):
+    """Blocking generator of stream_artist micro-batches.
+
+    The crawl runs on its own thread and event loop and hands batches over a
+    bounded queue, so the caller can match one batch while the next is being
+    fetched and at most `queue_size` batches are held in memory. Once the
+    generator is exhausted, the final client stats are copied into the
+    `stats` dict, if one was passed.
+    """
+    batches = queue.Queue(maxsize=queue_size)
+    done = object()
+    stop = threading.Event()
+
+    async def produce():
+        async with AsyncSpotifyClient(token_provider, **client_kwargs) as client:
+            async for item in stream_artist(client, artist_id, include_groups, batch_albums, skip_albums):
+                while not stop.is_set():
+                    try:
+                        batches.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+            return dict(client.stats)
+
+    def run():
+        try:
+            result = asyncio.run(produce())
+        except BaseException as e:
+            result = e
+        if not stop.is_set():
+            batches.put((done, result))
+
+    producer = threading.Thread(target=run, daemon=True, name="spotify-crawl")
+    producer.start()
+    try:
+        while True:
+            item = batches.get()
+            if item[0] is done:
+                if isinstance(item[1], BaseException):
+                    raise item[1]
+                if stats is not None:
+                    stats.update(item[1])
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join(timeout=5)
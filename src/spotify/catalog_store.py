@@ -0,0 +1,107 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from core.isrc_keys import normalize_isrcs
+
+CATALOG_SQL = """
+CREATE TABLE IF NOT EXISTS spotify_catalog (
+    artist_id    TEXT,
+    artist_name  TEXT,
+    album_id     TEXT,
+    album_name   TEXT,
+    album_type   TEXT,
+    release_date TEXT,
+    track_id     TEXT,
+    track_name   TEXT,
+    isrc         TEXT,
+    isrc_norm    TEXT,
+    duration_ms  INTEGER,
+    fetched_at   TIMESTAMP,
+    PRIMARY KEY (artist_id, album_id, track_id)
+);
+"""
+
+CATALOG_COLUMNS = [
+    "artist_id", "artist_name", "album_id", "album_name", "album_type", "release_date",
+    "track_id", "track_name", "isrc", "isrc_norm", "duration_ms", "fetched_at",
+]
+
+
+def ensure_catalog(con):
+    con.execute(CATALOG_SQL)
+
+
+def known_albums(con, artist_id):
+    """Album IDs already stored for an artist."""
+    rows = con.execute("SELECT DISTINCT album_id FROM spotify_catalog WHERE artist_id = ?", [artist_id]).fetchall()
+    return {r[0] for r in rows}
+
+
+def incomplete_albums(albums, album_tracks, failed):
+    """IDs of crawled albums that failed, or hold a track whose full object failed to load.
+
+    Their tracks would be stored without ISRCs, so callers leave them out of
+    catalog_rows and keep their stored rows on prune.
+    """
+    return {a["id"] for a in albums if a["id"] in failed
+            or any(t["id"] in failed for t in album_tracks.get(a["id"], []))}
+
+
+def catalog_rows(artist_id, artist_name, albums, album_tracks, fetched_at=None):
+    """Flatten crawled albums and their full track objects into spotify_catalog rows."""
+    fetched_at = fetched_at or datetime.now()
+    rows = []
+    for album in albums:
+        for t in album_tracks.get(album["id"], []):
+            isrc = (t.get("external_ids") or {}).get("isrc")
+            rows.append((
+                artist_id, artist_name, album["id"], album["name"], album.get("album_type"),
+                album.get("release_date"), t["id"], t["name"], isrc, None,
+                t.get("duration_ms"), fetched_at,
+            ))
+    df = pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+    df["isrc_norm"] = normalize_isrcs(df["isrc"])[0]
+    return df
+
+
+def save_tracks(con, rows):
+    """Upsert catalog rows in one transaction; returns the row count."""
+    if not len(rows):
+        return 0
+    con.begin()
+    try:
+        con.register("catalog_batch", rows)
+        con.execute(f"INSERT OR REPLACE INTO spotify_catalog SELECT {', '.join(CATALOG_COLUMNS)} FROM catalog_batch")
+        con.unregister("catalog_batch")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return len(rows)
+
+
+def load_artist(con, artist_id):
+    """Stored catalog of one artist as a DataFrame."""
+    return con.execute(
+        f"SELECT {', '.join(CATALOG_COLUMNS)} FROM spotify_catalog WHERE artist_id = ? ORDER BY release_date, album_id",
+        [artist_id],
+    ).df()
+
+
+def prune_artist(con, artist_id, before, keep_albums=()):
+    """After a completed full crawl: drop the artist's rows not re-fetched since `before`.
+
+    Rows of `keep_albums` (albums the crawl failed to fetch) are kept, so a
+    429 or 5xx that ran out of retries never deletes stored tracks.
+    Upsert-then-prune rather than delete-then-insert: DuckDB rejects
+    re-inserting a primary key deleted earlier in the same transaction.
+    """
+    removed = con.execute(
+        "DELETE FROM spotify_catalog WHERE artist_id = ? AND fetched_at < ? "
+        "AND NOT list_contains(?::TEXT[], album_id) RETURNING track_id",
+        [artist_id, before, sorted(keep_albums)],
+    ).fetchall()
+    return len(removed)
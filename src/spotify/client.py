@@ -0,0 +1,204 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import requests
+from dotenv import load_dotenv
+import spotipy
+from requests.adapters import HTTPAdapter
+from spotipy.cache_handler import CacheFileHandler
+from spotipy.oauth2 import SpotifyOAuth
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from spotify.http_cache import CachedSession, ResponseCache
+from spotify.replay import API_URL, REAL_API_URL
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+token_cache_path = base_dir / "config" / ".spotify_token_cache"
+
+# === Parameters ===
+POOL_SIZE = 32            # keep-alive connections per host, shared by all crawlers in a process
+REFRESH_MARGIN = 300      # refresh the access token this many seconds before it expires
+REQUEST_TIMEOUT = 15
+SCOPE = "user-read-private"
+
+_lock = threading.Lock()
+_spotify = _token = _session = _cache = _pool = None
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive cross-process lock on `path` (created if missing)."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class AtomicCacheFileHandler(CacheFileHandler):
+    """Token cache file that is replaced atomically, so readers never see half a write."""
+
+    def save_token_to_cache(self, token_info):
+        tmp = Path(f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(token_info, cls=self.encoder_cls), encoding="utf-8")
+        os.replace(tmp, self.cache_path)
+
+
+class SharedToken:
+    """Access token shared by every thread and process using the same token cache.
+
+    Callable (returns the token string) for the async crawler, and also passed
+    to spotipy as its auth manager. The token is refreshed REFRESH_MARGIN
+    seconds before expiry rather than after a request fails. Refreshes happen
+    under a lock file next to the cache: whichever worker gets there first
+    refreshes, and the others pick up its token from the cache.
+    """
+
+    def __init__(self, oauth, margin=REFRESH_MARGIN):
+        self.oauth = oauth
+        self.margin = margin
+        self.lock_path = Path(f"{oauth.cache_handler.cache_path}.lock")
+        self._info = None
+        self._rejected = None   # access token the API answered 401 to
+        self._lock = threading.Lock()
+
+    def _fresh(self, info):
+        return (bool(info) and info.get("access_token") != self._rejected
+                and info.get("expires_at", 0) - time.time() > self.margin)
+
+    def _refresh(self):
+        with file_lock(self.lock_path):
+            info = self.oauth.cache_handler.get_cached_token()
+            if self._fresh(info):
+                return info   # another worker already refreshed
+            if info and info.get("refresh_token"):
+                return self.oauth.refresh_access_token(info["refresh_token"])
+            self.oauth.get_access_token(as_dict=False)   # first run: interactive authorization
+            return self.oauth.cache_handler.get_cached_token()
+
+    def __call__(self):
+        info = self._info
+        if self._fresh(info):
+            return info["access_token"]
+        with self._lock:
+            if not self._fresh(self._info):
+                self._info = self._refresh()
+            return self._info["access_token"]
+
+    def invalidate(self):
+        """Force a refresh on the next call (e.g. after a 401)."""
+        with self._lock:
+            if self._info:
+                self._rejected = self._info["access_token"]
+
+    def get_access_token(self, as_dict=False, check_cache=True):
+        """spotipy auth-manager interface."""
+        return dict(self._info or {}, access_token=self()) if as_dict else self()
+
+
+class StaticToken:
+    """Fixed access token for a stand-in API (SPOTIFY_API_URL); never contacts accounts.spotify.com."""
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+
+    def __call__(self):
+        return self.access_token
+
+    def invalidate(self):
+        pass
+
+    def get_access_token(self, as_dict=False, check_cache=True):
+        """spotipy auth-manager interface."""
+        return {"access_token": self.access_token, "token_type": "Bearer"} if as_dict else self.access_token
+
+
+def get_token():
+    """The process-wide SharedToken, built from .env on first use.
+
+    With SPOTIFY_API_URL pointing at a stand-in, a StaticToken holding
+    SPOTIFY_ACCESS_TOKEN (default "offline") is used instead, so no OAuth
+    request or interactive authorization happens.
+    """
+    global _token
+    with _lock:
+        if _token is None:
+            load_dotenv(base_dir / ".env")
+            if API_URL != REAL_API_URL:
+                _token = StaticToken(os.getenv("SPOTIFY_ACCESS_TOKEN", "offline"))
+                return _token
+            oauth = SpotifyOAuth(
+                client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+                client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
+                redirect_uri=os.getenv("SPOTIFY_REDIRECT_URI"),
+                scope=SCOPE,
+                cache_handler=AtomicCacheFileHandler(cache_path=str(token_cache_path)),
+                open_browser=False,
+            )
+            _token = SharedToken(oauth)
+        return _token
+
+
+def get_cache():
+    """The process-wide ResponseCache (data/interim/spotify_http_cache.sqlite)."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def get_pool():
+    """The process-wide keep-alive pool (POOL_SIZE connections per host) behind every Spotify session."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+        return _pool
+
+
+def get_session():
+    """Process-wide session for concurrent crawlers, on the get_pool() connections spotipy also uses.
+
+    No retry policy is mounted: AsyncSpotifyClient retries itself, in step
+    with its token bucket.
+    """
+    global _session
+    pool = get_pool()
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", pool)
+            _session.mount("http://", pool)
+        return _session
+
+
+def get_spotify():
+    """The process-wide authenticated spotipy client, on a cached, pooled session."""
+    global _spotify
+    token, cache, pool = get_token(), get_cache(), get_pool()
+    with _lock:
+        if _spotify is None:
+            _spotify = spotipy.Spotify(
+                auth_manager=token,
+                requests_session=CachedSession(cache, pool_maxsize=POOL_SIZE, pool=pool),
+                requests_timeout=REQUEST_TIMEOUT,
+            )
+        return _spotify
@@ -0,0 +1,235 @@
+import argparse
+import multiprocessing
+import queue
+import sys
+from datetime import datetime
+from pathlib import Path
+import duckdb
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from spotify.artist_resolver import profile_csv, resolve_artists
+from spotify.async_crawler import stream_artist_sync
+from spotify.catalog_store import catalog_rows, ensure_catalog, incomplete_albums, known_albums, prune_artist, save_tracks
+from spotify.client import get_cache, get_spotify, get_token
+from spotify.rate_limit import SharedTokenBucket
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"   # crawl_queue + spotify_catalog
+log_path = base_dir / "logs" / "07D_crawl_queue.log"
+
+# === Parameters ===
+TOP_N = 200
+WORKERS = 4               # crawler processes
+CONCURRENCY = 8           # requests in flight per worker
+RATE = 20.0               # requests/sec for all workers together
+MAX_ATTEMPTS = 3          # failed artists are retried on later runs up to this many times
+RESULT_QUEUE = 16         # micro-batches buffered between the workers and the writer
+ALBUM_GROUPS = "album,single,compilation"
+
+QUEUE_SQL = """
+CREATE TABLE IF NOT EXISTS crawl_queue (
+    artist_name  TEXT PRIMARY KEY,
+    artist_id    TEXT,
+    record_count BIGINT,
+    status       TEXT,          -- pending | running | done | failed | unresolved
+    albums_done  INTEGER,
+    tracks       INTEGER,
+    requests     INTEGER,
+    attempts     INTEGER,
+    error        TEXT,
+    started_at   TIMESTAMP,
+    updated_at   TIMESTAMP
+);
+"""
+
+
+def log(msg):
+    print(msg)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(msg + "\n")
+
+
+def ensure_queue(con):
+    con.execute(QUEUE_SQL)
+
+
+def enqueue(con, profile):
+    """Add profile rows (artist_name, record_count) not queued yet; returns how many were added."""
+    before = con.execute("SELECT COUNT(*) FROM crawl_queue").fetchone()[0]
+    con.register("profile_batch", profile[["artist_name", "record_count"]])
+    con.execute("""
+        INSERT OR IGNORE INTO crawl_queue (artist_name, record_count, status, albums_done, tracks, requests, attempts, updated_at)
+        SELECT TRIM(artist_name), record_count, 'pending', 0, 0, 0, 0, now() FROM profile_batch
+    """)
+    con.unregister("profile_batch")
+    return con.execute("SELECT COUNT(*) FROM crawl_queue").fetchone()[0] - before
+
+
+def resolve_pending(con, sp):
+    """Fill in artist IDs for queued names (via artist_spotify_map); unmatched names become 'unresolved'."""
+    names = [r[0] for r in con.execute("SELECT artist_name FROM crawl_queue WHERE artist_id IS NULL AND status = 'pending'").fetchall()]
+    if not names:
+        return
+    for name, artist_id in resolve_artists(con, sp, names).items():
+        con.execute("UPDATE crawl_queue SET artist_id = ?, status = ?, updated_at = now() WHERE artist_name = ?",
+                    [artist_id, "pending" if artist_id else "unresolved", name])
+
+
+def claim_tasks(con, refresh=False):
+    """(artist_name, artist_id, skip_albums) for every artist this run should crawl, by record_count.
+
+    Artists left 'running' by an interrupted run resume with the albums they
+    already stored skipped; with `refresh`, finished artists are re-listed
+    for new albums only.
+    """
+    statuses = ["pending", "running", "failed"] + (["done"] if refresh else [])
+    rows = con.execute(f"""
+        SELECT artist_name, artist_id, status FROM crawl_queue
+        WHERE artist_id IS NOT NULL AND status IN ({', '.join('?' * len(statuses))})
+          AND (status <> 'failed' OR attempts < ?)
+        ORDER BY record_count DESC
+    """, statuses + [MAX_ATTEMPTS]).fetchall()
+    return [(name, artist_id, known_albums(con, artist_id) if status in ("running", "done") else None)
+            for name, artist_id, status in rows]
+
+
+def worker(tasks, results, bucket, concurrency, token_provider=None, client_kwargs=None):
+    """Crawler process: takes artists off `tasks`, sends catalog rows per micro-batch to `results`.
+
+    Only the parent writes to DuckDB (one writer per database file), so the
+    workers never open it. Albums that failed are reported by ID with each
+    batch and their rows are not sent.
+    """
+    token_provider = token_provider or get_token()
+    client_kwargs = dict(client_kwargs or {}, cache=get_cache(), bucket=bucket, concurrency=concurrency)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        name, artist_id, skip = task
+        results.put(("start", name, None))
+        stats = {}
+        try:
+            for albums, album_tracks, failed in stream_artist_sync(
+                    token_provider, artist_id, include_groups=ALBUM_GROUPS, stats=stats,
+                    skip_albums=skip, **client_kwargs):
+                failed_albums = sorted(incomplete_albums(albums, album_tracks, failed))
+                rows = catalog_rows(artist_id, name, [a for a in albums if a["id"] not in failed_albums], album_tracks)
+                results.put(("batch", name, (rows, len(albums) - len(failed_albums), failed_albums)))
+            results.put(("done", name, stats))
+        except Exception as e:
+            results.put(("failed", name, repr(e)))
+
+
+def run_queue(con, tasks, workers=WORKERS, concurrency=CONCURRENCY, rate=RATE, token_provider=None, client_kwargs=None):
+    """Crawl `tasks` (from claim_tasks) on worker processes sharing one rate budget.
+
+    Progress is written to crawl_queue after every micro-batch; returns the
+    number of artists finished. If a worker dies, its artist stays 'running'
+    and resumes on the next run. An artist with failed albums is marked
+    'failed' without pruning, so it is re-crawled in full on the next run
+    (up to MAX_ATTEMPTS) and its stored tracks are kept meanwhile.
+    """
+    if not tasks:
+        return 0
+    ctx = multiprocessing.get_context("spawn")
+    task_q, result_q = ctx.Queue(), ctx.Queue(maxsize=RESULT_QUEUE)
+    for task in tasks:
+        task_q.put(task)
+    workers = min(workers, len(tasks))
+    for _ in range(workers):
+        task_q.put(None)
+
+    bucket = SharedTokenBucket(rate, ctx=ctx)
+    procs = [ctx.Process(target=worker, args=(task_q, result_q, bucket, concurrency, token_provider, client_kwargs),
+                         daemon=True, name=f"crawl-worker-{i}") for i in range(workers)]
+    for p in procs:
+        p.start()
+
+    info = {name: (artist_id, skip) for name, artist_id, skip in tasks}
+    started, failed_albums, open_tasks, finished = {}, {}, set(info), 0
+    while open_tasks:
+        try:
+            kind, name, payload = result_q.get(timeout=5)
+        except queue.Empty:
+            if not any(p.is_alive() for p in procs):
+                log(f"All workers exited with {len(open_tasks)} artists unfinished; they resume on the next run")
+                break
+            continue
+        artist_id, skip = info[name]
+
+        if kind == "start":
+            started[name] = datetime.now()
+            failed_albums[name] = set()
+            con.execute("""UPDATE crawl_queue SET status = 'running', attempts = attempts + 1, error = NULL,
+                           started_at = ?, updated_at = now() WHERE artist_name = ?""", [started[name], name])
+        elif kind == "batch":
+            rows, albums_done, failed = payload
+            save_tracks(con, rows)
+            con.execute("""UPDATE crawl_queue SET albums_done = albums_done + ?, tracks = tracks + ?,
+                           updated_at = now() WHERE artist_name = ?""", [albums_done, len(rows), name])
+            if failed:
+                failed_albums[name].update(failed)
+                log(f"{name}: {len(failed)} albums failed in this batch")
+        else:
+            open_tasks.discard(name)
+            if kind == "done" and failed_albums[name]:
+                missing = sorted(failed_albums[name])
+                error = f"{len(missing)} albums failed: {', '.join(missing[:20])}" + (" ..." if len(missing) > 20 else "")
+                con.execute("""UPDATE crawl_queue SET status = 'failed', error = ?, requests = requests + ?,
+                               updated_at = now() WHERE artist_name = ?""", [error, payload.get("requests", 0), name])
+                log(f"{name}: incomplete, {error}; stored tracks kept, retried on the next run")
+            elif kind == "done":
+                finished += 1
+                removed = prune_artist(con, artist_id, started[name]) if skip is None else 0
+                con.execute("""UPDATE crawl_queue SET status = 'done', requests = requests + ?,
+                               updated_at = now() WHERE artist_name = ?""", [payload.get("requests", 0), name])
+                log(f"{name}: done ({payload.get('requests', 0):,} requests"
+                    + (f", {removed} tracks no longer listed" if removed else "") + ")")
+            else:
+                con.execute("UPDATE crawl_queue SET status = 'failed', error = ?, updated_at = now() WHERE artist_name = ?",
+                            [payload, name])
+                log(f"{name}: failed: {payload}")
+
+    for p in procs:
+        p.join(timeout=10)
+    log(f"Shared rate budget: {bucket.rate:.1f} req/s at the end, {bucket.throttled:,} 429s")
+    return finished
+
+
+def queue_summary(con):
+    return con.execute("""
+        SELECT status, COUNT(*) AS artists, SUM(albums_done) AS albums, SUM(tracks) AS tracks, SUM(requests) AS requests
+        FROM crawl_queue GROUP BY status ORDER BY status
+    """).df()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl the top-N TSV artists through a persistent, resumable queue.")
+    parser.add_argument("--profile", type=Path, default=profile_csv)
+    parser.add_argument("--top", type=int, default=TOP_N)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight per worker")
+    parser.add_argument("--rate", type=float, default=RATE, help="requests/sec shared by all workers")
+    parser.add_argument("--refresh", action="store_true", help="also re-list finished artists for new albums")
+    args = parser.parse_args()
+
+    con = duckdb.connect(str(db_path))
+    ensure_queue(con)
+    ensure_catalog(con)
+
+    profile = pd.read_csv(args.profile).head(args.top)
+    log(f"Queued {enqueue(con, profile)} new artists from {args.profile} (top {args.top})")
+    resolve_pending(con, get_spotify())
+
+    tasks = claim_tasks(con, refresh=args.refresh)
+    resumed = sum(1 for t in tasks if t[2] is not None)
+    log(f"Crawling {len(tasks)} artists ({resumed} resumed or refreshed) on {args.workers} workers at {args.rate:g} req/s")
+    finished = run_queue(con, tasks, args.workers, args.concurrency, args.rate)
+
+    log(f"Finished {finished}/{len(tasks)} artists\n")
+    print(queue_summary(con).to_string(index=False))
+    con.close()
@@ -1,92 +1,83 @@
-import os
+import argparse
+import sys
 from pathlib import Path
-from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
-import pandas as pd
-from tqdm import tqdm
-import time
+import duckdb
+from datetime import datetime
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from spotify.artist_resolver import resolve_artist
+from spotify.async_crawler import crawl_artist_sync
+from spotify.catalog_store import (catalog_rows, ensure_catalog, incomplete_albums, known_albums, load_artist,
+                                   prune_artist, save_tracks)
+from spotify.client import get_cache, get_spotify, get_token
 
 # === Base paths ===
 base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
 log_path = base_dir / "logs" / "05B_spotify_fetch.log"
 output_csv = base_dir / "data" / "interim" / "spotify_catalog.csv"
+db_path = base_dir / "data" / "processed" / "unclaimed.duckdb"   # holds the spotify_catalog table
+
+parser = argparse.ArgumentParser(description="Fetch The Beatles' Spotify catalog into spotify_catalog.")
+parser.add_argument("--refresh", action="store_true",
+                    help="list albums again but only fetch tracks for albums not stored yet")
+args = parser.parse_args()
 
 def log(msg):
     print(msg)
     with open(log_path, "a", encoding="utf-8") as f:
         f.write(msg + "\n")
 
-# === Load environment ===
-load_dotenv(base_dir / ".env")
-client_id = os.getenv("SPOTIFY_CLIENT_ID")
-client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-redirect_uri = os.getenv("SPOTIFY_REDIRECT_URI")
-
-# === Authenticate ===
-scope = "user-read-private"
-sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-    client_id=client_id,
-    client_secret=client_secret,
-    redirect_uri=redirect_uri,
-    scope=scope,
-    open_browser=True,
-    cache_path=base_dir / "config" / ".spotify_token_cache"
-))
+# === Authenticate (shared client: pooled session, response cache, token cache) ===
+sp = get_spotify()
+http_cache = get_cache()
 log("Authenticated with Spotify API.\n")
 
-# === 1. Locate The Beatles artist ID ===
+# === 1. Locate The Beatles artist ID (stored in artist_spotify_map after the first run) ===
 artist_name = "The Beatles"
-search_results = sp.search(q=artist_name, type="artist", limit=5)
-beatles = next((a for a in search_results['artists']['items']
-                if a['name'].lower() == "the beatles"), None)
-if not beatles:
+con = duckdb.connect(str(db_path))
+artist_id = resolve_artist(con, sp, artist_name)
+if not artist_id:
     raise ValueError("Could not find The Beatles on Spotify.")
-artist_id = beatles['id']
-log(f"Artist: {beatles['name']} | ID: {artist_id}\n")
+log(f"Artist: {artist_name} | ID: {artist_id}\n")
+
+# === 2-3. Get albums and their tracks (concurrent, rate-limited crawl) ===
+ensure_catalog(con)
+started = datetime.now()
+skip = known_albums(con, artist_id) if args.refresh else None
+if skip is not None:
+    log(f"Refresh mode: {len(skip)} albums already stored, fetching new albums only")
 
-# === 2. Get all albums ===
-albums = []
-results = sp.artist_albums(artist_id, album_type='album,single,compilation,appears_on', limit=50)
-albums.extend(results['items'])
-while results['next']:
-    results = sp.next(results)
-    albums.extend(results['items'])
-album_df = pd.DataFrame(albums).drop_duplicates(subset=['id'])
-log(f"Albums fetched: {len(album_df)}")
+albums, album_tracks, failed, stats = crawl_artist_sync(get_token(), artist_id, skip_albums=skip, cache=http_cache)
+log(f"Albums fetched: {len(albums)}")
+log(f"API requests: {stats['requests']:,} | 429 responses: {stats['throttled']:,} | retries: {stats['retries']:,}")
+for album_id, e in failed.items():
+    log(f"Error fetching album {album_id}: {e}")
+incomplete = incomplete_albums(albums, album_tracks, failed)
 
-# === 3. Fetch all tracks ===
-tracks_data = []
-for _, row in tqdm(album_df.iterrows(), total=len(album_df), desc="Fetching albums"):
-    album_id = row['id']
-    album_name = row['name']
-    release_date = row.get('release_date', '')
-    time.sleep(0.2)  # gentle throttle
-    try:
-        tracks = sp.album_tracks(album_id)
-        for t in tracks['items']:
-            isrc = t.get('external_ids', {}).get('isrc', None)
-            tracks_data.append({
-                'track_name': t['name'],
-                'album_name': album_name,
-                'release_date': release_date,
-                'isrc': isrc,
-                'spotify_track_id': t['id'],
-                'spotify_album_id': album_id
-            })
-    except Exception as e:
-        log(f"Error fetching album {album_id}: {e}")
+# === 4. Store snapshot (refreshes add to it; full runs also drop releases no longer listed).
+#        Albums with a failed album or track lookup are neither written nor pruned ===
+rows = catalog_rows(artist_id, artist_name, [a for a in albums if a["id"] not in incomplete], album_tracks)
+saved = save_tracks(con, rows)
+log(f"Tracks stored in spotify_catalog: {saved:,}")
+if not args.refresh:
+    removed = prune_artist(con, artist_id, started, keep_albums=incomplete)
+    if removed:
+        log(f"Tracks no longer listed, removed: {removed:,}")
 
-# === 4. Clean & deduplicate ===
-df = pd.DataFrame(tracks_data)
+# === 5. Export the cleaned, deduplicated catalog ===
+df = load_artist(con, artist_id).rename(columns={
+    'track_id': 'spotify_track_id',
+    'album_id': 'spotify_album_id',
+})[['track_name', 'album_name', 'release_date', 'isrc', 'spotify_track_id', 'spotify_album_id']]
+con.close()
 df.drop_duplicates(subset=['isrc', 'track_name'], inplace=True)
-df.sort_values(by='release_date', inplace=True)
 
 log(f"Total tracks collected: {len(df)}")
 
-# === 5. Save output ===
 output_csv.parent.mkdir(parents=True, exist_ok=True)
 df.to_csv(output_csv, index=False)
 log(f"Saved cleaned catalog to: {output_csv}\n")
 
+cache_stats = http_cache.stats()
+log(f"HTTP cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses ({cache_stats['hit_rate']:.1%})\n")
 log("Spotify catalog fetch completed successfully.")
@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from spotify.replay import api_url, recorder
+
+# === Base paths ===
+base_dir = Path(r"C:\Tritone_Spotify\Data_analytics\tritone-assignment")
+cache_path = base_dir / "data" / "interim" / "spotify_http_cache.sqlite"
+
+# === Time-to-live per endpoint class (seconds; None = never expires) ===
+DAY = 86_400
+TTL_SECONDS = {
+    "album_tracks": None,        # a release's track list does not change
+    "albums": None,
+    "tracks": None,              # ISRCs are fixed once issued
+    "artist_albums": 7 * DAY,    # new releases appear over time
+    "search": DAY,
+    "other": DAY,
+}
+
+CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key      TEXT PRIMARY KEY,
+    endpoint_class TEXT,
+    body           TEXT,
+    fetched_at     REAL
+);
+"""
+
+
+def endpoint_class(url):
+    """Map a Web API URL to one of the TTL_SECONDS classes."""
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    parts = parts[parts.index("v1") + 1:] if "v1" in parts else parts
+    if parts[:1] == ["albums"]:
+        return "album_tracks" if parts[2:3] == ["tracks"] else "albums"
+    if parts[:1] == ["tracks"]:
+        return "tracks"
+    if parts[:1] == ["artists"] and parts[2:3] == ["albums"]:
+        return "artist_albums"
+    if parts[:1] == ["search"]:
+        return "search"
+    return "other"
+
+
+def cache_key(url, params=None):
+    """Host + path + sorted query, so `next` URLs and params dicts hit the same entry."""
+    parsed = urlparse(url)
+    query = parse_qsl(parsed.query) + [(k, str(v)) for k, v in (params or {}).items() if v is not None]
+    return f"{parsed.netloc}{parsed.path}?{urlencode(sorted(query))}"
+
+
+class ResponseCache:
+    """SQLite store of successful Spotify GET responses with per-class TTLs.
+
+    Safe to share between threads; separate processes share the file through
+    SQLite's own locking (WAL mode). SPOTIFY_HTTP_CACHE=off turns lookups and
+    writes off, e.g. when load-testing against the replay server.
+    """
+
+    def __init__(self, path=cache_path, ttl=None, enabled=None):
+        self.enabled = os.getenv("SPOTIFY_HTTP_CACHE", "on") != "off" if enabled is None else enabled
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = {**TTL_SECONDS, **(ttl or {})}
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL;")
+        self._db.execute(CACHE_SQL)
+        self._db.commit()
+
+    def get(self, url, params=None):
+        """Cached JSON body, or None when missing or expired."""
+        if not self.enabled:
+            return None
+        key = cache_key(url, params)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT endpoint_class, body, fetched_at FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            ttl = self.ttl.get(row[0]) if row else None
+            if row is None or (ttl is not None and time.time() - row[2] > ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[1])
+
+    def put(self, url, params, body):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (cache_key(url, params), endpoint_class(url), json.dumps(body), time.time()),
+            )
+            self._db.commit()
+
+    def clear(self, endpoint_class=None):
+        with self._lock:
+            if endpoint_class:
+                self._db.execute("DELETE FROM responses WHERE endpoint_class = ?", (endpoint_class,))
+            else:
+                self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+    def summary(self):
+        """Stored entries per endpoint class."""
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT endpoint_class, COUNT(*) FROM responses GROUP BY 1 ORDER BY 1"
+            ).fetchall())
+
+    def close(self):
+        self._db.close()
+
+
+class CachedSession(requests.Session):
+    """requests.Session for spotipy (`requests_session=`) that serves GETs from a ResponseCache.
+
+    Mounts the same retry policy spotipy uses for its own sessions, follows
+    SPOTIFY_API_URL and records responses when SPOTIFY_RECORD_DIR is set
+    (see spotify/replay.py). With `pool` (an HTTPAdapter), connections come
+    from that adapter's keep-alive pool instead of a private one; only the
+    retry policy stays per session.
+    """
+
+    def __init__(self, cache=None, pool_maxsize=10, pool=None):
+        super().__init__()
+        self.cache = cache or ResponseCache()
+        retry = Retry(total=3, connect=None, read=False, status=3, backoff_factor=0.3,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]))
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
+        if pool is not None:
+            adapter.poolmanager = pool.poolmanager
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, params=None, **kwargs):
+        url = api_url(url)
+        if method.upper() != "GET":
+            return super().request(method, url, params=params, **kwargs)
+        body = self.cache.get(url, params)
+        if body is not None:
+            if recorder():
+                recorder().record(url, params, body)
+            resp = requests.Response()
+            resp.status_code, resp.url = 200, url
+            resp._content = json.dumps(body).encode()
+            resp.headers["Content-Type"] = "application/json"
+            resp.headers["X-Cache"] = "HIT"
+            return resp
+        resp = super().request(method, url, params=params, **kwargs)
+        if resp.status_code == 200:
+            body = resp.json()
+            self.cache.put(url, params, body)
+            if recorder():
+                recorder().record(url, params, body)
+        return resp
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the Spotify HTTP response cache.")
+    parser.add_argument("--clear", nargs="?", const="all", choices=["all", *TTL_SECONDS],
+                        help="drop every entry, or only one endpoint class")
+    args = parser.parse_args()
+
+    cache = ResponseCache()
+    if args.clear:
+        cache.clear(None if args.clear == "all" else args.clear)
+        print(f"Cleared: {args.clear}")
+    print(f"Cache: {cache.path}")
+    for name, count in cache.summary().items():
+        ttl = TTL_SECONDS.get(name)
+        print(f" - {name:<14} {count:>8,} entries  (TTL: {'none' if ttl is None else f'{ttl // DAY} d'})")
+    cache.close()
@@ -0,0 +1,75 @@
+import asyncio
+
+# === Web API batch limits ===
+ALBUMS_PER_CALL = 20      # GET /albums?ids=
+TRACKS_PER_CALL = 50      # GET /tracks?ids=
+
+
+def unique_ids(ids):
+    """Drop empty and repeated IDs, keeping first-seen order."""
+    return list(dict.fromkeys(i for i in ids if i))
+
+
+def chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def _batches(client, path, key, ids, size):
+    """Fetch `ids` in batches of `size`; returns (objects by id, failed id -> exception)."""
+    batches = chunked(unique_ids(ids), size)
+    results = await asyncio.gather(
+        *(client.get(path, {"ids": ",".join(b)}) for b in batches),
+        return_exceptions=True,
+    )
+    found, failed = {}, {}
+    for batch, result in zip(batches, results):
+        if isinstance(result, Exception):
+            failed.update(dict.fromkeys(batch, result))
+            continue
+        for obj in result[key]:
+            if obj:   # unknown IDs come back as null
+                found[obj["id"]] = obj
+    return found, failed
+
+
+async def fetch_albums(client, album_ids):
+    """Full album objects, 20 per call, with every track of each album attached.
+
+    An album response embeds the first 50 tracks; only albums longer than
+    that need follow-up pages.
+    """
+    albums, failed = await _batches(client, "albums", "albums", album_ids, ALBUMS_PER_CALL)
+    long_albums = [a for a in albums.values() if a["tracks"].get("next")]
+    rest = await asyncio.gather(
+        *(client.paginate(f"albums/{a['id']}/tracks") for a in long_albums),
+        return_exceptions=True,
+    )
+    for album, tracks in zip(long_albums, rest):
+        if isinstance(tracks, Exception):
+            failed[album["id"]] = tracks
+            del albums[album["id"]]
+        else:
+            album["tracks"]["items"] = tracks
+    return albums, failed
+
+
+async def fetch_tracks(client, track_ids):
+    """Full track objects (with external_ids) for de-duplicated IDs, 50 per call."""
+    return await _batches(client, "tracks", "tracks", track_ids, TRACKS_PER_CALL)
+
+
+async def resolve_album_tracks(client, album_ids):
+    """Album ID -> full track objects, using 20-album and 50-track batches.
+
+    Track IDs are de-duplicated across albums, so a track that appears on
+    several releases is only fetched once. Returns (album_tracks, failed).
+    """
+    albums, failed = await fetch_albums(client, album_ids)
+    track_ids = [t["id"] for a in albums.values() for t in a["tracks"]["items"]]
+    tracks, failed_tracks = await fetch_tracks(client, track_ids)
+    failed.update(failed_tracks)
+    album_tracks = {
+        album_id: [tracks.get(t["id"], t) for t in album["tracks"]["items"]]
+        for album_id, album in albums.items()
+    }
+    return album_tracks, failed
@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from spotify.replay import fixture_key, load_fixtures
+
+# === Defaults ===
+default_port = 8765
+default_latency = 0.05        # seconds added to every response
+default_rate_limit = 100      # requests/sec before answering 429
+tracks_per_album = 12
+
+# Artist IDs encode their album count: "mockartist2000" has 2,000 albums
+ARTIST_PREFIX = "mockartist"
+
+
+def _isrc(track_id):
+    """Deterministic, valid-looking ISRC for a mock track."""
+    digest = hashlib.md5(track_id.encode()).hexdigest().upper()
+    return f"QM{digest[:3]}{int(digest[3:12], 16) % 10**7:07d}"
+
+
+def _album(artist_id, i):
+    album_id = f"{artist_id}a{i:05d}"
+    return {
+        "id": album_id,
+        "name": f"Album {i}",
+        "album_type": "album" if i % 3 else "single",
+        "release_date": f"{1960 + i % 60}-01-01",
+        "total_tracks": tracks_per_album,
+        "artists": [{"id": artist_id, "name": f"Mock Artist {artist_id[len(ARTIST_PREFIX):]}"}],
+    }
+
+
+def _track(album_id, j, full=False):
+    track_id = f"{album_id}t{j:02d}"
+    track = {"id": track_id, "name": f"Track {j} of {album_id}", "track_number": j + 1, "duration_ms": 180_000 + j * 1000}
+    if full:
+        track["external_ids"] = {"isrc": _isrc(track_id)}
+        track["album"] = {"id": album_id}
+    return track
+
+
+def _page(url, items, offset, limit, total):
+    nxt = offset + limit
+    return {
+        "href": url,
+        "items": items,
+        "limit": limit,
+        "offset": offset,
+        "total": total,
+        "next": f"{url.split('?')[0]}?offset={nxt}&limit={limit}" if nxt < total else None,
+        "previous": None,
+    }
+
+
+class MockSpotifyHandler(BaseHTTPRequestHandler):
+    """Serves the Web API endpoints the crawlers use: recorded fixtures, or generated fake data."""
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, body, headers=None):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        fault = server.fault()
+        if fault == 429:
+            return self._json(429, {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                              {"Retry-After": str(server.retry_after)})
+        time.sleep(server.response_delay())
+        if fault:
+            return self._json(fault, {"error": {"status": fault, "message": "Injected failure"}})
+
+        if server.fixtures is not None:
+            body = server.fixtures.get(fixture_key(self.path))
+            if body is None:
+                server.missing += 1
+                return self._json(404, {"error": {"status": 404, "message": f"No fixture for {self.path}"}})
+            return self._json(200, body)
+
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p][1:]   # drop "v1"
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        offset, limit = int(query.get("offset", 0)), int(query.get("limit", 20))
+        base = f"http://{self.headers.get('Host')}{url.path}"
+
+        if parts == ["search"]:
+            artist_id = f"{ARTIST_PREFIX}{server.default_albums}"
+            items = [{"id": artist_id, "name": query.get("q", "").replace("artist:", "")}]
+            key = "artists" if "artist" in query.get("type", "") else "tracks"
+            if key == "tracks":
+                items = [_track(_album(artist_id, 0)["id"], j, full=True) for j in range(tracks_per_album)]
+            return self._json(200, {key: _page(base, items, 0, limit, len(items))})
+
+        if len(parts) == 3 and parts[0] == "artists" and parts[2] == "albums":
+            artist_id = parts[1]
+            total = int(artist_id[len(ARTIST_PREFIX):]) if artist_id.startswith(ARTIST_PREFIX) else 0
+            items = [_album(artist_id, i) for i in range(offset, min(offset + limit, total))]
+            return self._json(200, _page(base, items, offset, limit, total))
+
+        if len(parts) == 3 and parts[0] == "artists" and parts[2] == "top-tracks":
+            return self._json(200, {"tracks": [_track(_album(parts[1], 0)["id"], j, full=True) for j in range(10)]})
+
+        if len(parts) == 3 and parts[0] == "albums" and parts[2] == "tracks":
+            items = [_track(parts[1], j) for j in range(offset, min(offset + limit, tracks_per_album))]
+            return self._json(200, _page(base, items, offset, limit, tracks_per_album))
+
+        if parts == ["albums"]:
+            albums = []
+            for album_id in filter(None, query.get("ids", "").split(",")):
+                artist_id, i = album_id.rsplit("a", 1)
+                album = _album(artist_id, int(i))
+                tracks = [_track(album_id, j) for j in range(min(50, tracks_per_album))]
+                album["tracks"] = _page(f"{base}/{album_id}/tracks", tracks, 0, 50, tracks_per_album)
+                albums.append(album)
+            return self._json(200, {"albums": albums})
+
+        if len(parts) == 2 and parts[0] == "tracks":
+            album_id, j = parts[1].rsplit("t", 1)
+            return self._json(200, _track(album_id, int(j), full=True))
+
+        if parts == ["tracks"]:
+            ids = query.get("ids", "").split(",")
+            return self._json(200, {"tracks": [_track(i.rsplit("t", 1)[0], int(i.rsplit("t", 1)[1]), full=True) for i in ids if i]})
+
+        return self._json(404, {"error": {"status": 404, "message": "Not found"}})
+
+
+class MockSpotifyServer(ThreadingHTTPServer):
+    """Threaded stand-in API with latency, a per-second request budget and injected faults.
+
+    With `fixtures` (a directory written by spotify/replay.py) it replays
+    recorded responses only and answers 404 for anything not recorded.
+    `throttle_rate` and `error_rate` are the shares of requests answered with
+    429 and 500/503; a fixed `seed` makes the fault sequence repeatable.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=default_port, latency=default_latency, rate_limit=default_rate_limit,
+                 retry_after=1, default_albums=50, fixtures=None, jitter=0.0,
+                 throttle_rate=0.0, error_rate=0.0, seed=0):
+        super().__init__(("127.0.0.1", port), MockSpotifyHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.default_albums = default_albums
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.fixtures = load_fixtures(fixtures, self.url) if fixtures else None
+        self.served = self.rejected = self.failed = self.missing = 0
+        self._window = (0, 0)   # (second, requests in it)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/"
+
+    def allow_request(self):
+        with self._lock:
+            second = int(time.monotonic())
+            count = self._window[1] + 1 if self._window[0] == second else 1
+            self._window = (second, count)
+            if self.rate_limit and count > self.rate_limit:
+                self.rejected += 1
+                return False
+            self.served += 1
+            return True
+
+    def fault(self):
+        """0 to serve normally, or the status code to answer this request with."""
+        if not self.allow_request():
+            return 429
+        with self._lock:
+            roll = self._rng.random()
+            if roll < self.throttle_rate:
+                self.rejected += 1
+                return 429
+            if roll < self.throttle_rate + self.error_rate:
+                self.failed += 1
+                return self._rng.choice((500, 503))
+        return 0
+
+    def response_delay(self):
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def start_background(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the Spotify Web API.")
+    parser.add_argument("--port", type=int, default=default_port)
+    parser.add_argument("--latency", type=float, default=default_latency, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to the latency")
+    parser.add_argument("--rate-limit", type=int, default=default_rate_limit, help="requests/sec before 429 (0 = none)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500/503")
+    parser.add_argument("--fixtures", type=Path, default=None, help="replay responses recorded with SPOTIFY_RECORD_DIR")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockSpotifyServer(args.port, args.latency, args.rate_limit, fixtures=args.fixtures, jitter=args.jitter,
+                               throttle_rate=args.throttle_rate, error_rate=args.error_rate, seed=args.seed)
+    if server.fixtures is not None:
+        print(f"Replaying {len(server.fixtures):,} recorded responses from {args.fixtures} on {server.url}")
+    else:
+        print(f"Mock Spotify API on {server.url} (artist IDs like {ARTIST_PREFIX}2000 have 2,000 albums)")
+    print(f"Point the scripts at it with SPOTIFY_API_URL={server.url}")
+    server.serve_forever()
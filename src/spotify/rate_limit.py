@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+import random
+import time
+
+# === Defaults ===
+DEFAULT_RATE = 20.0        # requests/sec we start at and recover to
+MIN_RATE = 1.0             # floor after repeated 429s
+RECOVERY_STEP = 0.1        # requests/sec regained per successful call
+
+
+class TokenBucket:
+    """Async token bucket whose rate adapts to 429 responses.
+
+    Every request takes one token. A 429 pauses all callers until its
+    Retry-After has passed and halves the rate (once per pause, so a burst
+    of in-flight requests all getting 429 counts as one signal); each
+    success then adds RECOVERY_STEP back until the ceiling is reached again.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=None, min_rate=MIN_RATE, max_rate=None, recovery=RECOVERY_STEP):
+        self.rate = float(rate)
+        self.max_rate = float(max_rate or rate)
+        self.min_rate = min(float(min_rate), self.rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self.recovery = recovery
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a request may be sent."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:   # FIFO: waiters are served in arrival order
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalize(self, retry_after=None):
+        """Record a 429: pause for Retry-After (or a jittered second) and halve the rate."""
+        now = time.monotonic()
+        wait = float(retry_after) if retry_after is not None else 1.0 + random.random()
+        if now >= self.paused_until:
+            self.rate = max(self.min_rate, self.rate / 2)
+        self.paused_until = max(self.paused_until, now + wait)
+        self._refill(now)
+        self.tokens = 0.0
+        self.throttled += 1
+
+    def reward(self):
+        """Record a success: creep back towards the ceiling."""
+        if self.rate < self.max_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.recovery)
+
+
+class SharedTokenBucket:
+    """TokenBucket whose state lives in shared memory, so several worker processes draw on one budget.
+
+    Same interface as TokenBucket (acquire / penalize / reward). Create it in
+    the parent and pass it to the workers as a Process argument; a 429 seen by
+    any worker pauses and slows all of them.
+    """
+
+    _RATE, _TOKENS, _UPDATED, _PAUSED, _THROTTLED = range(5)
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=None, min_rate=MIN_RATE, max_rate=None, recovery=RECOVERY_STEP,
+                 ctx=None):
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self.max_rate = float(max_rate or rate)
+        self.min_rate = min(float(min_rate), float(rate))
+        self.capacity = float(capacity or max(rate, 1))
+        self.recovery = recovery
+        self._state = ctx.Array("d", [float(rate), self.capacity, time.monotonic(), 0.0, 0.0])
+
+    @property
+    def rate(self):
+        return self._state[self._RATE]
+
+    @property
+    def throttled(self):
+        return int(self._state[self._THROTTLED])
+
+    def _refill(self, s, now):
+        s[self._TOKENS] = min(self.capacity, s[self._TOKENS] + (now - s[self._UPDATED]) * s[self._RATE])
+        s[self._UPDATED] = now
+
+    async def acquire(self):
+        """Wait until a request may be sent (the shared lock is only held for the bookkeeping)."""
+        while True:
+            with self._state.get_lock():
+                s, now = self._state, time.monotonic()
+                if now < s[self._PAUSED]:
+                    wait = s[self._PAUSED] - now
+                else:
+                    self._refill(s, now)
+                    if s[self._TOKENS] >= 1:
+                        s[self._TOKENS] -= 1
+                        return
+                    wait = (1 - s[self._TOKENS]) / s[self._RATE]
+            await asyncio.sleep(wait)
+
+    def penalize(self, retry_after=None):
+        now = time.monotonic()
+        wait = float(retry_after) if retry_after is not None else 1.0 + random.random()
+        with self._state.get_lock():
+            s = self._state
+            if now >= s[self._PAUSED]:
+                s[self._RATE] = max(self.min_rate, s[self._RATE] / 2)
+            s[self._PAUSED] = max(s[self._PAUSED], now + wait)
+            self._refill(s, now)
+            s[self._TOKENS] = 0.0
+            s[self._THROTTLED] += 1
+
+    def reward(self):
+        with self._state.get_lock():
+            s = self._state
+            if s[self._RATE] < self.max_rate:
+                self._refill(s, time.monotonic())
+                s[self._RATE] = min(self.max_rate, s[self._RATE] + self.recovery)
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
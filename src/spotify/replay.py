@@ -0,0 +1,66 @@
+import json
+import os
+import threading
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# === Environment switches (read once at import) ===
+# SPOTIFY_API_URL     point every client at a stand-in, e.g. http://127.0.0.1:8765/v1/
+#                     (tokens then come from SPOTIFY_ACCESS_TOKEN, not OAuth; see spotify/client.py)
+# SPOTIFY_RECORD_DIR  append every successful GET response to fixtures in this directory
+# SPOTIFY_HTTP_CACHE  "off" disables the response cache (spotify/http_cache.py)
+REAL_API_URL = "https://api.spotify.com/v1/"
+API_URL = os.getenv("SPOTIFY_API_URL", REAL_API_URL)
+RECORD_DIR = os.getenv("SPOTIFY_RECORD_DIR")
+FIXTURE_FILE = "responses.jsonl"
+
+
+def fixture_key(url, params=None):
+    """Host-independent key: API path plus sorted query, e.g. '/v1/albums?ids=a,b'."""
+    parsed = urlparse(url)
+    query = parse_qsl(parsed.query) + [(k, str(v)) for k, v in (params or {}).items() if v is not None]
+    return f"{parsed.path}?{urlencode(sorted(query))}"
+
+
+def api_url(url):
+    """Rewrite a real Web API URL onto SPOTIFY_API_URL when a stand-in is configured."""
+    if API_URL != REAL_API_URL and url.startswith(REAL_API_URL):
+        return API_URL + url[len(REAL_API_URL):]
+    return url
+
+
+class FixtureRecorder:
+    """Appends (key, body) pairs as JSON lines; safe across threads, one line per write."""
+
+    def __init__(self, directory):
+        self.path = Path(directory) / FIXTURE_FILE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def record(self, url, params, body):
+        line = json.dumps({"key": fixture_key(url, params), "body": body}) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            self.recorded += 1
+
+
+_recorder = FixtureRecorder(RECORD_DIR) if RECORD_DIR else None
+
+
+def recorder():
+    """The process-wide recorder, or None when SPOTIFY_RECORD_DIR is not set."""
+    return _recorder
+
+
+def load_fixtures(directory, base_url=None):
+    """key -> JSON body text, with recorded API URLs (paging `next`, `href`) pointed at `base_url`."""
+    fixtures = {}
+    with open(Path(directory) / FIXTURE_FILE, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            body = json.dumps(entry["body"])
+            if base_url:
+                body = body.replace(REAL_API_URL, base_url)
+            fixtures[entry["key"]] = body   # the latest recording wins
+    return fixtures